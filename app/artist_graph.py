@@ -0,0 +1,595 @@
+from .io_classes import CreditType
+from .sql_calls import (
+    connect_to_database,
+    database_cache,
+    extract_artist_database,
+    run_sql_command,
+)
+
+import os
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+"""
+    Compact artist graph (group -> line up -> members) keyed by int artist ids, with
+    the flattened members of every line up, and of the credits of every song,
+    precomputed at load time
+"""
+
+# Small code per role type, and one bit per code to key the precomputed members
+ROLE_TYPE_CODES = {credit_type.value: i for i, credit_type in enumerate(CreditType)}
+CREDIT_TYPE_BITS = {role_type: 1 << code for role_type, code in ROLE_TYPE_CODES.items()}
+
+
+def get_credit_mask(credit_types: List[CreditType]) -> int:
+    """
+    Get the mask of a list of credit types
+
+    Parameters
+    ----------
+    credit_types : List[CreditType]
+        The credit types
+
+    Returns
+    -------
+    int
+        The mask, with one bit per credit type
+    """
+
+    credit_mask = 0
+    for credit_type in credit_types:
+        credit_mask |= CREDIT_TYPE_BITS.get(credit_type, 0)
+    return credit_mask
+
+
+class ArtistGraph:
+    """
+    Artist graph stored as CSR adjacency arrays indexed by int artist id
+
+    The groups of artist i are group_ids[group_offsets[i]:group_offsets[i + 1]], its
+    line ups are the indexes line_up_offsets[i] to line_up_offsets[i + 1] and the
+    members of line up j are member_ids[member_offsets[j]:member_offsets[j + 1]].
+    The flattened members of every line up are precomputed for every credit type mask,
+    with and without the intermediate groups.
+    """
+
+    def __init__(self, artist_database: Dict):
+        """
+        Build the adjacency arrays and the closure of every line up
+
+        Cycles and links to unknown artists or line ups do not stop the build,
+        they are reported in self.malformed_links
+
+        Parameters
+        ----------
+        artist_database : Dict
+            The artist database, see extract_artist_database
+        """
+
+        self.malformed_links: List[str] = []
+
+        self.names: Dict[int, List[str]] = {
+            int(artist_id): artist["names"]
+            for artist_id, artist in artist_database.items()
+        }
+        artist_count = max(self.names, default=-1) + 1
+
+        self.group_offsets = array("i", [0] * (artist_count + 1))
+        self.group_ids = array("i")
+        self.line_up_offsets = array("i", [0] * (artist_count + 1))
+        self.member_offsets = array("i", [0])
+        self.member_ids = array("i")
+        self.member_line_up_ids = array("h")
+        self.member_role_types = array("b")
+
+        for artist_id in range(artist_count):
+            artist = artist_database.get(str(artist_id), {})
+
+            for group in artist.get("groups") or []:
+                self.group_ids.append(int(group["id"]))
+            self.group_offsets[artist_id + 1] = len(self.group_ids)
+
+            for line_up_id, line_up in enumerate(artist.get("line_ups") or []):
+                for member in line_up.get("members", []):
+                    member_line_up_id = int(member["line_up_id"])
+                    member_line_ups = artist_database.get(member["id"], {}).get(
+                        "line_ups"
+                    )
+                    if member_line_up_id != -1 and not (
+                        member_line_ups and member_line_up_id < len(member_line_ups)
+                    ):
+                        self.report_malformed_link(
+                            f"{artist_id}/{line_up_id} -> unknown line up"
+                            + f" {member['id']}/{member_line_up_id}"
+                        )
+                        member_line_up_id = -1
+                    self.member_ids.append(int(member["id"]))
+                    self.member_line_up_ids.append(member_line_up_id)
+                    self.member_role_types.append(
+                        ROLE_TYPE_CODES.get(member.get("role_type"), -1)
+                    )
+                self.member_offsets.append(len(self.member_ids))
+            self.line_up_offsets[artist_id + 1] = len(self.member_offsets) - 1
+
+        # Only the credit types used by the links change the closures
+        self.credit_bits = 0
+        for role_type in set(self.member_role_types) - {-1}:
+            self.credit_bits |= 1 << role_type
+
+        # Output of format_artist_id, filled by the responses containing each artist
+        self.formatted_artists: Dict[int, Dict] = {}
+
+        self.closures: Dict[Tuple[int, int, bool], FrozenSet[int]] = {}
+        # Most masks give the same members, equal closures share one frozenset
+        self.interned_closures: Dict[FrozenSet[int], FrozenSet[int]] = {}
+        for credit_mask in range(self.credit_bits + 1):
+            if credit_mask & ~self.credit_bits:
+                continue
+            for bottom in [True, False]:
+                for line_up in range(len(self.member_offsets) - 1):
+                    self.build_closure(line_up, credit_mask, bottom, [])
+
+    def report_malformed_link(self, malformed_link: str):
+        """
+        Report a malformed link of the graph, once
+
+        Parameters
+        ----------
+        malformed_link : str
+            The description of the malformed link
+        """
+
+        if malformed_link not in self.malformed_links:
+            self.malformed_links.append(malformed_link)
+
+    def get_line_up_index(self, artist_id: int, line_up_id: int) -> int:
+        """
+        Get the index of a line up in member_offsets
+
+        Parameters
+        ----------
+        artist_id : int
+            The id of the group
+        line_up_id : int
+            The id of the line up of the group
+
+        Returns
+        -------
+        int
+            The index of the line up, -1 if the artist has no such line up
+        """
+
+        if not 0 <= line_up_id < self.get_line_up_count(artist_id):
+            return -1
+        return self.line_up_offsets[artist_id] + line_up_id
+
+    def format_line_up(self, line_up: int) -> str:
+        """
+        Format a line up index as artist_id/line_up_id, for the reports
+
+        Parameters
+        ----------
+        line_up : int
+            The index of the line up
+
+        Returns
+        -------
+        str
+            The formatted line up
+        """
+
+        artist_id = bisect_right(self.line_up_offsets, line_up) - 1
+        return f"{artist_id}/{line_up - self.line_up_offsets[artist_id]}"
+
+    def build_closure(
+        self,
+        line_up: int,
+        credit_mask: int,
+        bottom: bool,
+        path: List[int],
+    ) -> Tuple[FrozenSet[int], bool]:
+        """
+        Compute the flattened members of a line up, once per credit type mask and mode
+
+        Parameters
+        ----------
+        line_up : int
+            The index of the line up to flatten
+        credit_mask : int
+            The credit types of the members to keep
+        bottom : bool
+            If True, keep only the lowest tier members, else keep the subgroups too
+        path : List[int]
+            The line ups being flattened, to detect cycles
+
+        Returns
+        -------
+        Tuple[FrozenSet[int], bool]
+            The ids of the members of the line up and its subgroups, and whether
+            a cycle was cut while flattening it
+        """
+
+        key = (line_up, credit_mask, bottom)
+        if key in self.closures:
+            return self.closures[key], False
+
+        if line_up in path:
+            cycle = path[path.index(line_up) :]
+            # Start the cycle at its smallest line up to report it once
+            start = cycle.index(min(cycle))
+            cycle = cycle[start:] + cycle[:start] + [cycle[start]]
+            self.report_malformed_link(
+                "cycle " + " -> ".join(self.format_line_up(index) for index in cycle)
+            )
+            return frozenset(), True
+
+        members = set()
+        cut_cycle = False
+        path.append(line_up)
+        for i in range(self.member_offsets[line_up], self.member_offsets[line_up + 1]):
+            role_type = self.member_role_types[i]
+            if role_type == -1 or not (1 << role_type) & credit_mask:
+                continue
+            member_id = self.member_ids[i]
+            member_line_up_id = self.member_line_up_ids[i]
+            if member_line_up_id == -1 or not bottom:
+                members.add(member_id)
+            if member_line_up_id != -1:
+                sub_members, sub_cut_cycle = self.build_closure(
+                    self.get_line_up_index(member_id, member_line_up_id),
+                    credit_mask,
+                    bottom,
+                    path,
+                )
+                members |= sub_members
+                cut_cycle |= sub_cut_cycle
+        path.pop()
+
+        closure = frozenset(members)
+        closure = self.interned_closures.setdefault(closure, closure)
+        # Inside a cycle, the members depend on where the cycle was entered,
+        # so only the closure of the line up the walk started from is kept
+        if not cut_cycle or not path:
+            self.closures[key] = closure
+        return closure, cut_cycle
+
+    def __contains__(self, artist_id: int) -> bool:
+        return artist_id in self.names
+
+    def get_names(self, artist_id: int) -> List[str]:
+        """
+        Get the names of an artist
+
+        Parameters
+        ----------
+        artist_id : int
+            The id of the artist
+
+        Returns
+        -------
+        List[str]
+            The names of the artist, empty if the artist is unknown
+        """
+
+        return self.names.get(artist_id, [])
+
+    def get_groups(self, artist_id: int) -> List[int]:
+        """
+        Get the groups an artist is a member of
+
+        Parameters
+        ----------
+        artist_id : int
+            The id of the artist
+
+        Returns
+        -------
+        List[int]
+            The ids of the groups
+        """
+
+        if not 0 <= artist_id < len(self.group_offsets) - 1:
+            return []
+        start, end = self.group_offsets[artist_id], self.group_offsets[artist_id + 1]
+        return self.group_ids[start:end].tolist()
+
+    def get_line_up_count(self, artist_id: int) -> int:
+        """
+        Get the number of line ups of an artist
+
+        Parameters
+        ----------
+        artist_id : int
+            The id of the artist
+
+        Returns
+        -------
+        int
+            The number of line ups, 0 if the artist is not a group
+        """
+
+        if not 0 <= artist_id < len(self.line_up_offsets) - 1:
+            return 0
+        return self.line_up_offsets[artist_id + 1] - self.line_up_offsets[artist_id]
+
+    def get_line_up(self, artist_id: int, line_up_id: int) -> List[Tuple[int, int]]:
+        """
+        Get the direct members of a line up
+
+        Parameters
+        ----------
+        artist_id : int
+            The id of the group
+        line_up_id : int
+            The id of the line up of the group
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            The (artist_id, line_up_id) of the members, -1 if the member is not a group
+        """
+
+        line_up = self.get_line_up_index(artist_id, line_up_id)
+        if line_up == -1:
+            return []
+
+        start, end = self.member_offsets[line_up], self.member_offsets[line_up + 1]
+        return list(zip(self.member_ids[start:end], self.member_line_up_ids[start:end]))
+
+    def get_members(
+        self, artists: List[Tuple[int, int]], credit_mask: int, bottom: bool = True
+    ) -> FrozenSet[int]:
+        """
+        Get the flattened members of a list of artists, the members of their line ups
+        being kept only if their credit type is in the mask
+
+        Parameters
+        ----------
+        artists : List[Tuple[int, int]]
+            The (artist_id, line_up_id) of the artists, -1 if the artist is not a group
+        credit_mask : int
+            The credit types of the members to keep, see get_credit_mask
+        bottom : bool, optional
+            If True, keep only the lowest tier members, by default True
+
+        Returns
+        -------
+        FrozenSet[int]
+            The ids of the artists and their members
+        """
+
+        credit_mask &= self.credit_bits
+
+        members = set()
+        for artist_id, line_up_id in artists:
+            line_up = self.get_line_up_index(artist_id, line_up_id)
+            if line_up == -1:
+                members.add(artist_id)
+                continue
+            if not bottom:
+                members.add(artist_id)
+            members |= self.closures[(line_up, credit_mask, bottom)]
+        return frozenset(members)
+
+    def report(self) -> Dict[str, int]:
+        """
+        Get the size of the graph in the current worker
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of artists, line ups, precomputed closures, formatted artists and
+            malformed links, and the memory used by the adjacency arrays, the closures and the names
+        """
+
+        adjacency_arrays = [
+            self.group_offsets,
+            self.group_ids,
+            self.line_up_offsets,
+            self.member_offsets,
+            self.member_ids,
+            self.member_line_up_ids,
+            self.member_role_types,
+        ]
+        return {
+            "pid": os.getpid(),
+            "artists": len(self.names),
+            "line_ups": len(self.member_offsets) - 1,
+            "closures": len(self.closures),
+            "formatted_artists": len(self.formatted_artists),
+            "malformed_links": len(self.malformed_links),
+            "adjacency_bytes": sum(sys.getsizeof(a) for a in adjacency_arrays),
+            "closures_bytes": sys.getsizeof(self.closures)
+            + sys.getsizeof(self.interned_closures)
+            + sum(sys.getsizeof(closure) for closure in self.interned_closures),
+            "names_bytes": sys.getsizeof(self.names)
+            + sum(
+                sys.getsizeof(names) + sum(sys.getsizeof(name) for name in names)
+                for names in self.names.values()
+            ),
+        }
+
+
+@database_cache()
+def get_artist_graph(database_path=None) -> ArtistGraph:
+    """
+    Build the artist graph and save it to cache
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
+    Returns
+    -------
+    ArtistGraph
+        The artist graph
+    """
+
+    # Only the compact graph is kept in memory, not the artist database it is built from
+    return ArtistGraph(extract_artist_database.__wrapped__(database_path))
+
+
+def parse_song_artists(artist_ids: str, line_up_ids: str) -> List[Tuple[int, int]]:
+    """
+    Parse the artists credited in a column of songs_full
+
+    Parameters
+    ----------
+    artist_ids : str
+        The comma separated artist ids
+    line_up_ids : str
+        The comma separated line up ids, -1 if the artist is not credited as a group
+
+    Returns
+    -------
+    List[Tuple[int, int]]
+        The (artist_id, line_up_id) of the artists
+    """
+
+    if not artist_ids:
+        return []
+
+    return [
+        (int(artist_id), int(line_up_id))
+        for artist_id, line_up_id in zip(artist_ids.split(","), line_up_ids.split(","))
+    ]
+
+
+class SongCredits:
+    """
+    Flattened members of the credits of every song, for every credit type mask:
+    the lowest tier vocalists, and the support artists with their intermediate groups
+    """
+
+    def __init__(self, songs: List[Tuple[Any, ...]], artist_graph: ArtistGraph):
+        """
+        Parse the credits of every song once and flatten them
+
+        Parameters
+        ----------
+        songs : List[Tuple[Any, ...]]
+            The song_id, vocalists, backing_vocalists, performers and composers
+            (with their line up columns) of every song
+        artist_graph : ArtistGraph
+            The artist graph, to flatten the groups
+        """
+
+        self.artist_graph = artist_graph
+
+        # Songs crediting no group have the same members for every mask
+        self.members: Dict[int, Tuple[FrozenSet[int], FrozenSet[int]]] = {}
+        self.members_by_mask: Dict[
+            Tuple[int, int], Tuple[FrozenSet[int], FrozenSet[int]]
+        ] = {}
+        credit_masks = [
+            credit_mask
+            for credit_mask in range(artist_graph.credit_bits + 1)
+            if not credit_mask & ~artist_graph.credit_bits
+        ]
+
+        # Songs with the same credits share their members
+        credits_members: Dict[
+            Tuple[str, ...], Dict[int, Tuple[FrozenSet[int], FrozenSet[int]]]
+        ] = {}
+
+        for song_id, *credits in songs:
+            credits = tuple(credits)
+            if credits not in credits_members:
+                vocalists = parse_song_artists(credits[0], credits[1])
+                support_artists = [
+                    artist
+                    for column in range(2, 8, 2)
+                    for artist in parse_song_artists(
+                        credits[column], credits[column + 1]
+                    )
+                ]
+                has_groups = any(
+                    line_up_id != -1 for _, line_up_id in vocalists + support_artists
+                )
+                credits_members[credits] = {
+                    credit_mask: (
+                        artist_graph.get_members(vocalists, credit_mask),
+                        artist_graph.get_members(
+                            support_artists, credit_mask, bottom=False
+                        ),
+                    )
+                    for credit_mask in (credit_masks if has_groups else [0])
+                }
+
+            members_by_mask = credits_members[credits]
+            if len(members_by_mask) == 1:
+                self.members[song_id] = members_by_mask[0]
+            else:
+                for credit_mask, members in members_by_mask.items():
+                    self.members_by_mask[(song_id, credit_mask)] = members
+
+    def get_members(
+        self, song_id: int, credit_mask: int
+    ) -> Tuple[FrozenSet[int], FrozenSet[int]]:
+        """
+        Get the flattened members of the credits of a song
+
+        Parameters
+        ----------
+        song_id : int
+            The id of the song
+        credit_mask : int
+            The credit types of the members to keep, see get_credit_mask
+
+        Returns
+        -------
+        Tuple[FrozenSet[int], FrozenSet[int]]
+            The lowest tier vocalists, and the support artists with their groups
+        """
+
+        if song_id in self.members:
+            return self.members[song_id]
+        return self.members_by_mask.get(
+            (song_id, credit_mask & self.artist_graph.credit_bits),
+            (frozenset(), frozenset()),
+        )
+
+    def report(self) -> Dict[str, int]:
+        """
+        Get the size of the precomputed credits
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of songs, and of the songs flattened once per credit type mask
+        """
+
+        return {
+            "songs": len(self.members)
+            + len({song_id for song_id, _ in self.members_by_mask}),
+            "songs_with_groups": len({song_id for song_id, _ in self.members_by_mask}),
+        }
+
+
+@database_cache()
+def get_song_credits(database_path=None) -> SongCredits:
+    """
+    Flatten the credits of every song of the database and save them to cache
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
+    Returns
+    -------
+    SongCredits
+        The flattened credits of every song
+    """
+
+    cursor = connect_to_database(database_path)
+    songs = run_sql_command(
+        cursor,
+        "SELECT song_id, vocalists, vocalists_line_up, backing_vocalists,"
+        + " backing_vocalists_line_up, performers, performers_line_up,"
+        + " composers, composers_line_up FROM songs_full",
+    )
+    return SongCredits(songs, get_artist_graph(database_path))
@@ -0,0 +1,227 @@
+from .artist_graph import get_artist_graph, get_song_credits
+from .indexes import get_artist_songs_index, get_trigram_indexes_report
+from .song_store import SONG_FILTER_ENGINE, get_song_store
+from .sql_calls import (
+    DATABASE_PATH,
+    connect_to_database,
+    connection_pool,
+    extract_anime_genres_and_tags,
+    get_database_generation,
+    get_database_version,
+    run_sql_command,
+    set_database_generation,
+)
+
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from decouple import config
+
+"""
+    Hot reload of the database: a new database file dropped next to DATABASE_PATH
+    becomes the next generation once every cache and index is built for it
+"""
+
+# Seconds between two checks for a new database file, 0 to disable the hot reload
+DATABASE_RELOAD_INTERVAL = config("DATABASE_RELOAD_INTERVAL", default=60, cast=int)
+
+
+def find_latest_database(database_path=DATABASE_PATH) -> str:
+    """
+    Get the most recent of the database and of the files dropped next to it,
+    named <name>.<anything>.sqlite for a database named <name>.sqlite
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to DATABASE_PATH environment variable
+
+    Returns
+    -------
+    str
+        Path to the most recent database file
+    """
+
+    path = Path(database_path)
+    candidates = list(path.parent.glob(f"{path.stem}.*{path.suffix}"))
+    if path.exists():
+        candidates.append(path)
+
+    if not candidates:
+        return database_path
+
+    return str(
+        max(candidates, key=lambda candidate: (candidate.stat().st_mtime_ns, candidate))
+    )
+
+
+def build_database_caches(database_path: str) -> Dict[str, Any]:
+    """
+    Build every cache and index of a database, so that its first requests
+    do not have to
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database
+
+    Returns
+    -------
+    Dict[str, Any]
+        The size report of each cache and index
+    """
+
+    cursor = connect_to_database(database_path)
+    run_sql_command(cursor, "SELECT COUNT(*) FROM songs_full")
+
+    extract_anime_genres_and_tags(database_path)
+
+    return {
+        "trigram_indexes": get_trigram_indexes_report(database_path),
+        "artist_songs_index": get_artist_songs_index(database_path).report(),
+        "artist_graph": get_artist_graph(database_path).report(),
+        "song_credits": get_song_credits(database_path).report(),
+        "song_store": get_song_store(database_path).report()
+        if SONG_FILTER_ENGINE == "numpy"
+        else None,
+    }
+
+
+class DatabaseReloader:
+    """
+    Background thread checking for a new database file, building its caches
+    and switching the new requests to it
+
+    The requests already running finish on the previous generation, whose caches
+    and connections are kept until the next reload
+    """
+
+    def __init__(self, interval: int = DATABASE_RELOAD_INTERVAL):
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        # Path of the current and previous generations
+        self.database_paths: List[str] = []
+        # New file seen at the last check, loaded if it did not change since
+        self.pending: Optional[Tuple[str, Tuple[int, int]]] = None
+        self.failed: Optional[Tuple[str, Tuple[int, int]]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def load(self, database_path: str) -> Dict[str, Any]:
+        """
+        Build the caches of a database, then serve it as the next generation
+
+        Parameters
+        ----------
+        database_path (str):
+            Path to the database
+
+        Returns
+        -------
+        Dict[str, Any]
+            The size report of each cache and index, see build_database_caches
+        """
+
+        reports = build_database_caches(database_path)
+
+        set_database_generation(database_path)
+        self.database_paths.append(database_path)
+
+        for retired_path in self.database_paths[:-2]:
+            if retired_path not in self.database_paths[-2:]:
+                connection_pool.retire(retired_path)
+        self.database_paths = self.database_paths[-2:]
+
+        return reports
+
+    def check(self) -> bool:
+        """
+        Load the most recent database file if it is new and was not modified
+        since the previous check
+
+        Returns
+        -------
+        bool
+            True if a new generation is served
+        """
+
+        database_path = find_latest_database()
+        if database_path == get_database_generation().database_path:
+            self.pending = None
+            return False
+
+        # The file may still be being copied
+        candidate = (database_path, get_database_version(database_path))
+        if candidate == self.failed or candidate != self.pending:
+            self.pending = candidate
+            return False
+        self.pending = None
+
+        try:
+            self.load(database_path)
+        except Exception:
+            self.failed = candidate
+            self.failures += 1
+            raise
+
+        self.reloads += 1
+        return True
+
+    def run(self):
+        """
+        Check for a new database file every interval, until stopped
+        """
+
+        while not self._stop.wait(self.interval):
+            try:
+                if self.check():
+                    print("Database reloaded:", get_database_generation())
+            except Exception as error:
+                print("Database reload failed:", error)
+
+    def start(self):
+        """
+        Start the background checks, unless the interval is 0
+        """
+
+        if self.interval <= 0 or self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, name="database-reloader", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background checks
+        """
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the current generation and the reload counters
+
+        Returns
+        -------
+        Dict[str, Any]
+            The generation number and database, and the number of reloads and failures
+        """
+
+        generation = get_database_generation()
+        return {
+            "generation": generation.number,
+            "database_path": generation.database_path,
+            "reloads": self.reloads,
+            "failures": self.failures,
+        }
+
+
+database_reloader = DatabaseReloader()
@@ -0,0 +1,420 @@
+from .sql_calls import (
+    connect_to_database,
+    get_database_path,
+    get_database_version,
+    get_folded_names,
+    get_song_artist_links,
+    name_regexp,
+    NameSearch,
+)
+
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import chain, groupby
+from typing import Dict, Iterable, List, Optional, Tuple
+
+"""
+    In-memory indexes built from the database at start up, to answer searches
+    without scanning every row
+"""
+
+
+def get_trigrams(name: str) -> set:
+    """
+    Get the set of trigrams of a folded name
+
+    Parameters
+    ----------
+    name : str
+        The folded name
+
+    Returns
+    -------
+    set
+        The trigrams of the name, empty if the name is shorter than 3 characters
+    """
+
+    return {name[i : i + 3] for i in range(len(name) - 2)}
+
+
+def sorted_array_contains(sorted_ids: array, id: int) -> bool:
+    """
+    Check if an id is in a sorted array of ids
+
+    Parameters
+    ----------
+    sorted_ids : array
+        The sorted array of ids
+    id : int
+        The id to look for
+
+    Returns
+    -------
+    bool
+        True if the id is in the array
+    """
+
+    i = bisect_left(sorted_ids, id)
+    return i < len(sorted_ids) and sorted_ids[i] == id
+
+
+class TrigramIndex:
+    """
+    Inverted index mapping each trigram of the folded names to the sorted array
+    of the ids (song, artist or anime) having a name containing it
+    """
+
+    def __init__(self, names: List[Tuple[int, str, str]]):
+        """
+        Build the index
+
+        Parameters
+        ----------
+        names : List[Tuple[int, str, str]]
+            The list of (id, folded name, name), ordered by id
+        """
+
+        self.names: Dict[int, List[Tuple[str, str]]] = {}
+        postings: Dict[str, List[int]] = {}
+
+        for id, folded_name, name in names:
+            if id not in self.names:
+                self.names[id] = []
+            self.names[id].append((folded_name, name))
+
+        for id, id_names in self.names.items():
+            for trigram in set().union(
+                *(get_trigrams(folded_name) for folded_name, _ in id_names)
+            ):
+                if trigram not in postings:
+                    postings[trigram] = []
+                postings[trigram].append(id)
+
+        self.postings: Dict[str, array] = {
+            trigram: array("i", ids) for trigram, ids in postings.items()
+        }
+
+    def get_candidates(self, trigrams: set) -> Iterable[int]:
+        """
+        Get the ids having a name containing every trigram
+
+        The posting lists of the trigrams are intersected, starting from the shortest
+
+        Parameters
+        ----------
+        trigrams : set
+            The trigrams
+
+        Returns
+        -------
+        Iterable[int]
+            The sorted ids
+        """
+
+        postings = sorted(
+            (self.postings.get(trigram, array("i")) for trigram in trigrams),
+            key=len,
+        )
+
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates = [id for id in candidates if sorted_array_contains(posting, id)]
+
+        return candidates
+
+    def is_matching(self, id: int, name_search: NameSearch) -> bool:
+        """
+        Check if a name of an id matches a name search
+
+        Parameters
+        ----------
+        id : int
+            The id
+        name_search : NameSearch
+            The name search
+
+        Returns
+        -------
+        bool
+            True if any name of the id matches the search
+        """
+
+        return any(
+            (
+                folded_name in name_search.folded_names
+                if name_search.folded_names
+                else all(part in folded_name for part in name_search.folded_parts)
+            )
+            and name_regexp(name_search.regex, name)
+            for folded_name, name in self.names[id]
+        )
+
+    def search(self, name_search: NameSearch) -> Optional[List[int]]:
+        """
+        Get the ids having a name matching a name search
+
+        The candidates are the ids having a name containing every trigram of the
+        folded parts of the search (or of one of its folded names), and only them
+        are verified
+
+        Parameters
+        ----------
+        name_search : NameSearch
+            The name search
+
+        Returns
+        -------
+        Optional[List[int]]
+            The sorted list of matching ids, None if the search is too short to be indexed
+        """
+
+        if name_search.folded_names:
+            trigrams_list = [get_trigrams(name) for name in name_search.folded_names]
+        else:
+            trigrams_list = [
+                set().union(*(get_trigrams(part) for part in name_search.folded_parts))
+            ]
+        if not all(trigrams_list):
+            return None
+
+        candidates = set()
+        for trigrams in trigrams_list:
+            candidates.update(self.get_candidates(trigrams))
+
+        return sorted(id for id in candidates if self.is_matching(id, name_search))
+
+    def match(self, name_search: NameSearch) -> List[int]:
+        """
+        Get the ids having a name matching a name search, verifying every name if the
+        search is too short to be indexed
+
+        Parameters
+        ----------
+        name_search : NameSearch
+            The name search
+
+        Returns
+        -------
+        List[int]
+            The sorted list of matching ids
+        """
+
+        ids = self.search(name_search)
+        if ids is not None:
+            return ids
+
+        return [id for id in self.names if self.is_matching(id, name_search)]
+
+    def report(self) -> Dict[str, int]:
+        """
+        Get the size of the index
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of ids, trigrams, postings and the size of the postings in bytes
+        """
+
+        return {
+            "ids": len(self.names),
+            "trigrams": len(self.postings),
+            "postings": sum(len(posting) for posting in self.postings.values()),
+            "postings_bytes": sum(
+                posting.itemsize * len(posting) for posting in self.postings.values()
+            ),
+        }
+
+
+# Every type of names, for the current and the previous generations
+@lru_cache(maxsize=8)
+def load_trigram_index(
+    name_type: str, database_path: str, database_version: Tuple[int, int]
+) -> TrigramIndex:
+    """
+    Build the trigram index of a type of names and save it to cache, for a version
+    of the database file
+
+    Parameters
+    ----------
+    name_type : str
+        The type of names to index : song, song_artist, artist or anime
+    database_path (str):
+        Path to the database
+    database_version : Tuple[int, int]
+        The version of the database file, see get_database_version
+
+    Returns
+    -------
+    TrigramIndex
+        The trigram index of the names
+    """
+
+    cursor = connect_to_database(database_path)
+    return TrigramIndex(get_folded_names(cursor, name_type))
+
+
+def get_trigram_index(name_type: str, database_path=None) -> TrigramIndex:
+    """
+    Get the trigram index of a type of names, rebuilt when the database file changes
+
+    Parameters
+    ----------
+    name_type : str
+        The type of names to index : song, song_artist, artist or anime
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
+    Returns
+    -------
+    TrigramIndex
+        The trigram index of the names
+    """
+
+    database_path = database_path or get_database_path()
+    return load_trigram_index(
+        name_type, database_path, get_database_version(database_path)
+    )
+
+
+def get_trigram_indexes_report(database_path=None) -> Dict[str, Dict]:
+    """
+    Build every trigram index if needed and get their sizes
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
+    Returns
+    -------
+    Dict[str, Dict]
+        The size report of each trigram index
+    """
+
+    return {
+        name_type: get_trigram_index(name_type, database_path).report()
+        for name_type in ["song", "artist", "anime"]
+    }
+
+
+class ArtistSongsIndex:
+    """
+    Inverted index mapping each (artist_id, role_type) to the sorted array of the ids
+    of the songs crediting the artist with this role
+    """
+
+    def __init__(self, links: List[Tuple[int, str, int]]):
+        """
+        Build the index
+
+        Parameters
+        ----------
+        links : List[Tuple[int, str, int]]
+            The list of distinct (artist_id, role_type, song_id), ordered
+        """
+
+        self.postings: Dict[Tuple[int, str], array] = {
+            (artist_id, role_type): array("i", (link[2] for link in artist_links))
+            for (artist_id, role_type), artist_links in groupby(
+                links, key=lambda link: (link[0], link[1])
+            )
+        }
+
+    def get_song_ids(
+        self, artist_ids: Iterable[int], credit_types: List[str]
+    ) -> List[int]:
+        """
+        Get the songs crediting any of the artists with any of the credit types,
+        from the union of their posting lists
+
+        Parameters
+        ----------
+        artist_ids : Iterable[int]
+            The artist ids
+        credit_types : List[str]
+            The credit types to search
+
+        Returns
+        -------
+        List[int]
+            The sorted list of distinct song ids
+        """
+
+        postings = [
+            self.postings[(artist_id, credit_type)]
+            for artist_id in set(artist_ids)
+            for credit_type in set(credit_types)
+            if (artist_id, credit_type) in self.postings
+        ]
+
+        if len(postings) == 1:
+            return postings[0].tolist()
+
+        # Faster than a k-way merge of the sorted postings (heapq.merge) in CPython
+        return sorted(set(chain.from_iterable(postings)))
+
+    def report(self) -> Dict[str, int]:
+        """
+        Get the size of the index
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of (artist, role type), postings and the size of the postings
+            in bytes
+        """
+
+        return {
+            "artist_roles": len(self.postings),
+            "postings": sum(len(posting) for posting in self.postings.values()),
+            "postings_bytes": sum(
+                posting.itemsize * len(posting) for posting in self.postings.values()
+            ),
+        }
+
+
+@lru_cache(maxsize=2)
+def load_artist_songs_index(
+    database_path: str, database_version: Tuple[int, int]
+) -> ArtistSongsIndex:
+    """
+    Build the song ids index of the artists and save it to cache, for a version
+    of the database file
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database
+    database_version : Tuple[int, int]
+        The version of the database file, see get_database_version
+
+    Returns
+    -------
+    ArtistSongsIndex
+        The song ids index of the artists
+    """
+
+    cursor = connect_to_database(database_path)
+    return ArtistSongsIndex(get_song_artist_links(cursor))
+
+
+def get_artist_songs_index(database_path=None) -> ArtistSongsIndex:
+    """
+    Get the song ids index of the artists, rebuilt when the database file changes
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
+    Returns
+    -------
+    ArtistSongsIndex
+        The song ids index of the artists
+    """
+
+    database_path = database_path or get_database_path()
+    return load_artist_songs_index(database_path, get_database_version(database_path))
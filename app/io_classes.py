@@ -164,7 +164,7 @@ class SearchNonAnnIdBase(SearchBase):
     anime_genres: Optional[List[str]] = Field(
         default=[],
         description="""**anime_genres** is the list of genres that need to be linked to the anime.<br>
-        <b>*This parameter will have no effect as it is not yet implemented.</b><br>
+        The anime needs to be linked to every genre of the list.<br>
         If no genres are specified, the search will return songs from any anime.<br>
         Genres on AMQ are taken from the Anilist genres.<br>
         <b>*Anime genres are not updated regularly.</b> See documentation for more details and latest update date.""",
@@ -172,7 +172,7 @@ class SearchNonAnnIdBase(SearchBase):
     anime_tags: Optional[List[str]] = Field(
         default=[],
         description="""**anime_tags** is the list of tags that need to be linked to the anime.<br>
-        <b>*This parameter will have no effect as it is not yet implemented.</b><br>
+        The anime needs to be linked to every tag of the list.<br>
         If no tags are specified, the search will return songs from any anime.<br>
         Tags on AMQ are taken from the Anilist tags.<br>
         <b>*Anime tags are not updated regularly.</b> See documentation for more details and latest update date.""",
@@ -496,3 +496,8 @@ class Results(BaseModel):
     artists: List[Artist] = Field(
         description="**artists** is a list of all the artists credited in the songs results."
     )
+    next_page_token: Optional[str] = Field(
+        default=None,
+        description="""**next_page_token** is set if more songs match the search : send the same search with the query parameter **page_token** set to it to get the next page.<br>
+        It expires when the database is updated.""",
+    )
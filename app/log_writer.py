@@ -0,0 +1,287 @@
+from .io_classes import AnimeType, CreditType, IntRange, SongCategory
+from .sql_calls import LOGS_PATH
+
+import queue
+import sqlite3
+import datetime
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from decouple import config
+
+"""
+    Logs of the searches, queued by the requests and written in batches by a
+    single background thread
+"""
+
+# Maximum number of logs waiting to be written, the next ones being dropped
+LOGS_QUEUE_SIZE = config("LOGS_QUEUE_SIZE", default=10000, cast=int)
+# Maximum number of logs written in a single transaction
+LOGS_BATCH_SIZE = 500
+
+CREATE_LOGS_TABLE = """CREATE TABLE IF NOT EXISTS logs(
+    date TEXT,
+    nb_results INTEGER,
+    execution_time FLOAT,
+
+    ann_id INTEGER,
+    anime_name TEXT,
+    anime_types TEXT,
+    anime_seasons TEXT,
+    anime_genres TEXT,
+    anime_tags TEXT,
+
+    song_name TEXT,
+    song_types TEXT,
+    song_categories TEXT,
+    song_difficulty_min TEXT,
+    song_difficulty_max TEXT,
+
+    artist_id INTEGER,
+    artist_name TEXT,
+    max_other_artists INTEGER,
+    group_granularity INTEGER,
+    credit_types TEXT,
+
+    partial_match BIT,
+    ignore_duplicates BIT,
+    max_results_per_search INTEGER
+)"""
+
+INSERT_LOG = """INSERT INTO logs (
+    date, nb_results, execution_time,
+    ann_id, anime_name, anime_types, anime_seasons, anime_genres, anime_tags,
+    song_name, song_types, song_categories, song_difficulty_min, song_difficulty_max,
+    artist_id, artist_name, max_other_artists, group_granularity, credit_types,
+    partial_match, ignore_duplicates, max_results_per_search
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+class LogWriter:
+    """
+    Bounded queue of logs, drained by a background thread writing each batch of
+    logs in a single transaction
+
+    Adding a log never blocks the request: when the queue is full, the log is
+    dropped and counted
+    """
+
+    def __init__(
+        self,
+        logs_path: str = LOGS_PATH,
+        queue_size: int = LOGS_QUEUE_SIZE,
+        batch_size: int = LOGS_BATCH_SIZE,
+    ):
+        self.logs_path = logs_path
+        self.batch_size = batch_size
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def add(self, log: Tuple) -> bool:
+        """
+        Queue a log to be written, unless the queue is full
+
+        Parameters
+        ----------
+        log : Tuple
+            The values of a row of the logs table, in INSERT_LOG order
+
+        Returns
+        -------
+        bool
+            True if the log was queued, False if it was dropped
+        """
+
+        try:
+            self.queue.put_nowait(log)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def write(self, connection: sqlite3.Connection, logs: List[Tuple]):
+        """
+        Write a batch of logs in a single transaction
+
+        Parameters
+        ----------
+        connection : sqlite3.Connection
+            The connection to the logs database
+        logs : List[Tuple]
+            The logs to write
+        """
+
+        try:
+            with connection:
+                connection.executemany(INSERT_LOG, logs)
+        except sqlite3.Error as error:
+            print("Logs write failed:", error)
+            with self._lock:
+                self.failed += len(logs)
+        else:
+            with self._lock:
+                self.written += len(logs)
+                self.batches += 1
+
+    def run(self):
+        """
+        Write the queued logs in batches, until a None log is queued
+        """
+
+        try:
+            connection = sqlite3.connect(self.logs_path)
+            # Readers of the logs do not block the writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(CREATE_LOGS_TABLE)
+        except sqlite3.Error as error:
+            print("Logs database could not be opened:", error)
+            return
+
+        stopping = False
+        while not stopping:
+            log = self.queue.get()
+            if log is None:
+                break
+
+            # Then take the logs queued meanwhile, without waiting for more
+            logs = [log]
+            while len(logs) < self.batch_size:
+                try:
+                    log = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if log is None:
+                    stopping = True
+                    break
+                logs.append(log)
+
+            self.write(connection, logs)
+
+        connection.close()
+
+    def start(self):
+        """
+        Start the background writer
+        """
+
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background writer once the queued logs are written
+        """
+
+        if self._thread is None:
+            return
+
+        self.queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the counters of the logs
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of logs queued, written, dropped as the queue was full and
+            failed to be written, and the number of batches written
+        """
+
+        with self._lock:
+            return {
+                "queued": self.queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches,
+            }
+
+
+log_writer = LogWriter()
+
+
+def add_logs(
+    nb_results: int = 0,
+    execution_time: float = 0,
+    ann_id: Optional[int] = None,
+    anime_name: str = None,
+    song_name: str = None,
+    artist_id: Optional[int] = None,
+    artist_name: str = None,
+    max_other_artists: int = 99,
+    group_granularity: int = 0,
+    credit_types: List[CreditType] = [
+        CreditType.vocalist,
+        CreditType.backing_vocalist,
+        CreditType.performer,
+        CreditType.composer,
+        CreditType.arranger,
+    ],
+    song_types: List[int] = [1, 2, 3],
+    song_categories: List[SongCategory] = [
+        SongCategory.Standard,
+        SongCategory.Chanting,
+        SongCategory.Character,
+        SongCategory.Instrumental,
+    ],
+    song_difficulty_range: IntRange = IntRange(min=0, max=100),
+    anime_types: List[AnimeType] = [
+        AnimeType.TV,
+        AnimeType.movie,
+        AnimeType.OVA,
+        AnimeType.special,
+        AnimeType.ONA,
+    ],
+    anime_seasons: List[str] = None,
+    anime_genres: List[str] = None,
+    anime_tags: List[str] = None,
+    partial_match: bool = True,
+    ignore_duplicates: bool = False,
+    max_results_per_search: Optional[int] = None,
+) -> None:
+    """
+    Queue the log of a search, to be written by log_writer
+
+    Lists are logged as comma separated values, and empty values as NULL
+    """
+
+    log_writer.add(
+        (
+            datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            nb_results,
+            round(execution_time, 2),
+            ann_id,
+            anime_name or None,
+            ",".join(anime_types),
+            ",".join(anime_seasons) if anime_seasons else None,
+            ",".join(anime_genres) if anime_genres else None,
+            ",".join(anime_tags) if anime_tags else None,
+            song_name or None,
+            ",".join([str(song_type) for song_type in song_types]),
+            ",".join(song_categories),
+            song_difficulty_range.min,
+            song_difficulty_range.max,
+            artist_id,
+            artist_name or None,
+            max_other_artists,
+            group_granularity,
+            ",".join(credit_types),
+            int(partial_match),
+            int(ignore_duplicates),
+            max_results_per_search,
+        )
+    )
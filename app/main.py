@@ -1,18 +1,40 @@
 from .search_database import (
+    get_anime_search_songs,
     get_anime_search_songs_list,
+    get_ann_ids_songs,
     get_ann_ids_songs_list,
+    get_song_name_search_songs,
     get_song_name_search_songs_list,
+    get_artists_ids_songs,
     get_artists_ids_songs_list,
+    get_artists_search_songs,
     get_artists_search_songs_list,
+    get_global_candidate_searches,
+    get_global_group_searches,
     get_global_search_songs_list,
+    get_global_sub_searches,
 )
 from .sql_calls import (
     connect_to_database,
     run_sql_command,
-    extract_artist_database,
-    add_logs,
+    extract_anime_genres_and_tags,
+    get_connection_pool_stats,
+    get_songs_query_templates_stats,
+    get_database_generation,
+    iter_stream_songs,
+    request_database_path,
+    connection_pool,
 )
-from .utils import format_results, format_song_types_to_integer
+from .database_reload import database_reloader, find_latest_database
+from .result_cache import RESULT_CACHE_REDIS, result_cache
+from .pagination import decode_page_token, get_page_limit
+from .search_executor import SEARCH_EXECUTOR_WORKERS, search_executor
+from .log_writer import add_logs, log_writer
+from .responses import get_result_fragments, render_results
+from .artist_graph import get_artist_graph, get_song_credits
+from .indexes import get_artist_songs_index, get_trigram_indexes_report
+from .song_store import SONG_FILTER_ENGINE, get_song_store
+from .utils import format_results, format_song_types_to_integer, stream_results
 from .io_classes import (
     Results,
     AnimeSearchParams,
@@ -24,9 +46,14 @@ from .io_classes import (
 )
 
 from random import randrange
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 import time
+import asyncio
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi_limiter import FastAPILimiter
 from fastapi_limiter.depends import RateLimiter
 import redis.asyncio as redis
@@ -51,6 +78,8 @@ For any technical questions, please create an issue on the corresponding reposit
 This API is still in development and is a work in progress.<br>
 Be aware that even though I will try to keep incompatibilies between versions at a minimum, the API is subject to change.<br>
 For performance reasons, the API is currently **limited to 350 results** per requests.<br>
+The following results can be fetched page by page with the query parameter **page_token**, see **next_page_token** in the results.<br>
+The search endpoints can stream more results as newline delimited JSON with the query parameter **stream=true**.<br>
 
 ## Endpoints
 
@@ -76,6 +105,8 @@ app = FastAPI(
 # Get .env variables
 # App
 MAX_RESULTS_PER_SEARCH = config("MAX_RESULTS_PER_SEARCH", cast=int)
+MAX_RESULTS_PER_STREAM = config("MAX_RESULTS_PER_STREAM", default=10000, cast=int)
+GLOBAL_SEARCH_TIMEOUT = config("GLOBAL_SEARCH_TIMEOUT", default=10, cast=float)
 DATABASE_PATH = config("DATABASE_PATH")
 LOGS_PATH = config("LOGS_PATH")
 
@@ -87,6 +118,9 @@ print(
     f"""
     Config:
     - MAX_RESULTS_PER_SEARCH = {MAX_RESULTS_PER_SEARCH}
+    - MAX_RESULTS_PER_STREAM = {MAX_RESULTS_PER_STREAM}
+    - SEARCH_EXECUTOR_WORKERS = {SEARCH_EXECUTOR_WORKERS}
+    - GLOBAL_SEARCH_TIMEOUT = {GLOBAL_SEARCH_TIMEOUT}
     - DATABASE_PATH = {DATABASE_PATH}
     - LOGS_PATH = {LOGS_PATH}
     - REDIS_HOST = {REDIS_HOST}
@@ -94,6 +128,132 @@ print(
 """
 )
 
+STREAM_DESCRIPTION = f"""If **stream** is set to true, the songs are sent as they are found, as newline delimited JSON (application/x-ndjson), up to {MAX_RESULTS_PER_STREAM} songs.<br>
+Each line is a single record : {{"song": ...}}, {{"anime": ...}} or {{"artist": ...}}, an anime or an artist being sent once, right before the first song referencing it.<br>
+If more songs match the search, the last line is {{"next_page_token": ...}}."""
+
+PAGE_TOKEN_DESCRIPTION = """**page_token** is the **next_page_token** of the previous page of the same search, to get the songs following it.<br>
+Songs are sorted by anime (ANN ID), song type, song number then song ID. A token expires when the database is updated (410 Gone)."""
+
+
+def get_streaming_response(
+    songs: Iterable[Tuple],
+    log_search: Callable,
+    start_time: float,
+) -> StreamingResponse:
+    """
+    Stream the songs of a search as NDJSON, read and formatted by the search executor,
+    logging the search once they are all sent
+
+    Parameters
+    ----------
+    songs : Iterable[Tuple]
+        The songs of the search, in songs_full format
+    log_search : Callable
+        add_logs with the parameters of the search
+    start_time : float
+        Time at which the search started
+
+    Returns
+    -------
+    StreamingResponse
+        The application/x-ndjson response
+    """
+
+    # Number of songs sent, known once the stream ends or is interrupted
+    nb_results = []
+
+    async def log_stream():
+        log_search(
+            execution_time=time.time() - start_time,
+            nb_results=sum(nb_results),
+            max_results_per_search=MAX_RESULTS_PER_STREAM,
+        )
+
+    return StreamingResponse(
+        stream_results(
+            get_artist_graph(),
+            songs,
+            extract_anime_genres_and_tags(),
+            nb_results.append,
+            MAX_RESULTS_PER_STREAM,
+            search_executor.run,
+        ),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(log_stream),
+    )
+
+
+def get_json_response(content: bytes, log_search: Callable, **logs: Any) -> Response:
+    """
+    Send the JSON of the results, queuing the log of the search
+
+    Parameters
+    ----------
+    content : bytes
+        The JSON of the results
+    log_search : Callable
+        add_logs with the parameters of the search
+    **logs : Any
+        The other parameters of add_logs (execution time, number of results, ...)
+
+    Returns
+    -------
+    Response
+        The application/json response
+    """
+
+    log_search(**logs)
+    return Response(content, media_type="application/json")
+
+
+def search_and_render(search: Callable, *args: Any) -> Tuple[Dict, bytes]:
+    """
+    Run a search and serialize its results, both blocking
+
+    Parameters
+    ----------
+    search : Callable
+        The search function, returning formatted results
+    *args : Any
+        The parameters of the search
+
+    Returns
+    -------
+    Tuple[Dict, bytes]
+        The results and their JSON
+    """
+
+    results = search(*args)
+    return results, render_results(results)
+
+
+def get_random_songs() -> bytes:
+    """
+    Get 50 random songs, blocking
+
+    Returns
+    -------
+    bytes
+        The JSON of the results
+    """
+
+    cursor = connect_to_database()
+
+    songIds = [randrange(39000) for _ in range(50)]
+
+    artist_graph = get_artist_graph()
+
+    # Extract every song from song IDs
+    get_songs_from_songs_ids = (
+        f"SELECT * from songs_full WHERE song_id IN ({','.join('?'*len(songIds))})"
+    )
+    songs = run_sql_command(cursor, get_songs_from_songs_ids, songIds)
+
+    results = format_results(artist_graph, songs, extract_anime_genres_and_tags())
+    return render_results(results)
+
+
 # on app start_up, connect to redis for rate limiting
 
 
@@ -103,6 +263,62 @@ async def startup():
         f"redis://{REDIS_HOST}:{REDIS_PORT}/0", encoding="utf-8", decode_responses=True
     )
     await FastAPILimiter.init(redis_db)
+    if RESULT_CACHE_REDIS:
+        result_cache.redis = redis_db
+
+    # Build the in-memory indexes now rather than on the first search
+    for name, report in database_reloader.load(find_latest_database()).items():
+        print(f"{name}:", report)
+    for malformed_link in get_artist_graph().malformed_links:
+        print("Malformed artist link:", malformed_link)
+    print("Database:", database_reloader.stats())
+
+    database_reloader.start()
+    log_writer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    log_writer.stop()
+    database_reloader.stop()
+    search_executor.shutdown()
+    connection_pool.close_all()
+
+
+@app.middleware("http")
+async def use_database_generation(request: Request, call_next):
+    # The whole request runs on the generation it started on, even during a reload
+    token = request_database_path.set(get_database_generation().database_path)
+    try:
+        return await call_next(request)
+    finally:
+        request_database_path.reset(token)
+
+
+@app.get(
+    "/api/stats",
+    description="Internal counters of the API (database connection pool, ...)",
+    dependencies=[
+        Depends(RateLimiter(times=5, seconds=15)),
+    ],
+)
+async def get_stats():
+    return {
+        "database": database_reloader.stats(),
+        "search_executor": search_executor.stats(),
+        "logs": log_writer.stats(),
+        "result_cache": result_cache.stats(),
+        "connection_pool": get_connection_pool_stats(),
+        "query_templates": get_songs_query_templates_stats(),
+        "trigram_indexes": get_trigram_indexes_report(),
+        "artist_songs_index": get_artist_songs_index().report(),
+        "artist_graph": get_artist_graph().report(),
+        "song_credits": get_song_credits().report(),
+        "result_fragments": get_result_fragments().report(),
+        "song_store": get_song_store().report()
+        if SONG_FILTER_ENGINE == "numpy"
+        else None,
+    }
 
 
 @app.post(
@@ -114,19 +330,9 @@ async def startup():
     ],
 )
 async def get_50_random_songs():
-    cursor = connect_to_database()
-
-    songIds = [randrange(39000) for _ in range(50)]
-
-    artist_database = extract_artist_database()
-
-    # Extract every song from song IDs
-    get_songs_from_songs_ids = (
-        f"SELECT * from songsFull WHERE songId IN ({','.join('?'*len(songIds))})"
+    return Response(
+        await search_executor.run(get_random_songs), media_type="application/json"
     )
-    songs = run_sql_command(cursor, get_songs_from_songs_ids, songIds)
-
-    return format_results(artist_database, songs)
 
 
 @app.post(
@@ -142,8 +348,13 @@ async def get_50_random_songs():
         Depends(RateLimiter(times=20, seconds=90)),
     ],
 )
-async def anime_search(body: AnimeSearchParams):
+async def anime_search(
+    body: AnimeSearchParams,
+    stream: bool = Query(default=False, description=STREAM_DESCRIPTION),
+    page_token: Optional[str] = Query(default=None, description=PAGE_TOKEN_DESCRIPTION),
+):
     start_time = time.time()
+    after_song_key = decode_page_token(page_token)
     if body.partial_match and len(body.anime_name) <= 3:
         raise HTTPException(
             status_code=400,
@@ -151,23 +362,8 @@ async def anime_search(body: AnimeSearchParams):
         )
 
     song_types = format_song_types_to_integer(body.song_types)
-    results = get_anime_search_songs_list(
-        body.anime_name,
-        body.partial_match,
-        body.ignore_duplicates,
-        song_types,
-        body.song_categories,
-        body.song_difficulty_range,
-        body.anime_types,
-        body.anime_seasons,
-        body.anime_genres,
-        body.anime_tags,
-        MAX_RESULTS_PER_SEARCH,
-    )
-
-    add_logs(
-        execution_time=time.time() - start_time,
-        nb_results=len(results["songs"]),
+    log_search = partial(
+        add_logs,
         anime_name=body.anime_name,
         partial_match=body.partial_match,
         ignore_duplicates=body.ignore_duplicates,
@@ -178,10 +374,61 @@ async def anime_search(body: AnimeSearchParams):
         anime_seasons=body.anime_seasons,
         anime_genres=body.anime_genres,
         anime_tags=body.anime_tags,
+    )
+
+    if stream:
+        songs = iter_stream_songs(
+            get_anime_search_songs,
+            body.anime_name,
+            body.partial_match,
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            body.anime_types,
+            body.anime_seasons,
+            body.anime_genres,
+            body.anime_tags,
+            get_page_limit(MAX_RESULTS_PER_STREAM),
+            after_song_key,
+        )
+        return get_streaming_response(songs, log_search, start_time)
+
+    results_key = result_cache.get_key(
+        "anime_search",
+        body,
         max_results_per_search=MAX_RESULTS_PER_SEARCH,
+        page_token=page_token,
     )
+    cached_results = await result_cache.get(results_key)
+    if cached_results is None:
+        results, content = await search_executor.run(
+            search_and_render,
+            get_anime_search_songs_list,
+            body.anime_name,
+            body.partial_match,
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            body.anime_types,
+            body.anime_seasons,
+            body.anime_genres,
+            body.anime_tags,
+            MAX_RESULTS_PER_SEARCH,
+            after_song_key,
+        )
+        await result_cache.set(results_key, results, content)
+    else:
+        results, content = cached_results
 
-    return results
+    return get_json_response(
+        content,
+        log_search,
+        execution_time=time.time() - start_time,
+        nb_results=len(results["songs"]),
+        max_results_per_search=MAX_RESULTS_PER_SEARCH,
+    )
 
 
 @app.post(
@@ -193,30 +440,66 @@ async def anime_search(body: AnimeSearchParams):
         Depends(RateLimiter(times=20, seconds=90)),
     ],
 )
-async def anime_ann_id_search(body: AnimeAnnIdSearchParams):
+async def anime_ann_id_search(
+    body: AnimeAnnIdSearchParams,
+    stream: bool = Query(default=False, description=STREAM_DESCRIPTION),
+    page_token: Optional[str] = Query(default=None, description=PAGE_TOKEN_DESCRIPTION),
+):
     start_time = time.time()
+    after_song_key = decode_page_token(page_token)
     song_types = format_song_types_to_integer(body.song_types)
-    results = get_ann_ids_songs_list(
-        [body.ann_id],
-        body.ignore_duplicates,
-        song_types,
-        body.song_categories,
-        body.song_difficulty_range,
-        MAX_RESULTS_PER_SEARCH,
-    )
-
-    add_logs(
-        execution_time=time.time() - start_time,
-        nb_results=len(results["songs"]),
+    log_search = partial(
+        add_logs,
         ann_id=body.ann_id,
         ignore_duplicates=body.ignore_duplicates,
         song_types=song_types,
         song_categories=body.song_categories,
         song_difficulty_range=body.song_difficulty_range,
+    )
+
+    if stream:
+        songs = iter_stream_songs(
+            get_ann_ids_songs,
+            [body.ann_id],
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            get_page_limit(MAX_RESULTS_PER_STREAM),
+            after_song_key,
+        )
+        return get_streaming_response(songs, log_search, start_time)
+
+    results_key = result_cache.get_key(
+        "anime_annid_search",
+        body,
         max_results_per_search=MAX_RESULTS_PER_SEARCH,
+        page_token=page_token,
     )
+    cached_results = await result_cache.get(results_key)
+    if cached_results is None:
+        results, content = await search_executor.run(
+            search_and_render,
+            get_ann_ids_songs_list,
+            [body.ann_id],
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            MAX_RESULTS_PER_SEARCH,
+            after_song_key,
+        )
+        await result_cache.set(results_key, results, content)
+    else:
+        results, content = cached_results
 
-    return results
+    return get_json_response(
+        content,
+        log_search,
+        execution_time=time.time() - start_time,
+        nb_results=len(results["songs"]),
+        max_results_per_search=MAX_RESULTS_PER_SEARCH,
+    )
 
 
 @app.post(
@@ -230,8 +513,13 @@ async def anime_ann_id_search(body: AnimeAnnIdSearchParams):
         Depends(RateLimiter(times=20, seconds=90)),
     ],
 )
-async def song_name_search(body: SongSearchParams):
+async def song_name_search(
+    body: SongSearchParams,
+    stream: bool = Query(default=False, description=STREAM_DESCRIPTION),
+    page_token: Optional[str] = Query(default=None, description=PAGE_TOKEN_DESCRIPTION),
+):
     start_time = time.time()
+    after_song_key = decode_page_token(page_token)
     if body.partial_match and len(body.song_name) <= 3:
         raise HTTPException(
             status_code=400,
@@ -239,23 +527,8 @@ async def song_name_search(body: SongSearchParams):
         )
 
     song_types = format_song_types_to_integer(body.song_types)
-    results = get_song_name_search_songs_list(
-        body.song_name,
-        body.partial_match,
-        body.ignore_duplicates,
-        song_types,
-        body.song_categories,
-        body.song_difficulty_range,
-        body.anime_types,
-        body.anime_seasons,
-        body.anime_genres,
-        body.anime_tags,
-        MAX_RESULTS_PER_SEARCH,
-    )
-
-    add_logs(
-        execution_time=time.time() - start_time,
-        nb_results=len(results["songs"]),
+    log_search = partial(
+        add_logs,
         song_name=body.song_name,
         partial_match=body.partial_match,
         ignore_duplicates=body.ignore_duplicates,
@@ -266,10 +539,61 @@ async def song_name_search(body: SongSearchParams):
         anime_seasons=body.anime_seasons,
         anime_genres=body.anime_genres,
         anime_tags=body.anime_tags,
+    )
+
+    if stream:
+        songs = iter_stream_songs(
+            get_song_name_search_songs,
+            body.song_name,
+            body.partial_match,
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            body.anime_types,
+            body.anime_seasons,
+            body.anime_genres,
+            body.anime_tags,
+            get_page_limit(MAX_RESULTS_PER_STREAM),
+            after_song_key,
+        )
+        return get_streaming_response(songs, log_search, start_time)
+
+    results_key = result_cache.get_key(
+        "song_name_search",
+        body,
         max_results_per_search=MAX_RESULTS_PER_SEARCH,
+        page_token=page_token,
     )
+    cached_results = await result_cache.get(results_key)
+    if cached_results is None:
+        results, content = await search_executor.run(
+            search_and_render,
+            get_song_name_search_songs_list,
+            body.song_name,
+            body.partial_match,
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            body.anime_types,
+            body.anime_seasons,
+            body.anime_genres,
+            body.anime_tags,
+            MAX_RESULTS_PER_SEARCH,
+            after_song_key,
+        )
+        await result_cache.set(results_key, results, content)
+    else:
+        results, content = cached_results
 
-    return results
+    return get_json_response(
+        content,
+        log_search,
+        execution_time=time.time() - start_time,
+        nb_results=len(results["songs"]),
+        max_results_per_search=MAX_RESULTS_PER_SEARCH,
+    )
 
 
 @app.post(
@@ -281,29 +605,17 @@ async def song_name_search(body: SongSearchParams):
         Depends(RateLimiter(times=20, seconds=90)),
     ],
 )
-async def artist_Id_search(body: ArtistIdSearchParams):
+async def artist_Id_search(
+    body: ArtistIdSearchParams,
+    stream: bool = Query(default=False, description=STREAM_DESCRIPTION),
+    page_token: Optional[str] = Query(default=None, description=PAGE_TOKEN_DESCRIPTION),
+):
     start_time = time.time()
+    after_song_key = decode_page_token(page_token)
 
     song_types = format_song_types_to_integer(body.song_types)
-    results = get_artists_ids_songs_list(
-        [body.artist_id],
-        body.max_other_artists,
-        body.group_granularity,
-        body.credit_types,
-        body.ignore_duplicates,
-        song_types,
-        body.song_categories,
-        body.song_difficulty_range,
-        body.anime_types,
-        body.anime_seasons,
-        body.anime_genres,
-        body.anime_tags,
-        MAX_RESULTS_PER_SEARCH,
-    )
-
-    add_logs(
-        execution_time=time.time() - start_time,
-        nb_results=len(results["songs"]),
+    log_search = partial(
+        add_logs,
         artist_id=body.artist_id,
         max_other_artists=body.max_other_artists,
         group_granularity=body.group_granularity,
@@ -316,10 +628,65 @@ async def artist_Id_search(body: ArtistIdSearchParams):
         anime_seasons=body.anime_seasons,
         anime_genres=body.anime_genres,
         anime_tags=body.anime_tags,
+    )
+
+    if stream:
+        songs = iter_stream_songs(
+            get_artists_ids_songs,
+            [body.artist_id],
+            body.max_other_artists,
+            body.group_granularity,
+            body.credit_types,
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            body.anime_types,
+            body.anime_seasons,
+            body.anime_genres,
+            body.anime_tags,
+            get_page_limit(MAX_RESULTS_PER_STREAM),
+            after_song_key,
+        )
+        return get_streaming_response(songs, log_search, start_time)
+
+    results_key = result_cache.get_key(
+        "artist_id_search",
+        body,
         max_results_per_search=MAX_RESULTS_PER_SEARCH,
+        page_token=page_token,
     )
+    cached_results = await result_cache.get(results_key)
+    if cached_results is None:
+        results, content = await search_executor.run(
+            search_and_render,
+            get_artists_ids_songs_list,
+            [body.artist_id],
+            body.max_other_artists,
+            body.group_granularity,
+            body.credit_types,
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            body.anime_types,
+            body.anime_seasons,
+            body.anime_genres,
+            body.anime_tags,
+            MAX_RESULTS_PER_SEARCH,
+            after_song_key,
+        )
+        await result_cache.set(results_key, results, content)
+    else:
+        results, content = cached_results
 
-    return results
+    return get_json_response(
+        content,
+        log_search,
+        execution_time=time.time() - start_time,
+        nb_results=len(results["songs"]),
+        max_results_per_search=MAX_RESULTS_PER_SEARCH,
+    )
 
 
 @app.post(
@@ -333,8 +700,13 @@ async def artist_Id_search(body: ArtistIdSearchParams):
         Depends(RateLimiter(times=20, seconds=90)),
     ],
 )
-async def artist_search(body: ArtistSearchParams):
+async def artist_search(
+    body: ArtistSearchParams,
+    stream: bool = Query(default=False, description=STREAM_DESCRIPTION),
+    page_token: Optional[str] = Query(default=None, description=PAGE_TOKEN_DESCRIPTION),
+):
     start_time = time.time()
+    after_song_key = decode_page_token(page_token)
     if body.partial_match and len(body.artist_name) <= 3:
         raise HTTPException(
             status_code=400,
@@ -342,26 +714,8 @@ async def artist_search(body: ArtistSearchParams):
         )
 
     song_types = format_song_types_to_integer(body.song_types)
-    results = get_artists_search_songs_list(
-        body.artist_name,
-        body.partial_match,
-        body.max_other_artists,
-        body.group_granularity,
-        body.credit_types,
-        body.ignore_duplicates,
-        song_types,
-        body.song_categories,
-        body.song_difficulty_range,
-        body.anime_types,
-        body.anime_seasons,
-        body.anime_genres,
-        body.anime_tags,
-        MAX_RESULTS_PER_SEARCH,
-    )
-
-    add_logs(
-        execution_time=time.time() - start_time,
-        nb_results=len(results["songs"]),
+    log_search = partial(
+        add_logs,
         artist_name=body.artist_name,
         partial_match=body.partial_match,
         max_other_artists=body.max_other_artists,
@@ -375,10 +729,67 @@ async def artist_search(body: ArtistSearchParams):
         anime_seasons=body.anime_seasons,
         anime_genres=body.anime_genres,
         anime_tags=body.anime_tags,
+    )
+
+    if stream:
+        songs = iter_stream_songs(
+            get_artists_search_songs,
+            body.artist_name,
+            body.partial_match,
+            body.max_other_artists,
+            body.group_granularity,
+            body.credit_types,
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            body.anime_types,
+            body.anime_seasons,
+            body.anime_genres,
+            body.anime_tags,
+            get_page_limit(MAX_RESULTS_PER_STREAM),
+            after_song_key,
+        )
+        return get_streaming_response(songs, log_search, start_time)
+
+    results_key = result_cache.get_key(
+        "artist_search",
+        body,
         max_results_per_search=MAX_RESULTS_PER_SEARCH,
+        page_token=page_token,
     )
+    cached_results = await result_cache.get(results_key)
+    if cached_results is None:
+        results, content = await search_executor.run(
+            search_and_render,
+            get_artists_search_songs_list,
+            body.artist_name,
+            body.partial_match,
+            body.max_other_artists,
+            body.group_granularity,
+            body.credit_types,
+            body.ignore_duplicates,
+            song_types,
+            body.song_categories,
+            body.song_difficulty_range,
+            body.anime_types,
+            body.anime_seasons,
+            body.anime_genres,
+            body.anime_tags,
+            MAX_RESULTS_PER_SEARCH,
+            after_song_key,
+        )
+        await result_cache.set(results_key, results, content)
+    else:
+        results, content = cached_results
 
-    return results
+    return get_json_response(
+        content,
+        log_search,
+        execution_time=time.time() - start_time,
+        nb_results=len(results["songs"]),
+        max_results_per_search=MAX_RESULTS_PER_SEARCH,
+    )
 
 
 @app.post(
@@ -394,7 +805,11 @@ async def artist_search(body: ArtistSearchParams):
         Depends(RateLimiter(times=20, seconds=90)),
     ],
 )
-async def global_search(body: GlobalSearch):
+async def global_search(
+    body: GlobalSearch,
+    page_token: Optional[str] = Query(default=None, description=PAGE_TOKEN_DESCRIPTION),
+):
+    after_song_key = decode_page_token(page_token)
     if (
         not body.anime_searches
         and not body.song_name_searches
@@ -436,11 +851,45 @@ async def global_search(body: GlobalSearch):
                 detail="artist_name must be at least 4 characters long if partial_match is True",
             )
 
-    songs_list = get_global_search_songs_list(
-        body.anime_searches,
-        body.song_name_searches,
-        body.artist_searches,
-        body.combination_logic,
+    results_key = result_cache.get_key(
+        "global_search",
+        body,
+        max_results_per_search=MAX_RESULTS_PER_SEARCH,
+        page_token=page_token,
     )
+    cached_results = await result_cache.get(results_key)
+    if cached_results is None:
+        groups = get_global_sub_searches(
+            body.anime_searches,
+            body.song_name_searches,
+            body.artist_searches,
+        )
+        # The candidates of the sub-searches are looked up concurrently, then the
+        # songs of each group are fetched concurrently, only returning song ids
+        deadline = time.perf_counter() + GLOBAL_SEARCH_TIMEOUT
+        try:
+            candidates = await search_executor.run_all(
+                get_global_candidate_searches(groups), GLOBAL_SEARCH_TIMEOUT
+            )
+            groups_song_ids = await search_executor.run_all(
+                get_global_group_searches(groups, candidates),
+                max(deadline - time.perf_counter(), 0),
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504,
+                detail=f"The global search took longer than {GLOBAL_SEARCH_TIMEOUT} seconds, try with more specific sub-searches",
+            )
+        results, content = await search_executor.run(
+            search_and_render,
+            get_global_search_songs_list,
+            [song_ids for group in groups_song_ids for song_ids in group],
+            body.combination_logic,
+            MAX_RESULTS_PER_SEARCH,
+            after_song_key,
+        )
+        await result_cache.set(results_key, results, content)
+    else:
+        results, content = cached_results
 
-    return songs_list
+    return Response(content, media_type="application/json")
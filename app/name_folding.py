@@ -0,0 +1,90 @@
+import re
+import unicodedata
+
+"""
+Folding of the names to their canonical form, shared by the app to fold the searches
+and by misc_scripts/convert_to_SQL.py to fold the names of the database
+"""
+
+# Characters folded to their canonical form, mirroring utils.ANIME_REGEX_REPLACE_RULES
+NAME_FOLDING_RULES = {
+    "ļĻ˥": "l",
+    "źŹ": "z",
+    "ōóòöôøӨΦο": "o",
+    "ūûúùüǖμ": "u",
+    "äãά@âàáạåā∀Λ": "a",
+    "æ": "ae",
+    "č℃": "c",
+    "ς": "s",
+    "əéêёëèē": "e",
+    "ñ": "n",
+    "²": "2",
+    "³": "3",
+    "⁵": "5",
+    "íίɪ": "i",
+    "×": "x",
+    "ßβ": "b",
+    "Я": "r",
+}
+
+NAME_FOLDING_TABLE = str.maketrans(
+    {
+        character: folded
+        for characters, folded in NAME_FOLDING_RULES.items()
+        for character in characters + characters.lower()
+    }
+)
+
+# Long vowels and romanization variants folded to a single letter
+NAME_FOLDING_DIGRAPHS = [
+    (re.compile("ou|oo|oh|wo"), "o"),
+    (re.compile("uu"), "u"),
+    (re.compile("aa"), "a"),
+    (re.compile("ii"), "i"),
+]
+
+
+def fold_name(name):
+    """
+    Fold a name to its canonical form, so that two names considered equivalent
+    by utils.ANIME_REGEX_REPLACE_RULES share the same folded form
+
+    The name is lower cased, accents of latin letters are removed (ō -> o),
+    long vowels are folded (ou/oo/oh -> o) and punctuation is replaced by spaces
+
+    Parameters
+    ----------
+    name : str
+        The name to fold
+
+    Returns
+    -------
+    str
+        The folded name
+    """
+
+    if not name:
+        return name
+
+    name = name.lower().translate(NAME_FOLDING_TABLE)
+
+    name = "".join(
+        "".join(
+            c
+            for c in unicodedata.normalize("NFD", character)
+            if not unicodedata.combining(c)
+        )
+        if "\u00c0" <= character <= "\u024f" or "\u1e00" <= character <= "\u1eff"
+        else character
+        for character in name
+    )
+
+    name = re.sub(r"[\W_]+", " ", name).strip()
+
+    folded_name = None
+    while folded_name != name:
+        folded_name = name
+        for digraph, folded in NAME_FOLDING_DIGRAPHS:
+            name = digraph.sub(folded, name)
+
+    return name
@@ -0,0 +1,114 @@
+from .sql_calls import get_database_path, get_database_version, get_song_key
+
+import json
+import base64
+import hashlib
+import binascii
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+"""
+    Continuation tokens of the search results, the key of the last song of a page
+    (see SONGS_ORDER) bound to the database that served it
+"""
+
+
+def get_database_fingerprint() -> str:
+    """
+    Get a fingerprint of the database of the current request, the same in every
+    worker serving it
+
+    Returns
+    -------
+    str
+        The fingerprint of the path and version of the database file
+    """
+
+    database_path = get_database_path()
+    return hashlib.sha256(
+        json.dumps([database_path, get_database_version(database_path)]).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def get_page_limit(max_results_per_search: int) -> int:
+    """
+    Get the number of songs to search for a page, one more than the page to know
+    if another page follows it
+
+    Parameters
+    ----------
+    max_results_per_search : int
+        Maximum number of results per page, -1 for no limit
+
+    Returns
+    -------
+    int
+        The number of songs to search, -1 for no limit
+    """
+
+    if max_results_per_search == -1:
+        return -1
+    return max_results_per_search + 1
+
+
+def encode_page_token(song: Tuple) -> str:
+    """
+    Get the token of the page following a song, on the database of the current request
+
+    Parameters
+    ----------
+    song : Tuple
+        The last song of the page, in songs_full format
+
+    Returns
+    -------
+    str
+        The opaque token, URL safe
+    """
+
+    token = json.dumps([get_database_fingerprint(), *get_song_key(song)])
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(page_token: Optional[str]) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Get the key of the last song of the previous page from its token
+
+    Parameters
+    ----------
+    page_token : Optional[str]
+        The token given with the previous page, None for the first page
+
+    Returns
+    -------
+    Optional[Tuple[int, int, int, int]]
+        The key of the last song of the previous page, None for the first page
+
+    Raises
+    ------
+    HTTPException
+        400 if the token is invalid, 410 if it was given by another version of the database
+    """
+
+    if page_token is None:
+        return None
+
+    try:
+        database_fingerprint, *song_key = json.loads(
+            base64.urlsafe_b64decode(page_token.encode("ascii"))
+        )
+        song_key = tuple(int(value) for value in song_key)
+    except (ValueError, TypeError, UnicodeError, binascii.Error):
+        song_key = ()
+
+    if len(song_key) != 4:
+        raise HTTPException(status_code=400, detail="page_token is not a valid token")
+
+    if database_fingerprint != get_database_fingerprint():
+        raise HTTPException(
+            status_code=410,
+            detail="page_token expired as the database was updated, the search needs to start over",
+        )
+
+    return song_key
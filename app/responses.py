@@ -0,0 +1,190 @@
+from .io_classes import AnimeEntry, Artist, SongEntry
+from .sql_calls import database_cache
+
+import os
+import sys
+import json
+from typing import Any, Dict, List, Tuple, Type
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+"""
+    JSON fragments of the songs, anime and artists of the responses, so that a
+    response is assembled from bytes instead of being validated and serialized
+    through the Results model
+"""
+
+
+def serialize_entry(model: Type[BaseModel], entry: Dict) -> bytes:
+    """
+    Serialize an entry of the results as FastAPI does for a response_model
+
+    Parameters
+    ----------
+    model : Type[BaseModel]
+        The model of the entry (SongEntry, AnimeEntry or Artist)
+    entry : Dict
+        The entry, as formatted by format_results
+
+    Returns
+    -------
+    bytes
+        The JSON of the entry, as in a JSONResponse
+    """
+
+    return json.dumps(
+        jsonable_encoder(model.parse_obj(entry)),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class ResultFragments:
+    """
+    Formatted songs and anime of a database, and the JSON of every formatted
+    entry, songs, anime and artists
+
+    The fragments are keyed by the id of the formatted entries, which are kept
+    alive with them, entries formatted elsewhere (e.g. parsed from Redis) are
+    serialized on the fly
+    """
+
+    def __init__(self):
+        # song_id -> formatted song
+        self.songs: Dict[int, Dict] = {}
+        # ann_id -> formatted anime
+        self.anime: Dict[int, Dict] = {}
+        # id of the formatted entry -> (formatted entry, JSON)
+        self.fragments: Dict[int, Tuple[Dict, bytes]] = {}
+
+    def add(self, model: Type[BaseModel], entry: Dict) -> Dict:
+        """
+        Serialize a formatted entry, unless it already is
+
+        Parameters
+        ----------
+        model : Type[BaseModel]
+            The model of the entry (SongEntry, AnimeEntry or Artist)
+        entry : Dict
+            The formatted entry, must not be modified afterwards
+
+        Returns
+        -------
+        Dict
+            The formatted entry
+        """
+
+        if id(entry) not in self.fragments:
+            self.fragments[id(entry)] = (entry, serialize_entry(model, entry))
+        return entry
+
+    def get_fragment(self, model: Type[BaseModel], entry: Dict) -> bytes:
+        """
+        Get the JSON of an entry of the results
+
+        Parameters
+        ----------
+        model : Type[BaseModel]
+            The model of the entry (SongEntry, AnimeEntry or Artist)
+        entry : Dict
+            The entry
+
+        Returns
+        -------
+        bytes
+            The JSON of the entry
+        """
+
+        fragment = self.fragments.get(id(entry))
+        if fragment is not None and fragment[0] is entry:
+            return fragment[1]
+        return serialize_entry(model, entry)
+
+    def render(self, results: Dict[str, List[Dict]]) -> bytes:
+        """
+        Assemble the JSON of the results from the fragments of their entries
+
+        Parameters
+        ----------
+        results : Dict[str, List[Dict]]
+            The results, as formatted by format_results
+
+        Returns
+        -------
+        bytes
+            The JSON of the results, as serialized through the Results model
+        """
+
+        return b"".join(
+            [
+                b'{"songs":[',
+                b",".join(self.get_fragment(SongEntry, s) for s in results["songs"]),
+                b'],"anime":[',
+                b",".join(self.get_fragment(AnimeEntry, a) for a in results["anime"]),
+                b'],"artists":[',
+                b",".join(self.get_fragment(Artist, a) for a in results["artists"]),
+                b'],"next_page_token":',
+                json.dumps(results.get("next_page_token")).encode("utf-8"),
+                b"}",
+            ]
+        )
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Get the number of formatted entries in the current worker
+
+        Returns
+        -------
+        Dict[str, Any]
+            The number of formatted songs, anime and fragments, and the size of the fragments
+        """
+
+        return {
+            "pid": os.getpid(),
+            "songs": len(self.songs),
+            "anime": len(self.anime),
+            "fragments": len(self.fragments),
+            "fragments_bytes": sum(
+                sys.getsizeof(fragment) for _, fragment in self.fragments.values()
+            ),
+        }
+
+
+@database_cache()
+def get_result_fragments(database_path=None) -> ResultFragments:
+    """
+    Get the formatted entries and fragments of a database
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
+    Returns
+    -------
+    ResultFragments
+        The formatted entries and fragments, filled by the responses
+    """
+
+    return ResultFragments()
+
+
+def render_results(results: Dict[str, List[Dict]]) -> bytes:
+    """
+    Serialize results formatted on the database of the current request
+
+    Parameters
+    ----------
+    results : Dict[str, List[Dict]]
+        The results, as formatted by format_results
+
+    Returns
+    -------
+    bytes
+        The JSON of the results, as serialized through the Results model
+    """
+
+    return get_result_fragments().render(results)
@@ -0,0 +1,277 @@
+from .sql_calls import get_database_path, get_database_version
+
+import json
+import time
+import hashlib
+import threading
+from enum import Enum
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from decouple import config
+from pydantic import BaseModel
+
+"""
+    Cache of the search results, keyed on the normalized request body and scoped
+    to the database serving the request
+"""
+
+# Maximum size of the results kept in memory by each worker, in bytes of JSON
+RESULT_CACHE_MAX_BYTES = config("RESULT_CACHE_MAX_BYTES", default=67108864, cast=int)
+# Seconds before a cached result expires, in memory and in Redis
+RESULT_CACHE_TTL = config("RESULT_CACHE_TTL", default=3600, cast=int)
+# Share the results between the workers through Redis
+RESULT_CACHE_REDIS = config("RESULT_CACHE_REDIS", default=False, cast=bool)
+
+RESULT_CACHE_REDIS_PREFIX = "anisongdb:results:"
+
+
+def normalize_request(value: Any) -> Any:
+    """
+    Normalize a request body so that equivalent requests are equal: enums are
+    replaced by their value and lists of values are sorted, lists of sub-searches
+    keep their order
+
+    Parameters
+    ----------
+    value : Any
+        The request body, as returned by BaseModel.dict()
+
+    Returns
+    -------
+    Any
+        The normalized request body
+    """
+
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {key: normalize_request(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize_request(item) for item in value]
+        if any(isinstance(item, (dict, list)) for item in items):
+            return items
+        return sorted(items, key=json.dumps)
+    return value
+
+
+class ResultCache:
+    """
+    Two tier cache of the search results: a LRU in memory, bounded in bytes and
+    in time, and optionally Redis, shared by every worker
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        ttl: int = RESULT_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.redis = None
+
+        # key -> (expiration time, results, JSON of the results)
+        self._entries: "OrderedDict[str, Tuple[float, Dict, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.redis_errors = 0
+
+    def get_key(self, endpoint: str, body: BaseModel, **parameters: Any) -> str:
+        """
+        Get the cache key of a request, on the database of the current request
+
+        Parameters
+        ----------
+        endpoint : str
+            The name of the endpoint
+        body : BaseModel
+            The request body, with its defaults filled in by pydantic
+        **parameters : Any
+            The other parameters changing the results (e.g. the maximum number of results)
+
+        Returns
+        -------
+        str
+            The cache key
+        """
+
+        database_path = get_database_path()
+        request = {
+            "endpoint": endpoint,
+            "database": [database_path, get_database_version(database_path)],
+            "parameters": normalize_request(parameters),
+            "body": normalize_request(body.dict()),
+        }
+
+        return hashlib.sha256(
+            json.dumps(request, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def get_local(self, key: str) -> Optional[Tuple[Dict, bytes]]:
+        """
+        Get the results of a request from memory
+
+        Parameters
+        ----------
+        key : str
+            The cache key, see get_key
+
+        Returns
+        -------
+        Optional[Tuple[Dict, bytes]]
+            The results and their JSON, None if they are not in memory or expired
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expiration, results, content = entry
+            if expiration <= self.clock():
+                del self._entries[key]
+                self._bytes -= len(content)
+                self.expirations += 1
+                return None
+
+            self._entries.move_to_end(key)
+            return results, content
+
+    def set_local(self, key: str, results: Dict, content: bytes):
+        """
+        Save the results of a request in memory, evicting the least recently used
+        results above max_bytes
+
+        Parameters
+        ----------
+        key : str
+            The cache key, see get_key
+        results : Dict
+            The results
+        content : bytes
+            The JSON of the results, its size counts against max_bytes
+        """
+
+        if len(content) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key)[2])
+
+            self._entries[key] = (self.clock() + self.ttl, results, content)
+            self._bytes += len(content)
+
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted_content) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted_content)
+                self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Tuple[Dict, bytes]]:
+        """
+        Get the results of a request, from memory then from Redis
+
+        Parameters
+        ----------
+        key : str
+            The cache key, see get_key
+
+        Returns
+        -------
+        Optional[Tuple[Dict, bytes]]
+            The results and their JSON, None if they are not cached
+        """
+
+        cached_results = self.get_local(key)
+        if cached_results is not None:
+            self.hits += 1
+            return cached_results
+
+        if self.redis is not None:
+            try:
+                serialized_results = await self.redis.get(
+                    RESULT_CACHE_REDIS_PREFIX + key
+                )
+            except Exception:
+                self.redis_errors += 1
+                serialized_results = None
+
+            if serialized_results is not None:
+                if isinstance(serialized_results, str):
+                    serialized_results = serialized_results.encode("utf-8")
+                results = json.loads(serialized_results)
+                self.set_local(key, results, serialized_results)
+                self.redis_hits += 1
+                return results, serialized_results
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, results: Dict, content: Optional[bytes] = None):
+        """
+        Save the results of a request in memory and in Redis
+
+        Parameters
+        ----------
+        key : str
+            The cache key, see get_key
+        results : Dict
+            The results
+        content : Optional[bytes]
+            The JSON of the results as sent in the response, serialized if not given
+        """
+
+        serialized_results = content or json.dumps(results).encode("utf-8")
+        self.set_local(key, results, serialized_results)
+
+        if self.redis is not None:
+            try:
+                await self.redis.set(
+                    RESULT_CACHE_REDIS_PREFIX + key, serialized_results, ex=self.ttl
+                )
+            except Exception:
+                self.redis_errors += 1
+
+    def clear(self):
+        """
+        Remove every result from memory
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache counters
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of hits (in memory and in Redis), misses, evictions,
+            expirations and Redis errors, and the size of the results in memory
+        """
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "redis_errors": self.redis_errors,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+result_cache = ResultCache()
@@ -3,119 +3,121 @@ from .io_classes import (
     CreditType,
     SongCategory,
     IntRange,
-    SongEntry,
     CombinationLogic,
     AnimeSearchParams,
     ArtistSearchParams,
     SongSearchParams,
 )
-from .utils import format_results, get_regex_search, format_song_types_to_integer
+from .utils import format_results, get_name_search, format_song_types_to_integer
 from .sql_calls import (
     connect_to_database,
-    extract_artist_database,
-    get_songs_ids_from_artist_ids,
-    get_possibles_songs_from_filters,
-    get_artist_ids_from_regex,
+    extract_anime_genres_and_tags,
+    get_artist_ids_from_folded_name,
+)
+from .pagination import encode_page_token, get_page_limit
+from .result_cache import normalize_request
+from .artist_graph import (
+    ArtistGraph,
+    SongCredits,
+    get_artist_graph,
+    get_credit_mask,
+    get_song_credits,
+)
+from .indexes import (
+    get_artist_songs_index,
+    get_trigram_index,
+    sorted_array_contains,
+)
+from .song_store import iter_songs_from_filters
+
+import json
+from array import array
+from bisect import bisect_left
+from functools import partial
+from itertools import chain, islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
 )
-
-import re
-from typing import Any, List, Set, Tuple, Dict
 
 """
     This file contains the functions to search the database
 """
 
-
-def get_member_list_flat(
-    artist_database: Dict,
-    credit_types: List[CreditType],
-    artists: Dict,
-    bottom: bool = True,
-) -> List[int]:
+# Number of anime whose songs are fetched per query in the anime search
+ANN_IDS_CHUNK_SIZE = 100
+
+# Filters of the sub-searches of the global search, their songs being fetched once
+# for the sub-searches sharing the same filters
+SHARED_FILTERS = [
+    "song_types",
+    "song_categories",
+    "song_difficulty_range",
+    "anime_types",
+    "anime_seasons",
+    "anime_genres",
+    "anime_tags",
+]
+
+
+def get_artists_line_ups_members(
+    artist_graph: ArtistGraph, artist_ids: List[int], credit_mask: int
+) -> List[Tuple[int, List[Tuple[FrozenSet[int], int]]]]:
     """
-    get a list of all the members of a group and its subgroups
+    Get the flattened members of every line up of the searched artists, once per search
 
     Parameters
     ----------
-    artist_database : Dict
-        The artist database
-    credit_type : List[CreditType]
-        The credit type of the members that we whould keep
-    artists : Dict
-        The list of artists and their line up
-    bottom : bool, optional
-        If True, will skip subgroups and go directly to the lower tier possible, by default True
+    artist_graph : ArtistGraph
+        The artist graph
+    artist_ids : List[int]
+        The list of artist IDs to check
+    credit_mask : int
+        The credit types of the members to keep, see get_credit_mask
 
     Returns
     -------
-    List[int]
-        The list of all the members of the group and its subgroups
+    List[Tuple[int, List[Tuple[FrozenSet[int], int]]]]
+        For each artist, the flattened members and the size of each of its line ups,
+        the artist alone being its only line up if it is not a group
     """
 
-    member_list = set()
-
-    for artist in artists:
-        if int(artist["line_up_id"]) == -1:
-            member_list.add(artist["id"])
-
-        else:
-            if not bottom:
-                member_list.add(artist["id"])
-
-            line_up = artist_database[artist["id"]]["line_ups"][
-                int(artist["line_up_id"])
-            ]
-            members = [
-                member
-                for member in line_up["members"]
-                if member["role_type"] in credit_types
+    artists_line_ups_members = []
+    for artist_id in artist_ids:
+        line_ups = [[(artist_id, -1)]]
+        if artist_graph.get_line_up_count(artist_id):
+            line_ups = [
+                artist_graph.get_line_up(artist_id, line_up_id)
+                for line_up_id in range(artist_graph.get_line_up_count(artist_id))
             ]
 
-            for member in get_member_list_flat(
-                artist_database,
-                credit_types,
-                members,
-                bottom=bottom,
-            ):
-                member_list.add(member)
-
-    return list(member_list)
-
-
-def compare_two_artist_list(list1: List[int], list2: List[int]) -> Tuple[int, int]:
-    """
-    Compare two lists of artists
-
-    Parameters
-    ----------
-    list1 : List[int]
-        The first list of artists
-    list2 : List[int]
-        The second list of artists
-
-    Returns
-    -------
-    Tuple[int, int]
-        The amount of people present in both lists and the amount of people in list1 that are not in list2
-    """
-
-    same_count = 0  # amount of people present in both
-    add_count = 0  # additional people in list1 compared to list2
-
-    for artist in list1:
-        if artist not in list2:
-            add_count += 1
-        else:
-            same_count += 1
+        artists_line_ups_members.append(
+            (
+                artist_id,
+                [
+                    (artist_graph.get_members(line_up, credit_mask), len(line_up))
+                    for line_up in line_ups
+                ],
+            )
+        )
 
-    return same_count, add_count
+    return artists_line_ups_members
 
 
 def check_meets_artists_requirements(
-    artist_database: Dict,
+    song_credits: SongCredits,
     song: List[Any],
-    credit_types: List[CreditType],
-    artist_ids: List[int],
+    credit_mask: int,
+    artists_line_ups_members: List[Tuple[int, List[Tuple[FrozenSet[int], int]]]],
     group_granularity: int,
     max_other_artists: int,
 ) -> bool:
@@ -124,14 +126,15 @@ def check_meets_artists_requirements(
 
     Parameters
     ----------
-    artist_database : Dict
-        The artist database
+    song_credits : SongCredits
+        The flattened credits of every song
     song : List[Any]
         The song to check
-    credit_types : List[CreditType]
-        The credit type of the members that we should keep
-    artist_ids : List[int]
-        The list of artist IDs to check
+    credit_mask : int
+        The credit types of the members that we should keep, see get_credit_mask
+    artists_line_ups_members : List[Tuple[int, List[Tuple[FrozenSet[int], int]]]]
+        The flattened line ups of the artists to check,
+        see get_artists_line_ups_members
     group_granularity : int
         The group granularity
     max_other_artists : int
@@ -143,72 +146,20 @@ def check_meets_artists_requirements(
         If the song meets the artist requirements
     """
 
-    song_artists = (
-        [
-            {"id": artist, "line_up_id": int(line_up)}
-            for artist, line_up in zip(song[15].split(","), song[16].split(","))
-        ]
-        if song[15]
-        else []
-    )
-    song_artists_flat = get_member_list_flat(
-        artist_database, credit_types, song_artists
-    )
-
-    song_performers = (
-        [
-            {"id": artist, "line_up_id": int(line_up)}
-            for artist, line_up in zip(song[17].split(","), song[18].split(","))
-        ]
-        if song[17]
-        else []
-    )
-
-    song_composers = (
-        [
-            {"id": artist, "line_up_id": int(line_up)}
-            for artist, line_up in zip(song[19].split(","), song[20].split(","))
-        ]
-        if song[19]
-        else []
-    )
-
-    song_arrangers = (
-        [
-            {"id": artist, "line_up_id": int(line_up)}
-            for artist, line_up in zip(song[21].split(","), song[22].split(","))
-        ]
-        if song[21]
-        else []
-    )
-
-    support_artists = get_member_list_flat(
-        artist_database,
-        credit_types,
-        song_performers + song_composers + song_arrangers,
-        bottom=False,
-    )
+    song_artists_flat, support_artists = song_credits.get_members(song[7], credit_mask)
 
-    for artist_id in artist_ids:
+    for artist_id, line_ups_members in artists_line_ups_members:
         if artist_id in support_artists:
             return True
 
-        line_ups = [[{"id": str(artist_id), "line_up_id": -1}]]
-        if artist_database[str(artist_id)]["line_ups"]:
-            line_ups = artist_database[str(artist_id)]["line_ups"]
-
-        for line_up in line_ups:
-            if "members" in line_up:
-                line_up = line_up["members"]
-            checked_list = get_member_list_flat(artist_database, credit_types, line_up)
-            present_artist, additional_artist = compare_two_artist_list(
-                song_artists_flat, checked_list
-            )
+        for checked_list, line_up_size in line_ups_members:
+            present_artist = len(song_artists_flat & checked_list)
+            additional_artist = len(song_artists_flat) - present_artist
 
             if (
                 present_artist >= 1
                 and additional_artist <= max_other_artists
-                and present_artist >= min(group_granularity, len(line_up))
+                and present_artist >= min(group_granularity, line_up_size)
             ):
                 return True
 
@@ -216,9 +167,9 @@ def check_meets_artists_requirements(
 
 
 def expand_artist_ids(
-    artist_database: Dict,
+    artist_graph: ArtistGraph,
     credit_types: List[CreditType],
-    artist_ids: List[str],
+    artist_ids: List[int],
     group_granularity: int,
 ) -> Set[int]:
     """
@@ -226,11 +177,11 @@ def expand_artist_ids(
 
     Parameters
     ----------
-    artist_database : Dict
-        Artist database
+    artist_graph : ArtistGraph
+        Artist graph
     credit_types : List[CreditType]
         Authorized credit type, ignore any relation that is not of these type
-    artist_ids : List[str]
+    artist_ids : List[int]
         List of artist ids to expand
     group_granularity : int
         Group granularity
@@ -244,28 +195,114 @@ def expand_artist_ids(
     expanded_ids = set()
 
     for artist_id in artist_ids:
-        artist = artist_database.get(str(artist_id), None)
-
-        if artist is None:
+        if artist_id not in artist_graph:
             raise ValueError(f"Artist with id {artist_id} not found in database")
 
         expanded_ids.add(artist_id)
-
-        for group in artist.get("groups", []):
-            expanded_ids.add(group["id"])
+        expanded_ids.update(artist_graph.get_groups(artist_id))
 
         if group_granularity > 0:
-            for line_up in artist.get("line_ups", []):
-                for member in get_member_list_flat(
-                    artist_database, credit_types, line_up["members"], bottom=False
-                ):
-                    expanded_ids.add(member)
+            for line_up_id in range(artist_graph.get_line_up_count(artist_id)):
+                expanded_ids |= artist_graph.get_members(
+                    artist_graph.get_line_up(artist_id, line_up_id),
+                    get_credit_mask(credit_types),
+                    bottom=False,
+                )
 
     return expanded_ids
 
 
-def get_artists_ids_songs_list(
-    artist_ids: List[str],
+def get_artists_songs_candidates(
+    artist_ids: List[int],
+    max_other_artists: int,
+    group_granularity: int,
+    credit_types: List[CreditType],
+) -> Tuple[List[int], Optional[Callable[[Tuple], bool]]]:
+    """
+    Get the songs crediting the artists, and the check of the artists requirements
+    the songs have to meet
+
+    Parameters
+    ----------
+    artist_ids : List[int]
+        List of artist ids
+    max_other_artists : int
+        Maximum number of other artists that can sings along the searched artists
+    group_granularity : int
+        Granularity of the group search
+    credit_types : List[CreditType] ['vocalists', 'backing-vocalists', 'composers', 'arrangers', 'performers']
+        List of credit types to search
+
+    Returns
+    -------
+    Tuple[List[int], Optional[Callable[[Tuple], bool]]]
+        The sorted ids of the candidate songs, and the check of a song in songs_full
+        format, None if no artist is in the database
+    """
+
+    artist_graph = get_artist_graph()
+
+    artist_ids = [int(artist_id) for artist_id in artist_ids]
+    artist_ids = [artist_id for artist_id in artist_ids if artist_id in artist_graph]
+
+    if not artist_ids:
+        return [], None
+
+    expanded_ids = expand_artist_ids(
+        artist_graph, credit_types, artist_ids, group_granularity
+    )
+
+    song_ids = get_artist_songs_index().get_song_ids(expanded_ids, credit_types)
+
+    credit_mask = get_credit_mask(credit_types)
+    meets_artists_requirements = partial(
+        check_meets_artists_requirements,
+        get_song_credits(),
+        credit_mask=credit_mask,
+        artists_line_ups_members=get_artists_line_ups_members(
+            artist_graph, artist_ids, credit_mask
+        ),
+        group_granularity=group_granularity,
+        max_other_artists=max_other_artists,
+    )
+
+    return song_ids, meets_artists_requirements
+
+
+def get_results_page(
+    songs: Iterable[Tuple], max_results_per_search: int
+) -> Dict[str, Any]:
+    """
+    Format a page of results, with the token of the next page if there is one
+
+    Parameters
+    ----------
+    songs : Iterable[Tuple]
+        The songs of the search, in SONGS_ORDER, up to get_page_limit(max_results_per_search)
+    max_results_per_search : int
+        Maximum number of results per page
+
+    Returns
+    -------
+    Dict[str, Any]
+        The songs, anime and artists of the page, and next_page_token the token
+        of the next page (None for the last page)
+    """
+
+    songs = list(songs)
+
+    next_page_token = None
+    if max_results_per_search != -1 and len(songs) > max_results_per_search:
+        songs = songs[:max_results_per_search]
+        next_page_token = encode_page_token(songs[-1])
+
+    results = format_results(get_artist_graph(), songs, extract_anime_genres_and_tags())
+    results["next_page_token"] = next_page_token
+    return results
+
+
+def get_artists_ids_songs(
+    artist_ids: List[int],
     max_other_artists: int,
     group_granularity: int,
     credit_types: List[CreditType],
@@ -278,13 +315,14 @@ def get_artists_ids_songs_list(
     anime_genres: List[str],
     anime_tags: List[str],
     max_results_per_search: int,
-) -> List[SongEntry]:
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Iterable[Tuple]:
     """
-    Get the list of songs from a list of artist ids
+    Get the songs from a list of artist ids, read lazily from the database
 
     Parameters
     ----------
-    artist_ids : List[str]
+    artist_ids : List[int]
         List of artist ids
     max_other_artists : int
         Maximum number of other artists that can sings along the searched artists
@@ -310,31 +348,25 @@ def get_artists_ids_songs_list(
         List of anime tags to search
     max_results_per_search : int
         Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
 
     Returns
     -------
-    List[SongEntry]
-        List of songs fitting the search
+    Iterable[Tuple]
+        The songs fitting the search, in songs_full format
     """
 
-    cursor = connect_to_database()
-
-    artist_database = extract_artist_database()
-
-    for artist_id in artist_ids:
-        if str(artist_id) not in artist_database:
-            artist_ids.pop(artist_ids.index(artist_id))
-
-    if not artist_ids:
-        return []
-
-    expanded_ids = expand_artist_ids(
-        artist_database, credit_types, artist_ids, group_granularity
+    song_ids, meets_artists_requirements = get_artists_songs_candidates(
+        artist_ids, max_other_artists, group_granularity, credit_types
     )
+    if meets_artists_requirements is None:
+        return []
 
-    song_ids = get_songs_ids_from_artist_ids(cursor, expanded_ids, credit_types)
+    cursor = connect_to_database()
 
-    possible_songs = get_possibles_songs_from_filters(
+    # The songs are read until enough of them meet the artists requirements
+    possible_songs = iter_songs_from_filters(
         cursor,
         song_ids=song_ids,
         ignore_duplicates=ignore_duplicates,
@@ -345,28 +377,19 @@ def get_artists_ids_songs_list(
         anime_seasons=anime_seasons,
         anime_genres=anime_genres,
         anime_tags=anime_tags,
-        max_results_per_search=max_results_per_search,
+        after_song_key=after_song_key,
     )
 
-    filtered_songs = [
-        song
-        for song in possible_songs
-        if check_meets_artists_requirements(
-            artist_database,
-            song,
-            credit_types,
-            artist_ids,
-            group_granularity,
-            max_other_artists,
-        )
-    ]
+    songs = (song for song in possible_songs if meets_artists_requirements(song))
 
-    return format_results(artist_database, filtered_songs)
+    if max_results_per_search != -1:
+        songs = islice(songs, max_results_per_search)
 
+    return songs
 
-def get_artists_search_songs_list(
-    artist_name: str,
-    partial_match: bool,
+
+def get_artists_ids_songs_list(
+    artist_ids: List[int],
     max_other_artists: int,
     group_granularity: int,
     credit_types: List[CreditType],
@@ -379,12 +402,15 @@ def get_artists_search_songs_list(
     anime_genres: List[str],
     anime_tags: List[str],
     max_results_per_search: int,
-) -> List[SongEntry]:
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Dict[str, Any]:
     """
-    artist_name : str
-        Name of the artist to search
-    partial_match : bool
-        If true, keep partial matches
+    Get the list of songs from a list of artist ids
+
+    Parameters
+    ----------
+    artist_ids : List[int]
+        List of artist ids
     max_other_artists : int
         Maximum number of other artists that can sings along the searched artists
     group_granularity : int
@@ -409,21 +435,16 @@ def get_artists_search_songs_list(
         List of anime tags to search
     max_results_per_search : int
         Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
 
     Returns
     -------
-    List[SongEntry]
-        List of songs fitting the search
+    Dict[str, Any]
+        The page of results fitting the search, see get_results_page
     """
 
-    cursor = connect_to_database()
-
-    artist_search = get_regex_search(artist_name, partial_match, swap_words=True)
-
-    artist_ids = get_artist_ids_from_regex(cursor, artist_search)
-    artist_ids = [str(artist_id) for artist_id in artist_ids]
-
-    return get_artists_ids_songs_list(
+    songs = get_artists_ids_songs(
         artist_ids,
         max_other_artists,
         group_granularity,
@@ -436,60 +457,46 @@ def get_artists_search_songs_list(
         anime_seasons,
         anime_genres,
         anime_tags,
-        max_results_per_search,
+        get_page_limit(max_results_per_search),
+        after_song_key,
     )
 
+    return get_results_page(songs, max_results_per_search)
 
-def get_ann_ids_songs_list(
-    ann_ids: List[int],
-    ignore_duplicates: bool,
-    song_types: List[int],
-    song_categories: List[SongCategory],
-    song_difficulty_range: IntRange,
-    max_results_per_search: int,
-) -> List[SongEntry]:
+
+def get_artist_ids_from_search(artist_name: str, partial_match: bool) -> List[int]:
     """
-    Get the song list from an ann_id
+    Get the ids of the artists matching an artist name search
 
     Parameters
     ----------
-    ignore_duplicates : bool
-        Ignore duplicate songs
-    song_types : list[int]
-        List of authorized song types (opening:1, ending:2, insert:3)
-    song_categories : List[SongCategory] ['Standard', 'Chanting', 'Character', 'Instrumental']
-        List of song categories to search
-    song_difficulty_range : IntRange {min: int, max: int}
-        Range of difficulty to search
-    max_results_per_search : int
-        Maximum number of results per search
+    artist_name : str
+        Name of the artist to search
+    partial_match : bool
+        If true, keep partial matches
 
     Returns
     -------
-    List[SongEntry]
-        List of songs fitting the search
+    List[int]
+        The ids of the matching artists
     """
 
-    cursor = connect_to_database()
-
-    artist_database = extract_artist_database()
-
-    songs = get_possibles_songs_from_filters(
-        cursor,
-        ann_ids=ann_ids,
-        ignore_duplicates=ignore_duplicates,
-        song_types=song_types,
-        song_categories=song_categories,
-        song_difficulty_range=song_difficulty_range,
-        max_results_per_search=max_results_per_search,
+    artist_search = get_name_search(artist_name, partial_match, swap_words=True)
+    artist_ids = (
+        get_trigram_index("artist").search(artist_search) if partial_match else None
     )
+    if artist_ids is not None:
+        return artist_ids[:50]
 
-    return format_results(artist_database, songs)
+    return get_artist_ids_from_folded_name(connect_to_database(), artist_search)
 
 
-def get_anime_search_songs_list(
-    anime_name,
-    partial_match,
+def get_artists_search_songs(
+    artist_name: str,
+    partial_match: bool,
+    max_other_artists: int,
+    group_granularity: int,
+    credit_types: List[CreditType],
     ignore_duplicates: bool,
     song_types: List[int],
     song_categories: List[SongCategory],
@@ -498,17 +505,24 @@ def get_anime_search_songs_list(
     anime_seasons: List[str],
     anime_genres: List[str],
     anime_tags: List[str],
-    max_results_per_search,
-) -> List[SongEntry]:
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Iterable[Tuple]:
     """
-    Get the song list from the anime name search
+    Get the songs from the artist name search, read lazily from the database
 
     Parameters
     ----------
-    anime_name : str
-        Name of the anime to search
+    artist_name : str
+        Name of the artist to search
     partial_match : bool
         If true, keep partial matches
+    max_other_artists : int
+        Maximum number of other artists that can sings along the searched artists
+    group_granularity : int
+        Granularity of the group search
+    credit_types : List[CreditType] ['vocalists', 'backing-vocalists', 'composers', 'arrangers', 'performers']
+        List of credit types to search
     ignore_duplicates : bool
         Ignore duplicate songs
     song_types : list[int]
@@ -527,45 +541,41 @@ def get_anime_search_songs_list(
         List of anime tags to search
     max_results_per_search : int
         Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
 
     Returns
     -------
-    List[SongEntry]
-        List of songs fitting the search
+    Iterable[Tuple]
+        The songs fitting the search, in songs_full format
     """
 
-    artist_database = extract_artist_database()
-    cursor = connect_to_database()
+    artist_ids = get_artist_ids_from_search(artist_name, partial_match)
 
-    get_possible_songs = get_possibles_songs_from_filters(
-        cursor,
-        ignore_duplicates=ignore_duplicates,
-        song_types=song_types,
-        song_categories=song_categories,
-        song_difficulty_range=song_difficulty_range,
-        anime_types=anime_types,
-        anime_seasons=anime_seasons,
-        anime_genres=anime_genres,
-        anime_tags=anime_tags,
+    return get_artists_ids_songs(
+        artist_ids,
+        max_other_artists,
+        group_granularity,
+        credit_types,
+        ignore_duplicates,
+        song_types,
+        song_categories,
+        song_difficulty_range,
+        anime_types,
+        anime_seasons,
+        anime_genres,
+        anime_tags,
+        max_results_per_search,
+        after_song_key,
     )
 
-    anime_search = get_regex_search(anime_name, partial_match, swap_words=False)
-
-    output_songs = []
-    for song in get_possible_songs:
-        names = {song[1], song[2], song[3]}.union(
-            song[4].split(r"\$") if song[4] else []
-        )
-
-        if any(re.match(anime_search, name.lower()) for name in names if name):
-            output_songs.append(song)
 
-    return format_results(artist_database, output_songs)
-
-
-def get_song_name_search_songs_list(
-    song_name: str,
+def get_artists_search_songs_list(
+    artist_name: str,
     partial_match: bool,
+    max_other_artists: int,
+    group_granularity: int,
+    credit_types: List[CreditType],
     ignore_duplicates: bool,
     song_types: List[int],
     song_categories: List[SongCategory],
@@ -575,16 +585,23 @@ def get_song_name_search_songs_list(
     anime_genres: List[str],
     anime_tags: List[str],
     max_results_per_search: int,
-) -> List[SongEntry]:
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Dict[str, Any]:
     """
-    Get the song list from the song name search
+    Get the song list from the artist name search
 
     Parameters
     ----------
-    song_name : str
-        Name of the song to search
+    artist_name : str
+        Name of the artist to search
     partial_match : bool
         If true, keep partial matches
+    max_other_artists : int
+        Maximum number of other artists that can sings along the searched artists
+    group_granularity : int
+        Granularity of the group search
+    credit_types : List[CreditType] ['vocalists', 'backing-vocalists', 'composers', 'arrangers', 'performers']
+        List of credit types to search
     ignore_duplicates : bool
         Ignore duplicate songs
     song_types : list[int]
@@ -603,23 +620,416 @@ def get_song_name_search_songs_list(
         List of anime tags to search
     max_results_per_search : int
         Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
 
     Returns
     -------
-    List[SongEntry]
-        List of songs fitting the search
+    Dict[str, Any]
+        The page of results fitting the search, see get_results_page
     """
 
-    artist_database = extract_artist_database()
-    song_name_regex = get_regex_search(song_name, partial_match)
+    songs = get_artists_search_songs(
+        artist_name,
+        partial_match,
+        max_other_artists,
+        group_granularity,
+        credit_types,
+        ignore_duplicates,
+        song_types,
+        song_categories,
+        song_difficulty_range,
+        anime_types,
+        anime_seasons,
+        anime_genres,
+        anime_tags,
+        get_page_limit(max_results_per_search),
+        after_song_key,
+    )
 
-    cursor = connect_to_database()
+    return get_results_page(songs, max_results_per_search)
 
-    songs = get_possibles_songs_from_filters(
-        cursor,
-        song_name_regex=song_name_regex,
-        ignore_duplicates=ignore_duplicates,
-        song_types=song_types,
+
+def get_ann_ids_songs(
+    ann_ids: List[int],
+    ignore_duplicates: bool,
+    song_types: List[int],
+    song_categories: List[SongCategory],
+    song_difficulty_range: IntRange,
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Iterable[Tuple]:
+    """
+    Get the songs from a list of ann_ids, read lazily from the database
+
+    Parameters
+    ----------
+    ann_ids : List[int]
+        List of ANN ids
+    ignore_duplicates : bool
+        Ignore duplicate songs
+    song_types : list[int]
+        List of authorized song types (opening:1, ending:2, insert:3)
+    song_categories : List[SongCategory] ['Standard', 'Chanting', 'Character', 'Instrumental']
+        List of song categories to search
+    song_difficulty_range : IntRange {min: int, max: int}
+        Range of difficulty to search
+    max_results_per_search : int
+        Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
+
+    Returns
+    -------
+    Iterable[Tuple]
+        The songs fitting the search, in songs_full format
+    """
+
+    cursor = connect_to_database()
+
+    return iter_songs_from_filters(
+        cursor,
+        ann_ids=ann_ids,
+        ignore_duplicates=ignore_duplicates,
+        song_types=song_types,
+        song_categories=song_categories,
+        song_difficulty_range=song_difficulty_range,
+        max_results_per_search=max_results_per_search,
+        after_song_key=after_song_key,
+    )
+
+
+def get_ann_ids_songs_list(
+    ann_ids: List[int],
+    ignore_duplicates: bool,
+    song_types: List[int],
+    song_categories: List[SongCategory],
+    song_difficulty_range: IntRange,
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Get the song list from an ann_id
+
+    Parameters
+    ----------
+    ann_ids : List[int]
+        List of ANN ids
+    ignore_duplicates : bool
+        Ignore duplicate songs
+    song_types : list[int]
+        List of authorized song types (opening:1, ending:2, insert:3)
+    song_categories : List[SongCategory] ['Standard', 'Chanting', 'Character', 'Instrumental']
+        List of song categories to search
+    song_difficulty_range : IntRange {min: int, max: int}
+        Range of difficulty to search
+    max_results_per_search : int
+        Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
+
+    Returns
+    -------
+    Dict[str, Any]
+        The page of results fitting the search, see get_results_page
+    """
+
+    songs = get_ann_ids_songs(
+        ann_ids,
+        ignore_duplicates,
+        song_types,
+        song_categories,
+        song_difficulty_range,
+        get_page_limit(max_results_per_search),
+        after_song_key,
+    )
+
+    return get_results_page(songs, max_results_per_search)
+
+
+def iter_songs_from_ann_ids(
+    cursor: Any,
+    ann_ids: List[int],
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]],
+    ignore_duplicates: bool,
+    **filters: Any,
+) -> Iterator[Tuple]:
+    """
+    Fetch the songs of the anime by chunks of ann_ids, in SONGS_ORDER, the next
+    chunk being fetched only once the songs of the previous one are consumed
+
+    Duplicates are found across every anime, their songs are then fetched at once
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        The cursor of the database to run the command
+    ann_ids : List[int]
+        The ids of the anime to fetch the songs of
+    max_results_per_search : int
+        Maximum number of results per chunk
+    after_song_key : Optional[Tuple[int, int, int, int]]
+        Only fetch the songs after this key, None to fetch every song
+    ignore_duplicates : bool
+        Ignore duplicate songs
+    **filters : Any
+        The other filters of get_possibles_songs_from_filters
+
+    Returns
+    -------
+    Iterator[Tuple]
+        The songs fitting the filters
+    """
+
+    ann_ids = sorted(ann_ids)
+    if not ann_ids:
+        return
+
+    chunk_size = ANN_IDS_CHUNK_SIZE
+    if ignore_duplicates:
+        chunk_size = len(ann_ids)
+    elif after_song_key is not None:
+        # The anime before the previous page have no songs left
+        ann_ids = ann_ids[bisect_left(ann_ids, after_song_key[0]) :]
+
+    for i in range(0, len(ann_ids), chunk_size):
+        yield from iter_songs_from_filters(
+            cursor,
+            ann_ids=ann_ids[i : i + chunk_size],
+            ignore_duplicates=ignore_duplicates,
+            max_results_per_search=max_results_per_search,
+            after_song_key=after_song_key,
+            **filters,
+        )
+
+
+def get_anime_search_songs(
+    anime_name: str,
+    partial_match: bool,
+    ignore_duplicates: bool,
+    song_types: List[int],
+    song_categories: List[SongCategory],
+    song_difficulty_range: IntRange,
+    anime_types: List[AnimeType],
+    anime_seasons: List[str],
+    anime_genres: List[str],
+    anime_tags: List[str],
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Iterable[Tuple]:
+    """
+    Get the songs from the anime name search, read lazily from the database
+
+    Parameters
+    ----------
+    anime_name : str
+        Name of the anime to search
+    partial_match : bool
+        If true, keep partial matches
+    ignore_duplicates : bool
+        Ignore duplicate songs
+    song_types : list[int]
+        List of authorized song types (opening:1, ending:2, insert:3)
+    song_categories : List[SongCategory] ['Standard', 'Chanting', 'Character', 'Instrumental']
+        List of song categories to search
+    song_difficulty_range : IntRange {min: int, max: int}
+        Range of difficulty to search
+    anime_types : List[AnimeType] ['TV', 'movie', 'OVA', 'special', 'ONA']
+        List of anime types to search
+    anime_seasons : List[str]
+        List of anime seasons to search (ex: ['Winter 2001', 'Spring 2022'])
+    anime_genres : List[str]
+        List of anime genres to search
+    anime_tags : List[str]
+        List of anime tags to search
+    max_results_per_search : int
+        Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
+
+    Returns
+    -------
+    Iterable[Tuple]
+        The songs fitting the search, in songs_full format
+    """
+
+    anime_search = get_name_search(anime_name, partial_match, swap_words=False)
+
+    cursor = connect_to_database()
+
+    filters = {
+        "ignore_duplicates": ignore_duplicates,
+        "song_types": song_types,
+        "song_categories": song_categories,
+        "song_difficulty_range": song_difficulty_range,
+        "anime_types": anime_types,
+        "anime_seasons": anime_seasons,
+        "anime_genres": anime_genres,
+        "anime_tags": anime_tags,
+    }
+
+    # First match the names of each anime once in the anime index
+    ann_ids = get_trigram_index("anime").search(anime_search)
+
+    if ann_ids is None:
+        # Searches too short to be indexed are matched in the database
+        songs = iter_songs_from_filters(
+            cursor,
+            anime_name_search=anime_search,
+            max_results_per_search=max_results_per_search,
+            after_song_key=after_song_key,
+            **filters,
+        )
+    else:
+        # Then fetch the songs of the matching anime only
+        songs = iter_songs_from_ann_ids(
+            cursor, ann_ids, max_results_per_search, after_song_key, **filters
+        )
+
+    if max_results_per_search != -1:
+        songs = islice(songs, max_results_per_search)
+
+    return songs
+
+
+def get_anime_search_songs_list(
+    anime_name: str,
+    partial_match: bool,
+    ignore_duplicates: bool,
+    song_types: List[int],
+    song_categories: List[SongCategory],
+    song_difficulty_range: IntRange,
+    anime_types: List[AnimeType],
+    anime_seasons: List[str],
+    anime_genres: List[str],
+    anime_tags: List[str],
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Get the song list from the anime name search
+
+    Parameters
+    ----------
+    anime_name : str
+        Name of the anime to search
+    partial_match : bool
+        If true, keep partial matches
+    ignore_duplicates : bool
+        Ignore duplicate songs
+    song_types : list[int]
+        List of authorized song types (opening:1, ending:2, insert:3)
+    song_categories : List[SongCategory] ['Standard', 'Chanting', 'Character', 'Instrumental']
+        List of song categories to search
+    song_difficulty_range : IntRange {min: int, max: int}
+        Range of difficulty to search
+    anime_types : List[AnimeType] ['TV', 'movie', 'OVA', 'special', 'ONA']
+        List of anime types to search
+    anime_seasons : List[str]
+        List of anime seasons to search (ex: ['Winter 2001', 'Spring 2022'])
+    anime_genres : List[str]
+        List of anime genres to search
+    anime_tags : List[str]
+        List of anime tags to search
+    max_results_per_search : int
+        Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
+
+    Returns
+    -------
+    Dict[str, Any]
+        The page of results fitting the search, see get_results_page
+    """
+
+    songs = get_anime_search_songs(
+        anime_name,
+        partial_match,
+        ignore_duplicates,
+        song_types,
+        song_categories,
+        song_difficulty_range,
+        anime_types,
+        anime_seasons,
+        anime_genres,
+        anime_tags,
+        get_page_limit(max_results_per_search),
+        after_song_key,
+    )
+
+    return get_results_page(songs, max_results_per_search)
+
+
+def get_song_name_search_songs(
+    song_name: str,
+    partial_match: bool,
+    ignore_duplicates: bool,
+    song_types: List[int],
+    song_categories: List[SongCategory],
+    song_difficulty_range: IntRange,
+    anime_types: List[AnimeType],
+    anime_seasons: List[str],
+    anime_genres: List[str],
+    anime_tags: List[str],
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Iterable[Tuple]:
+    """
+    Get the songs from the song name search, read lazily from the database
+
+    Parameters
+    ----------
+    song_name : str
+        Name of the song to search
+    partial_match : bool
+        If true, keep partial matches
+    ignore_duplicates : bool
+        Ignore duplicate songs
+    song_types : list[int]
+        List of authorized song types (opening:1, ending:2, insert:3)
+    song_categories : List[SongCategory] ['Standard', 'Chanting', 'Character', 'Instrumental']
+        List of song categories to search
+    song_difficulty_range : IntRange {min: int, max: int}
+        Range of difficulty to search
+    anime_types : List[AnimeType] ['TV', 'movie', 'OVA', 'special', 'ONA']
+        List of anime types to search
+    anime_seasons : List[str]
+        List of anime seasons to search (ex: ['Winter 2001', 'Spring 2022'])
+    anime_genres : List[str]
+        List of anime genres to search
+    anime_tags : List[str]
+        List of anime tags to search
+    max_results_per_search : int
+        Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
+
+    Returns
+    -------
+    Iterable[Tuple]
+        The songs fitting the search, in songs_full format
+    """
+
+    song_name_search = get_name_search(song_name, partial_match)
+
+    # Partial searches are answered by the in-memory trigram index
+    song_ids = (
+        get_trigram_index("song").search(song_name_search) if partial_match else None
+    )
+    if song_ids is not None:
+        if not song_ids:
+            return []
+        song_name_search = None
+
+    cursor = connect_to_database()
+
+    return iter_songs_from_filters(
+        cursor,
+        song_ids=song_ids or [],
+        song_name_search=song_name_search,
+        ignore_duplicates=ignore_duplicates,
+        song_types=song_types,
         song_categories=song_categories,
         song_difficulty_range=song_difficulty_range,
         anime_types=anime_types,
@@ -627,82 +1037,280 @@ def get_song_name_search_songs_list(
         anime_genres=anime_genres,
         anime_tags=anime_tags,
         max_results_per_search=max_results_per_search,
+        after_song_key=after_song_key,
+    )
+
+
+def get_song_name_search_songs_list(
+    song_name: str,
+    partial_match: bool,
+    ignore_duplicates: bool,
+    song_types: List[int],
+    song_categories: List[SongCategory],
+    song_difficulty_range: IntRange,
+    anime_types: List[AnimeType],
+    anime_seasons: List[str],
+    anime_genres: List[str],
+    anime_tags: List[str],
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Get the song list from the song name search
+
+    Parameters
+    ----------
+    song_name : str
+        Name of the song to search
+    partial_match : bool
+        If true, keep partial matches
+    ignore_duplicates : bool
+        Ignore duplicate songs
+    song_types : list[int]
+        List of authorized song types (opening:1, ending:2, insert:3)
+    song_categories : List[SongCategory] ['Standard', 'Chanting', 'Character', 'Instrumental']
+        List of song categories to search
+    song_difficulty_range : IntRange {min: int, max: int}
+        Range of difficulty to search
+    anime_types : List[AnimeType] ['TV', 'movie', 'OVA', 'special', 'ONA']
+        List of anime types to search
+    anime_seasons : List[str]
+        List of anime seasons to search (ex: ['Winter 2001', 'Spring 2022'])
+    anime_genres : List[str]
+        List of anime genres to search
+    anime_tags : List[str]
+        List of anime tags to search
+    max_results_per_search : int
+        Maximum number of results per search
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
+
+    Returns
+    -------
+    Dict[str, Any]
+        The page of results fitting the search, see get_results_page
+    """
+
+    songs = get_song_name_search_songs(
+        song_name,
+        partial_match,
+        ignore_duplicates,
+        song_types,
+        song_categories,
+        song_difficulty_range,
+        anime_types,
+        anime_seasons,
+        anime_genres,
+        anime_tags,
+        get_page_limit(max_results_per_search),
+        after_song_key,
     )
 
-    return format_results(artist_database, songs)
+    return get_results_page(songs, max_results_per_search)
+
+
+# Search functions of each type of sub-search of the global search
+SUB_SEARCH_FUNCTIONS = {
+    "anime": get_anime_search_songs,
+    "song_name": get_song_name_search_songs,
+    "artist": get_artists_search_songs,
+}
 
 
-def hashable_dict(to_make_hashable_dict: Dict) -> Tuple:
+def get_song_ids(search: Callable, **parameters: Any) -> array:
     """
-    Convert a dictionary to a hashable tuple of its key-value pairs,
-    with any nested dictionaries or lists converted to hashable tuples recursively.
+    Run a search for all its songs, keeping only their ids
 
     Parameters
     ----------
-    to_make_hashable_dict : Dict
-        The dictionary to convert
+    search : Callable
+        The search function, returning songs in songs_full format
+    **parameters : Any
+        The parameters of the search, but max_results_per_search
 
     Returns
     -------
-    Tuple
-        The hashable tuples of key-value pairs
-    """
-    if not isinstance(to_make_hashable_dict, dict):
-        return to_make_hashable_dict
-    items = []
-    for key, value in to_make_hashable_dict.items():
-        if isinstance(value, dict):
-            items.append((key, hashable_dict(value)))
-        elif isinstance(value, list):
-            items.append((key, tuple(hashable_dict(x) for x in value)))
-        else:
-            items.append((key, value))
-    return tuple(sorted(items))
+    array
+        The sorted array of the song ids fitting the search
+    """
+
+    return array(
+        "i",
+        sorted({song[7] for song in search(**parameters, max_results_per_search=-1)}),
+    )
 
 
 def combine_results(
-    results: List[List[SongEntry]], combination_logic: CombinationLogic
-) -> List[SongEntry]:
+    song_ids: List[array], combination_logic: CombinationLogic
+) -> array:
     """
-    Combine the results of the different searches
+    Combine the song ids of the different searches
 
     Parameters
     ----------
-    results : List[List[SongEntry]]
-        List of results from the different searches
+    song_ids : List[array]
+        The sorted arrays of song ids of the different searches
     combination_logic : CombinationLogic | ENUM : AND or OR
         Logic to combine the searches
 
     Returns
     -------
-    List[SongEntry]
-        List of songs fitting the search
+    array
+        The sorted array of the song ids fitting the search
     """
 
     if combination_logic == "AND":
-        # Convert each dictionary to a hashable tuple of its key-value pairs
-        sets = [set(hashable_dict(d) for d in r) for r in results]
-        # Take the intersection of the sets
-        intersection = set.intersection(*sets)
-        # Convert each tuple back to a dictionary
-        return [dict(t) for t in intersection]
-    elif combination_logic == "OR":
-        # Convert each dictionary to a hashable tuple of its key-value pairs
-        sets = [set(hashable_dict(d) for d in r) for r in results]
-        # Take the union of the sets
-        union = set.union(*sets)
-        # Convert each tuple back to a dictionary
-        return [dict(t) for t in union]
+        # Starting from the shortest array, keep the ids found in every other one
+        song_ids = sorted(song_ids, key=len)
+        combined_ids = song_ids[0]
+        for other_ids in song_ids[1:]:
+            combined_ids = array(
+                "i", (id for id in combined_ids if sorted_array_contains(other_ids, id))
+            )
+        return combined_ids
 
+    return array("i", sorted(set(chain.from_iterable(song_ids))))
 
-def get_global_search_songs_list(
+
+def get_sub_search_candidates(
+    search_type: str, parameters: Dict[str, Any], filters: Dict[str, Any]
+) -> Tuple[Optional[str], Sequence[int], Optional[Callable[[Tuple], bool]]]:
+    """
+    Get the candidate songs of a sub-search of the global search from the in-memory
+    indexes, before its filters
+
+    Parameters
+    ----------
+    search_type : str
+        The type of the sub-search : anime, song_name or artist
+    parameters : Dict[str, Any]
+        The parameters of the sub-search, but its filters
+    filters : Dict[str, Any]
+        The filters of the sub-search, see SHARED_FILTERS
+
+    Returns
+    -------
+    Tuple[Optional[str], Sequence[int], Optional[Callable[[Tuple], bool]]]
+        The column of the candidates (ann_id or song_id), their sorted ids and the
+        check the songs have to meet. The sub-searches not answered by the indexes
+        (searches too short to be indexed, exact song names) are searched on their
+        own instead, with None as column and the sorted ids of their songs
+    """
+
+    if search_type == "anime":
+        anime_search = get_name_search(
+            parameters["anime_name"], parameters["partial_match"], swap_words=False
+        )
+        ann_ids = get_trigram_index("anime").search(anime_search)
+        if ann_ids is not None:
+            return "ann_id", ann_ids, None
+
+    elif search_type == "song_name":
+        song_name_search = get_name_search(
+            parameters["song_name"], parameters["partial_match"]
+        )
+        if parameters["partial_match"]:
+            song_ids = get_trigram_index("song").search(song_name_search)
+            if song_ids is not None:
+                return "song_id", song_ids, None
+
+    else:
+        song_ids, meets_artists_requirements = get_artists_songs_candidates(
+            get_artist_ids_from_search(
+                parameters["artist_name"], parameters["partial_match"]
+            ),
+            parameters["max_other_artists"],
+            parameters["group_granularity"],
+            parameters["credit_types"],
+        )
+        return "song_id", song_ids, meets_artists_requirements
+
+    song_ids = get_song_ids(SUB_SEARCH_FUNCTIONS[search_type], **parameters, **filters)
+    return None, song_ids, None
+
+
+def get_shared_filters_song_ids(
+    filters: Dict[str, Any],
+    sub_searches: List[Tuple[str, Dict[str, Any]]],
+    candidates: List[Tuple[Optional[str], Sequence[int], Optional[Callable]]],
+) -> List[array]:
+    """
+    Get the song ids of sub-searches of the global search sharing the same filters,
+    the songs fitting the filters being fetched once for all of them, and only the
+    ids of the songs matching each sub-search being kept
+
+    Parameters
+    ----------
+    filters : Dict[str, Any]
+        The filters shared by the sub-searches, see SHARED_FILTERS
+    sub_searches : List[Tuple[str, Dict[str, Any]]]
+        The type and the other parameters of each sub-search
+    candidates : List[Tuple[Optional[str], Sequence[int], Optional[Callable]]]
+        The candidates of each sub-search, see get_sub_search_candidates
+
+    Returns
+    -------
+    List[array]
+        The sorted array of song ids of each sub-search
+    """
+
+    cursor = connect_to_database()
+
+    song_ids = [None] * len(sub_searches)
+    for i, (column, ids, _) in enumerate(candidates):
+        if column is None:
+            song_ids[i] = ids
+
+    for column, key in [("ann_id", 0), ("song_id", 7)]:
+        # The ids, the names and artists already kept if duplicates are ignored,
+        # and the check of each sub-search with candidates in this column
+        column_searches = [
+            (set(ids), set() if parameters["ignore_duplicates"] else None, check, i)
+            for i, ((_, parameters), (candidate_column, ids, check)) in enumerate(
+                zip(sub_searches, candidates)
+            )
+            if candidate_column == column
+        ]
+        if not column_searches:
+            continue
+
+        candidate_ids = sorted(set().union(*[ids for ids, *_ in column_searches]))
+        matches = {i: [] for *_, i in column_searches}
+
+        # The songs fitting the filters among the candidates of any sub-search are
+        # read once, in SONGS_ORDER, only the ids of their matching songs being kept
+        songs = (
+            iter_songs_from_filters(cursor, **{f"{column}s": candidate_ids}, **filters)
+            if candidate_ids
+            else []
+        )
+        for song in songs:
+            for ids, kept_names, check, i in column_searches:
+                if song[key] not in ids:
+                    continue
+                # Keep the first song of each name and artist, in SONGS_ORDER
+                if kept_names is not None:
+                    if (song[11], song[12]) in kept_names:
+                        continue
+                    kept_names.add((song[11], song[12]))
+                if check is None or check(song):
+                    matches[i].append(song[7])
+
+        for i, matches_ids in matches.items():
+            song_ids[i] = array("i", sorted(matches_ids))
+
+    return song_ids
+
+
+def get_global_sub_searches(
     anime_searches: List[AnimeSearchParams],
     song_name_searches: List[SongSearchParams],
     artist_searches: List[ArtistSearchParams],
-    combination_logic: CombinationLogic,
-) -> List[SongEntry]:
+) -> List[Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]]:
     """
-    Get the song list from the global search
+    Get the sub-searches of the global search, grouped by their filters so that the
+    songs fitting them are fetched once per group, identical sub-searches being
+    searched once
 
     Parameters
     ----------
@@ -712,31 +1320,138 @@ def get_global_search_songs_list(
         List of song name searches
     artist_searches : List[ArtistSearchParams]
         List of artist searches
-    combination_logic : CombinationLogic | ENUM : AND or OR
-        Logic to combine the searches
 
     Returns
     -------
-    List[SongEntry]
-        List of songs fitting the search
+    List[Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]]
+        The groups of sub-searches : their shared filters, and the type and the other
+        parameters of each sub-search
     """
 
-    results = []
+    groups = {}
+
+    for search_type, searches in [
+        ("anime", anime_searches),
+        ("song_name", song_name_searches),
+        ("artist", artist_searches),
+    ]:
+        for search in searches:
+            parameters = dict(search)
+            parameters["song_types"] = format_song_types_to_integer(
+                parameters["song_types"]
+            )
+            filters = {name: parameters.pop(name) for name in SHARED_FILTERS}
 
-    for anime_search in anime_searches:
-        anime_search.song_types = format_song_types_to_integer(anime_search.song_types)
-        results.append(get_anime_search_songs_list(**dict(anime_search)))
+            # Equivalent requests have the same keys, as for the result cache
+            request = normalize_request(search.dict())
+            filters_key = json.dumps([request[name] for name in SHARED_FILTERS])
+            search_key = json.dumps([search_type, request], sort_keys=True)
 
-    for song_name_search in song_name_searches:
-        song_name_search.song_types = format_song_types_to_integer(
-            song_name_search.song_types
-        )
-        results.append(get_song_name_search_songs_list(**dict(song_name_search)))
+            _, group_searches = groups.setdefault(filters_key, (filters, {}))
+            group_searches.setdefault(search_key, (search_type, parameters))
+
+    return [
+        (filters, list(sub_searches.values()))
+        for filters, sub_searches in groups.values()
+    ]
+
+
+def get_global_candidate_searches(
+    groups: List[Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]]
+) -> List[Callable[[], Tuple]]:
+    """
+    Get the candidate lookups of every sub-search of the global search
 
-    for artist_search in artist_searches:
-        artist_search.song_types = format_song_types_to_integer(
-            artist_search.song_types
+    Parameters
+    ----------
+    groups : List[Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]]
+        The groups of sub-searches, see get_global_sub_searches
+
+    Returns
+    -------
+    List[Callable[[], Tuple]]
+        The lookups, to be run independently, each one returning the candidates of
+        a sub-search once called (see get_sub_search_candidates), in group order
+    """
+
+    return [
+        partial(get_sub_search_candidates, search_type, parameters, filters)
+        for filters, sub_searches in groups
+        for search_type, parameters in sub_searches
+    ]
+
+
+def get_global_group_searches(
+    groups: List[Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]],
+    candidates: List[Tuple],
+) -> List[Callable[[], List[array]]]:
+    """
+    Get the shared fetch of the songs of each group of sub-searches of the global
+    search, among the candidates of its sub-searches
+
+    Parameters
+    ----------
+    groups : List[Tuple[Dict[str, Any], List[Tuple[str, Dict[str, Any]]]]]
+        The groups of sub-searches, see get_global_sub_searches
+    candidates : List[Tuple]
+        The results of get_global_candidate_searches
+
+    Returns
+    -------
+    List[Callable[[], List[array]]]
+        The fetches, to be run independently, each one returning the sorted arrays
+        of song ids of the sub-searches of a group once called
+    """
+
+    candidates = iter(candidates)
+    return [
+        partial(
+            get_shared_filters_song_ids,
+            filters,
+            sub_searches,
+            list(islice(candidates, len(sub_searches))),
         )
-        results.append(get_artists_search_songs_list(**dict(artist_search)))
+        for filters, sub_searches in groups
+    ]
+
+
+def get_global_search_songs_list(
+    song_ids: List[array],
+    combination_logic: CombinationLogic,
+    max_results_per_search: int,
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Dict[str, Any]:
+    """
+    Get the song list from the song ids of the sub-searches of the global search
+
+    Parameters
+    ----------
+    song_ids : List[array]
+        The sorted arrays of song ids of the sub-searches
+    combination_logic : CombinationLogic | ENUM : AND or OR
+        Logic to combine the sub-searches
+    max_results_per_search : int
+        Maximum number of results per search, once combined
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key, to continue a previous page, by default ignored
+
+    Returns
+    -------
+    Dict[str, Any]
+        The formatted results
+    """
+
+    song_ids = combine_results(song_ids, combination_logic)
+    if not song_ids:
+        return get_results_page([], max_results_per_search)
+
+    cursor = connect_to_database()
+
+    songs = iter_songs_from_filters(
+        cursor,
+        song_ids=song_ids,
+        max_results_per_search=get_page_limit(max_results_per_search),
+        after_song_key=after_song_key,
+    )
 
-    return combine_results(results, combination_logic)
+    return get_results_page(songs, max_results_per_search)
@@ -0,0 +1,199 @@
+from .sql_calls import query_deadline
+
+import time
+import asyncio
+import sqlite3
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from decouple import config
+
+"""
+    Dedicated pool of threads running the blocking work of the searches (SQLite
+    queries, name matching and formatting), so that the event loop only
+    handles I/O
+"""
+
+# Number of threads running the searches of each worker
+SEARCH_EXECUTOR_WORKERS = config("SEARCH_EXECUTOR_WORKERS", default=4, cast=int)
+
+
+class SearchExecutor:
+    """
+    Bounded pool of threads, counting the tasks waiting for a thread and the time
+    they waited
+
+    Tasks run in the context of the coroutine submitting them, so that they see the
+    database of its request
+    """
+
+    def __init__(self, max_workers: int = SEARCH_EXECUTOR_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="search"
+        )
+        self._lock = threading.Lock()
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.running = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_run_time = 0.0
+
+    def _run_task(
+        self,
+        submit_time: float,
+        context: contextvars.Context,
+        function: Callable,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Run a task in a thread of the pool, once it was waiting in the queue
+        """
+
+        start_time = time.perf_counter()
+        with self._lock:
+            self.queue_depth -= 1
+            self.running += 1
+            self.total_wait_time += start_time - submit_time
+            self.max_wait_time = max(self.max_wait_time, start_time - submit_time)
+
+        try:
+            return context.run(function, *args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.total_run_time += time.perf_counter() - start_time
+
+    async def run(self, function: Callable, *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking function in a thread of the pool, waiting for a free thread
+
+        Parameters
+        ----------
+        function : Callable
+            The blocking function
+        *args : Any
+            Its positional arguments
+        **kwargs : Any
+            Its keyword arguments
+
+        Returns
+        -------
+        Any
+            The result of the function
+        """
+
+        with self._lock:
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+        future = self._executor.submit(
+            self._run_task,
+            time.perf_counter(),
+            contextvars.copy_context(),
+            function,
+            *args,
+            **kwargs,
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A task still in the queue is dropped, a running one runs to its end
+            if future.cancel():
+                with self._lock:
+                    self.queue_depth -= 1
+                    self.cancelled += 1
+            raise
+
+    async def run_all(
+        self, functions: List[Callable], timeout: Optional[float] = None
+    ) -> List[Any]:
+        """
+        Run blocking functions concurrently in the threads of the pool, within a
+        time budget
+
+        Parameters
+        ----------
+        functions : List[Callable]
+            The blocking functions, without arguments
+        timeout : Optional[float]
+            Seconds to wait for all of them, None to wait without limit
+
+        Returns
+        -------
+        List[Any]
+            The results of the functions, in the same order
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If they are not all done in time, those still queued being dropped and
+            the queries of the running ones being aborted
+        """
+
+        # The tasks run in a copy of the context, with the deadline of their queries
+        token = None
+        if timeout is not None:
+            token = query_deadline.set(time.monotonic() + timeout)
+
+        tasks = [asyncio.ensure_future(self.run(function)) for function in functions]
+        try:
+            return await asyncio.wait_for(asyncio.gather(*tasks), timeout)
+        except sqlite3.OperationalError:
+            # A query aborted at the deadline, right before the timeout
+            if token is not None and time.monotonic() > token.var.get():
+                raise asyncio.TimeoutError
+            raise
+        finally:
+            # Drop the other functions when one of them failed or timed out
+            for task in tasks:
+                task.cancel()
+            if token is not None:
+                query_deadline.reset(token)
+
+    def shutdown(self):
+        """
+        Stop the threads once the running tasks are done, dropping the queued ones
+        """
+
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the counters of the pool
+
+        Returns
+        -------
+        Dict[str, Any]
+            The number of threads, of tasks waiting for a thread (now and at most),
+            running, completed and dropped, and the average and maximum time a task
+            waited for a thread, in milliseconds
+        """
+
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "running": self.running,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "average_wait_time_ms": round(
+                    1000 * self.total_wait_time / max(self.completed, 1), 3
+                ),
+                "max_wait_time_ms": round(1000 * self.max_wait_time, 3),
+                "average_run_time_ms": round(
+                    1000 * self.total_run_time / max(self.completed, 1), 3
+                ),
+            }
+
+
+search_executor = SearchExecutor()
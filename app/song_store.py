@@ -0,0 +1,473 @@
+from .io_classes import AnimeType, SongCategory, IntRange
+from .indexes import get_trigram_index
+from .sql_calls import (
+    connect_to_database,
+    extract_anime_genres_and_tags,
+    get_database_path,
+    get_database_version,
+    get_song_key,
+    get_songs_query_from_filters,
+    run_sql_command,
+    NameSearch,
+    SONGS_ORDER,
+)
+
+import sqlite3
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from decouple import config
+
+"""
+    Optional in-memory engine evaluating the song filters as vectorized masks
+    over a columnar copy of the song catalogue
+"""
+
+# Engine used to filter the songs : sqlite or numpy
+SONG_FILTER_ENGINE = config("SONG_FILTER_ENGINE", default="sqlite")
+
+
+def encode_column(values: List[Any]) -> Tuple[np.ndarray, Dict[Any, int]]:
+    """
+    Dictionary encode a column of values, None being encoded as -1
+
+    Parameters
+    ----------
+    values : List[Any]
+        The values of the column
+
+    Returns
+    -------
+    Tuple[np.ndarray, Dict[Any, int]]
+        The int16 codes of the column and the mapping from value to code
+    """
+
+    mapping = {}
+    codes = np.empty(len(values), dtype=np.int16)
+
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        if value not in mapping:
+            mapping[value] = len(mapping)
+        codes[i] = mapping[value]
+
+    return codes, mapping
+
+
+class BitmapIndex:
+    """
+    One bitmap per distinct value of each categorical field, over the song positions
+
+    Bitmaps are packed 8 songs per byte, a filter being answered by OR-ing the bitmaps
+    of the values of a field, then AND-ing the fields together. Set fields (a song
+    having several values, such as the genres of its anime) AND the bitmaps of their
+    values instead. Results are cached per filter combination.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, np.ndarray],
+        mappings: Dict[str, Dict],
+        set_fields: Dict[str, Dict[Any, np.ndarray]] = {},
+    ):
+        """
+        Build the bitmaps
+
+        Parameters
+        ----------
+        fields : Dict[str, np.ndarray]
+            The codes of each field, one per song
+        mappings : Dict[str, Dict]
+            The mapping from value to code of each field
+        set_fields : Dict[str, Dict[Any, np.ndarray]], optional
+            The boolean mask of the songs having each value of each set field
+        """
+
+        self.songs_count = len(next(iter(fields.values()), []))
+        self.bitmaps: Dict[str, Dict[Any, np.ndarray]] = {
+            field: {
+                value: np.packbits(codes == code)
+                for value, code in mappings[field].items()
+            }
+            for field, codes in fields.items()
+        }
+        for field, masks in set_fields.items():
+            self.bitmaps[field] = {
+                value: np.packbits(mask) for value, mask in masks.items()
+            }
+        self.set_fields = set(set_fields)
+        self.get_packed_mask = lru_cache(maxsize=1024)(self.get_packed_mask)
+
+    def get_packed_mask(self, filters: Tuple[Tuple[str, Tuple], ...]) -> np.ndarray:
+        """
+        Get the packed bitmap of the songs fitting the filters
+
+        Parameters
+        ----------
+        filters : Tuple[Tuple[str, Tuple], ...]
+            The authorized values of each filtered field
+
+        Returns
+        -------
+        np.ndarray
+            The packed bitmap of the matching songs
+        """
+
+        mask = np.full((self.songs_count + 7) // 8, 0xFF, dtype=np.uint8)
+
+        for field, values in filters:
+            if field in self.set_fields:
+                for value in values:
+                    mask &= self.bitmaps[field].get(value, 0)
+                continue
+
+            field_mask = np.zeros_like(mask)
+            for value in values:
+                bitmap = self.bitmaps[field].get(value)
+                if bitmap is not None:
+                    field_mask |= bitmap
+            mask &= field_mask
+
+        return mask
+
+    def get_mask(self, **filters: List[Any]) -> np.ndarray:
+        """
+        Get the boolean mask of the songs fitting the filters
+
+        Parameters
+        ----------
+        **filters : List[Any]
+            The authorized values of each filtered field, None to not filter it
+
+        Returns
+        -------
+        np.ndarray
+            The boolean mask of the matching songs
+        """
+
+        filters = tuple(
+            (field, tuple(sorted(set(values))))
+            for field, values in sorted(filters.items())
+            if values is not None
+        )
+
+        return np.unpackbits(
+            self.get_packed_mask(filters), count=self.songs_count
+        ).view(bool)
+
+    def report(self) -> Dict[str, int]:
+        """
+        Get the size of the bitmaps and the counters of the filter cache
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of bitmaps, their size in bytes and the cache hits and misses
+        """
+
+        cache_info = self.get_packed_mask.cache_info()
+        return {
+            "bitmaps": sum(len(bitmaps) for bitmaps in self.bitmaps.values()),
+            "bitmaps_bytes": sum(
+                bitmap.nbytes
+                for bitmaps in self.bitmaps.values()
+                for bitmap in bitmaps.values()
+            ),
+            "cache_hits": cache_info.hits,
+            "cache_misses": cache_info.misses,
+        }
+
+
+class SongStore:
+    """
+    Columnar copy of the songs_full table, one NumPy array per filtered column
+    """
+
+    def __init__(
+        self,
+        songs: List[Tuple],
+        anime_genres_and_tags: Dict[int, Dict[str, List[str]]] = {},
+    ):
+        """
+        Build the columns from the rows of songs_full
+
+        Parameters
+        ----------
+        songs : List[Tuple]
+            The rows of songs_full, kept in SONGS_ORDER
+        anime_genres_and_tags : Dict[int, Dict[str, List[str]]], optional
+            The genres and tags of each anime, by ann_id
+        """
+
+        songs = sorted(songs, key=get_song_key)
+        self.songs = songs
+        # Keys of the songs, sorted, to find where the songs after a key start
+        self.song_keys = [get_song_key(song) for song in songs]
+
+        self.ann_ids = np.array([song[0] for song in songs], dtype=np.int32)
+        self.song_ids = np.array([song[7] for song in songs], dtype=np.int32)
+        self.song_types = np.array([song[9] for song in songs], dtype=np.int8)
+        self.song_difficulties = np.array(
+            [np.nan if song[13] is None else song[13] for song in songs],
+            dtype=np.float32,
+        )
+
+        self.anime_seasons, self.anime_season_codes = encode_column(
+            [song[5] for song in songs]
+        )
+        self.anime_types, self.anime_type_codes = encode_column(
+            [song[6] for song in songs]
+        )
+        self.song_categories, self.song_category_codes = encode_column(
+            [song[14] for song in songs]
+        )
+
+        self.bitmap_index = BitmapIndex(
+            {
+                "song_type": self.song_types,
+                "song_category": self.song_categories,
+                "anime_type": self.anime_types,
+                "anime_season": self.anime_seasons,
+            },
+            {
+                "song_type": {
+                    int(song_type): int(song_type)
+                    for song_type in np.unique(self.song_types)
+                },
+                "song_category": self.song_category_codes,
+                "anime_type": self.anime_type_codes,
+                "anime_season": self.anime_season_codes,
+            },
+            {
+                "anime_genre": self.get_anime_masks(
+                    anime_genres_and_tags, "anime_genres"
+                ),
+                "anime_tag": self.get_anime_masks(anime_genres_and_tags, "anime_tags"),
+            },
+        )
+
+        # Songs sharing a name and an artist share a key, to ignore duplicates
+        duplicate_keys = {}
+        self.duplicate_keys = np.array(
+            [
+                duplicate_keys.setdefault((song[11], song[12]), len(duplicate_keys))
+                for song in songs
+            ],
+            dtype=np.int32,
+        )
+
+    def get_anime_masks(
+        self, anime_genres_and_tags: Dict[int, Dict[str, List[str]]], key: str
+    ) -> Dict[str, np.ndarray]:
+        """
+        Get the boolean mask of the songs whose anime has each genre (or tag)
+
+        Parameters
+        ----------
+        anime_genres_and_tags : Dict[int, Dict[str, List[str]]]
+            The genres and tags of each anime, by ann_id
+        key : str
+            anime_genres or anime_tags
+
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            The boolean mask of the songs having each value
+        """
+
+        ann_ids_per_value = {}
+        for ann_id, genres_and_tags in anime_genres_and_tags.items():
+            for value in genres_and_tags[key]:
+                ann_ids_per_value.setdefault(value, []).append(ann_id)
+
+        return {
+            value: np.isin(self.ann_ids, ann_ids)
+            for value, ann_ids in ann_ids_per_value.items()
+        }
+
+    def filter(
+        self,
+        ann_ids: List[int] = [],
+        song_ids: List[int] = [],
+        anime_name_search: Optional[NameSearch] = None,
+        song_name_search: Optional[NameSearch] = None,
+        artist_name_search: Optional[NameSearch] = None,
+        ignore_duplicates: bool = False,
+        song_types: List[int] = [1, 2, 3],
+        song_categories: List[SongCategory] = [
+            "Standard",
+            "Chanting",
+            "Character",
+            "Instrumental",
+        ],
+        song_difficulty_range: IntRange = IntRange(min=0, max=100),
+        anime_types: List[AnimeType] = ["TV", "movie", "OVA", "special", "ONA"],
+        anime_seasons: List[str] = [],
+        anime_genres: List[str] = [],
+        anime_tags: List[str] = [],
+        max_results_per_search: int = -1,
+        after_song_key: Optional[Tuple[int, int, int, int]] = None,
+        database_path=None,
+    ) -> np.ndarray:
+        """
+        Get the positions of the songs fitting the filters, with the same
+        semantics as get_possibles_songs_from_filters
+
+        Returns
+        -------
+        np.ndarray
+            The positions of the matching songs in self.songs, in SONGS_ORDER
+        """
+
+        mask = self.bitmap_index.get_mask(
+            song_type=song_types,
+            song_category=song_categories,
+            anime_type=anime_types,
+            anime_season=anime_seasons if anime_seasons else None,
+            anime_genre=anime_genres if anime_genres else None,
+            anime_tag=anime_tags if anime_tags else None,
+        )
+
+        mask &= self.song_difficulties >= song_difficulty_range.min
+        mask &= self.song_difficulties <= song_difficulty_range.max
+
+        if ann_ids:
+            mask &= np.isin(self.ann_ids, ann_ids)
+        if song_ids:
+            mask &= np.isin(self.song_ids, song_ids)
+
+        name_filters = [
+            ("anime", self.ann_ids, anime_name_search),
+            ("song", self.song_ids, song_name_search),
+            ("song_artist", self.song_ids, artist_name_search),
+        ]
+        for name_type, ids, name_search in name_filters:
+            if name_search:
+                matching_ids = get_trigram_index(name_type, database_path).match(
+                    name_search
+                )
+                mask &= np.isin(ids, matching_ids)
+
+        positions = np.flatnonzero(mask)
+
+        if ignore_duplicates:
+            _, first_positions = np.unique(
+                self.duplicate_keys[positions], return_index=True
+            )
+            positions = positions[np.sort(first_positions)]
+
+        if after_song_key is not None:
+            start = bisect_right(self.song_keys, tuple(after_song_key))
+            positions = positions[positions >= start]
+
+        if max_results_per_search != -1:
+            positions = positions[:max_results_per_search]
+
+        return positions
+
+    def report(self) -> Dict[str, int]:
+        """
+        Get the size of the columns
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of songs and the size of the columns in bytes
+        """
+
+        return {
+            "songs": len(self.songs),
+            "columns_bytes": sum(
+                column.nbytes
+                for column in [
+                    self.ann_ids,
+                    self.song_ids,
+                    self.song_types,
+                    self.song_difficulties,
+                    self.anime_seasons,
+                    self.anime_types,
+                    self.song_categories,
+                    self.duplicate_keys,
+                ]
+            ),
+            "bitmap_index": self.bitmap_index.report(),
+        }
+
+
+@lru_cache(maxsize=2)
+def load_song_store(database_path: str, database_version: Tuple[int, int]) -> SongStore:
+    """
+    Load the song catalogue into a SongStore and save it to cache, for a version
+    of the database file
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database
+    database_version : Tuple[int, int]
+        The version of the database file, see get_database_version
+
+    Returns
+    -------
+    SongStore
+        The columnar song store
+    """
+
+    cursor = connect_to_database(database_path)
+    return SongStore(
+        run_sql_command(cursor, f"SELECT * FROM songs_full ORDER BY {SONGS_ORDER}"),
+        extract_anime_genres_and_tags(database_path),
+    )
+
+
+def get_song_store(database_path=None) -> SongStore:
+    """
+    Get the SongStore of the database, rebuilt when the database file changes
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
+    Returns
+    -------
+    SongStore
+        The columnar song store
+    """
+
+    database_path = database_path or get_database_path()
+    return load_song_store(database_path, get_database_version(database_path))
+
+
+def iter_songs_from_filters(cursor: sqlite3.Cursor, **filters: Any) -> Iterator[Tuple]:
+    """
+    Get the songs fitting the filters one at a time, with the engine set by
+    SONG_FILTER_ENGINE
+
+    The query runs right away, its rows being read from the cursor as they
+    are consumed
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        The cursor of the database, used by the sqlite engine
+    **filters : Any
+        The filters of get_possibles_songs_from_filters
+
+    Returns
+    -------
+    Iterator[Tuple]
+        The songs that match the filters
+    """
+
+    if SONG_FILTER_ENGINE != "numpy":
+        query, data = get_songs_query_from_filters(**filters)
+        return cursor.execute(query, data)
+
+    song_store = get_song_store()
+
+    return (song_store.songs[i] for i in song_store.filter(**filters))
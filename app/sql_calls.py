@@ -1,10 +1,25 @@
-from .io_classes import AnimeType, CreditType, SongCategory, IntRange
+from .io_classes import AnimeType, SongCategory, IntRange
 
+import os
 import re
-import datetime
+import json
+import time
 import sqlite3
-from functools import lru_cache
-from typing import Any, List
+import threading
+from pathlib import Path
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from decouple import config
 
@@ -15,13 +30,347 @@ A collection of useful functions to extract data from the database
 DATABASE_PATH = config("DATABASE_PATH")
 LOGS_PATH = config("LOGS_PATH")
 MAX_RESULTS_PER_SEARCH = config("MAX_RESULTS_PER_SEARCH")
+SQLITE_MMAP_SIZE = config("SQLITE_MMAP_SIZE", default=268435456, cast=int)
+SQLITE_CACHE_SIZE = config("SQLITE_CACHE_SIZE", default=-65536, cast=int)
+# Prepared statements kept per connection, at least one per shape of filters
+SQLITE_CACHED_STATEMENTS = 256
+# SQLite instructions run between two checks of the deadline of the queries
+SQLITE_PROGRESS_INSTRUCTIONS = 10000
+# Order of the songs in the results, the key of the pages
+SONGS_ORDER = "ann_id, song_type, song_number, song_id"
 
 
-@lru_cache(maxsize=None)
-def extract_song_database():
+class ConnectionPool:
+    """
+    Pool of read-only sqlite connections, one per worker thread and database
+
+    Connections are opened in read-only immutable mode, with the REGEXP and
+    NAME_REGEXP functions and the check of query_deadline registered once, and are
+    kept open to be reused by every following request handled by the same thread. Each generation of the database being its own file,
+    never modified in place, a connection stays valid as long as its file is served.
+    """
+
+    def __init__(self, mmap_size: int = 0, cache_size: int = -2000):
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Every open connection, with the database it is connected to
+        self._connections: Dict[sqlite3.Connection, str] = {}
+        # Databases no longer served, whose connections are closed by their thread
+        self._retired_paths: Set[str] = set()
+
+    def open_connection(self, database_path: str) -> sqlite3.Connection:
+        """
+        Open a new read-only connection to the database
+
+        Parameters
+        ----------
+        database_path (str):
+            Path to the database
+
+        Returns
+        -------
+        sqlite3.Connection
+            The read-only connection
+        """
+
+        database_uri = Path(database_path).resolve().as_uri() + "?mode=ro&immutable=1"
+
+        # check_same_thread is disabled so that the pool can close every connection,
+        # each connection is still only used by the thread that opened it
+        connection = sqlite3.connect(
+            database_uri,
+            uri=True,
+            check_same_thread=False,
+            cached_statements=SQLITE_CACHED_STATEMENTS,
+        )
+        connection.create_function("REGEXP", 2, regexp, deterministic=True)
+        connection.create_function("NAME_REGEXP", 2, name_regexp, deterministic=True)
+        connection.set_progress_handler(
+            is_past_query_deadline, SQLITE_PROGRESS_INSTRUCTIONS
+        )
+        connection.execute("PRAGMA query_only = ON")
+        connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        connection.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+
+        return connection
+
+    def get_connection(self, database_path: str) -> sqlite3.Connection:
+        """
+        Get the connection of the current thread to the database, open it if needed
+
+        Parameters
+        ----------
+        database_path (str):
+            Path to the database
+
+        Returns
+        -------
+        sqlite3.Connection
+            The pooled read-only connection
+        """
+
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+
+        # The connections of this thread to the other databases are idle, the
+        # ones to retired databases can be closed
+        with self._lock:
+            retired_paths = [
+                path
+                for path in connections
+                if path != database_path and path in self._retired_paths
+            ]
+        for path in retired_paths:
+            self.close_connection(connections.pop(path))
+
+        connection = connections.get(database_path)
+        if connection is not None:
+            with self._lock:
+                self.hits += 1
+            return connection
+
+        connection = self.open_connection(database_path)
+        connections[database_path] = connection
+        with self._lock:
+            self.misses += 1
+            self._connections[connection] = database_path
+
+        return connection
+
+    def close_connection(self, connection: sqlite3.Connection) -> None:
+        """
+        Close a connection opened by the pool
+
+        Parameters
+        ----------
+        connection : sqlite3.Connection
+            The connection to close
+        """
+
+        with self._lock:
+            self._connections.pop(connection, None)
+        connection.close()
+
+    def retire(self, database_path: str) -> None:
+        """
+        Stop reusing the connections to a database no longer served, each thread
+        closing its own connection the next time it borrows a connection to another
+        database
+
+        A request still running on that database keeps its connection until then
+
+        Parameters
+        ----------
+        database_path (str):
+            Path to the database
+        """
+
+        with self._lock:
+            self._retired_paths.add(database_path)
+
+    def close_all(self) -> None:
+        """
+        Close every connection opened by the pool, in any thread
+        """
+
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the pool counters
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of hits, misses and open connections
+        """
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "open_connections": len(self._connections),
+            }
+
+
+def get_database_version(database_path: str) -> Tuple[int, int]:
+    """
+    Get the version of the database file, which changes whenever the file is replaced
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database
+
+    Returns
+    -------
+    Tuple[int, int]
+        The modification time in nanoseconds and the size of the file
+    """
+
+    database_stat = os.stat(database_path)
+    return database_stat.st_mtime_ns, database_stat.st_size
+
+
+connection_pool = ConnectionPool(SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE)
+
+
+class DatabaseGeneration(NamedTuple):
+    """
+    A database file served by the API, replaced by the next generation on reload
+    """
+
+    number: int
+    database_path: str
+
+
+database_generation = DatabaseGeneration(0, DATABASE_PATH)
+
+
+class NameSearch(NamedTuple):
+    """
+    A search of names, matched by the names its regex matches (see
+    utils.get_name_search), narrowed down beforehand on their folded form
+    """
+
+    # Regex of the search, matched against the lower cased names
+    regex: str
+    # Folded parts contained in the folded form of every matching name
+    folded_parts: List[str]
+    # If not empty, the folded forms every matching name is folded to
+    folded_names: List[str]
+
+
+# Database of the generation a request started on, set for the whole request
+request_database_path: ContextVar[Optional[str]] = ContextVar(
+    "request_database_path", default=None
+)
+# time.monotonic() after which the queries of the current search are aborted
+query_deadline: ContextVar[Optional[float]] = ContextVar("query_deadline", default=None)
+# Connection of the streamed search being started, used instead of the pool
+stream_connection: ContextVar[Optional[sqlite3.Connection]] = ContextVar(
+    "stream_connection", default=None
+)
+
+
+def is_past_query_deadline() -> bool:
+    """
+    Check if the queries of the current search are past their deadline, called by
+    SQLite while a query runs, which is aborted (sqlite3.OperationalError) if so
+
+    Returns
+    -------
+    bool
+        True if query_deadline is set and passed
+    """
+
+    deadline = query_deadline.get()
+    return deadline is not None and time.monotonic() > deadline
+
+
+def get_database_generation() -> DatabaseGeneration:
+    """
+    Get the generation of the database served to the new requests
+
+    Returns
+    -------
+    DatabaseGeneration
+        The current generation
+    """
+
+    return database_generation
+
+
+def set_database_generation(database_path: str) -> DatabaseGeneration:
+    """
+    Serve a new database file to the new requests, as the next generation
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the new database
+
+    Returns
+    -------
+    DatabaseGeneration
+        The new generation
+    """
+
+    global database_generation
+
+    # A single assignment, requests see either the old or the new generation
+    database_generation = DatabaseGeneration(
+        database_generation.number + 1, database_path
+    )
+    return database_generation
+
+
+def get_database_path() -> str:
+    """
+    Get the database of the current request, or of the current generation
+    outside of a request
+
+    Returns
+    -------
+    str
+        Path to the database
+    """
+
+    return request_database_path.get() or database_generation.database_path
+
+
+def database_cache(maxsize: int = 2) -> Callable:
+    """
+    Cache a function of the database path, the path defaulting to the database of
+    the current request (see get_database_path)
+
+    Each generation has its own database file, so the current and the previous
+    generations are kept in cache by default
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        The number of databases kept in cache, by default 2
+
+    Returns
+    -------
+    Callable
+        The decorator
+    """
+
+    def decorator(function: Callable) -> Callable:
+        cached_function = lru_cache(maxsize=maxsize)(function)
+
+        @wraps(function)
+        def wrapper(database_path: Optional[str] = None):
+            return cached_function(database_path or get_database_path())
+
+        wrapper.cache_clear = cached_function.cache_clear
+        wrapper.cache_info = cached_function.cache_info
+        return wrapper
+
+    return decorator
+
+
+@database_cache()
+def extract_song_database(database_path=None):
     """
     Extract the song database and save it to cache
 
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
     Returns
     -------
     song_database (dict):
@@ -29,10 +378,10 @@ def extract_song_database():
     """
 
     command = """
-    SELECT * FROM songsFull;
+    SELECT * FROM songs_full;
     """
 
-    cursor = connect_to_database()
+    cursor = connect_to_database(database_path)
 
     song_database = {}
     for song in run_sql_command(cursor, command):
@@ -41,11 +390,16 @@ def extract_song_database():
     return song_database
 
 
-@lru_cache(maxsize=None)
-def extract_anime_database():
+@database_cache()
+def extract_anime_database(database_path=None):
     """
     Extract the anime database and save it to cache
 
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
     Returns
     -------
     anime_database (dict):
@@ -53,10 +407,10 @@ def extract_anime_database():
     """
 
     command = """
-    SELECT * FROM songsFull;
+    SELECT * FROM songs_full;
     """
 
-    cursor = connect_to_database()
+    cursor = connect_to_database(database_path)
 
     anime_database = {}
     for song in run_sql_command(cursor, command):
@@ -76,15 +430,47 @@ def extract_anime_database():
     return anime_database
 
 
-@lru_cache(maxsize=None)
-def extract_artist_database(database_path=DATABASE_PATH):
+@database_cache()
+def extract_anime_genres_and_tags(database_path=None):
+    """
+    Extract the genres and tags of every anime and save it to cache
+
+    Parameters
+    ----------
+    database_path (str):
+        Path to the database, defaults to the database of the current request
+
+    Returns
+    -------
+    Dict[int, Dict[str, List[str]]]
+        The genres and tags of each anime, by ann_id
+    """
+
+    cursor = connect_to_database(database_path)
+
+    anime_genres_and_tags = {}
+    for link_table, link_column, key in [
+        ("link_anime_genre", "genre", "anime_genres"),
+        ("link_anime_tag", "tag", "anime_tags"),
+    ]:
+        command = f"SELECT ann_id, {link_column} FROM {link_table} ORDER BY ann_id, {link_column}"
+        for ann_id, value in run_sql_command(cursor, command):
+            if ann_id not in anime_genres_and_tags:
+                anime_genres_and_tags[ann_id] = {"anime_genres": [], "anime_tags": []}
+            anime_genres_and_tags[ann_id][key].append(value)
+
+    return anime_genres_and_tags
+
+
+@database_cache()
+def extract_artist_database(database_path=None):
     """
     Extract the artist database and save it to cache
 
     Parameters
     ----------
     database_path (str):
-        Path to the database, defaults to DATABASE_PATH environment variable
+        Path to the database, defaults to the database of the current request
 
     Returns
     -------
@@ -94,7 +480,6 @@ def extract_artist_database(database_path=DATABASE_PATH):
 
     artist_database = {}
 
-    print(database_path)
     cursor = connect_to_database(database_path)
 
     # Basic info
@@ -220,6 +605,10 @@ def run_sql_command(cursor: sqlite3.Cursor, sql_command: str, data: List[Any] =
         return record
 
     except sqlite3.Error as error:
+        # Aborted at its deadline, see is_past_query_deadline
+        if is_past_query_deadline():
+            raise
+
         if data is not None:
             for param in data:
                 if type(param) == str:
@@ -257,14 +646,36 @@ def regexp(expr: str, item: str):
         return ""
 
 
-def connect_to_database(database_path=DATABASE_PATH):
+def name_regexp(expr: str, name: str) -> bool:
+    """
+    Function to use the NAME_REGEXP function in sqlite, matching a name against the
+    regex of a name search
+
+    Parameters
+    ----------
+    expr : str
+        The regex of the name search
+    name : str
+        The name to match, lower cased beforehand like the search
+
+    Returns
+    -------
+    bool
+        True if the name matches the regex, False otherwise
+    """
+
+    return name is not None and re.match(expr, name.lower()) is not None
+
+
+def connect_to_database(database_path=None):
     """
-    Connect to the database and return the connection's cursor
+    Borrow the pooled read-only connection of the current thread and return its cursor,
+    or the connection of the streamed search being started (see iter_stream_songs)
 
     Parameters
     ----------
     database_path (str):
-        Path to the database, defaults to DATABASE_PATH environment variable
+        Path to the database, defaults to the database of the current request
 
     Returns
     -------
@@ -273,8 +684,11 @@ def connect_to_database(database_path=DATABASE_PATH):
     """
 
     try:
-        sqliteConnection = sqlite3.connect(database_path)
-        sqliteConnection.create_function("REGEXP", 2, regexp)
+        sqliteConnection = stream_connection.get()
+        if sqliteConnection is None or database_path is not None:
+            sqliteConnection = connection_pool.get_connection(
+                database_path or get_database_path()
+            )
         cursor = sqliteConnection.cursor()
         return cursor
     except sqlite3.Error as error:
@@ -282,13 +696,246 @@ def connect_to_database(database_path=DATABASE_PATH):
         exit(0)
 
 
-def get_possibles_songs_from_filters(
-    cursor: sqlite3.Cursor,
+def iter_stream_songs(search: Callable[..., Any], *args: Any) -> Iterator[Tuple]:
+    """
+    Run a search on its own read-only connection and read its songs one at a time,
+    the connection being closed once the songs are read or the stream is closed
+
+    The songs of a stream are read by any thread of the search executor, one batch
+    at a time, so they cannot be read from the pooled connection of the thread that
+    started the search while it serves other requests
+
+    Parameters
+    ----------
+    search : Callable[..., Any]
+        The search function, returning its songs in songs_full format
+    *args : Any
+        The parameters of the search
+
+    Yields
+    ------
+    Tuple
+        The songs fitting the search
+    """
+
+    connection = connection_pool.open_connection(get_database_path())
+    try:
+        # The queries of the search run right away, on the stream connection
+        token = stream_connection.set(connection)
+        try:
+            songs = search(*args)
+        finally:
+            stream_connection.reset(token)
+
+        yield from songs
+    finally:
+        connection.close()
+
+
+def get_connection_pool_stats() -> Dict[str, int]:
+    """
+    Get the hit/miss counters of the connection pool
+
+    Returns
+    -------
+    Dict[str, int]
+        The number of hits, misses and open connections of the pool
+    """
+
+    return connection_pool.stats()
+
+
+def get_full_text_search_match(
+    columns: List[str], folded_parts: List[str]
+) -> Optional[str]:
+    """
+    Get the FTS5 MATCH expression looking for every folded part in the columns
+
+    Parameters
+    ----------
+    columns : List[str]
+        The indexed columns of the FTS5 table to search in
+    folded_parts : List[str]
+        The folded parts of a name search
+
+    Returns
+    -------
+    Optional[str]
+        The MATCH expression, None if every part is too short for the trigram index
+    """
+
+    phrases = [
+        '"' + part.replace('"', '""') + '"' for part in folded_parts if len(part) >= 3
+    ]
+    if not phrases:
+        return None
+
+    return f"{{{' '.join(columns)}}} : ({' AND '.join(phrases)})"
+
+
+def get_folded_name_filter(
+    columns: List[str],
+    name_search: NameSearch,
+    fts_table: str = None,
+    rowid_column: str = "rowid",
+) -> Tuple[str, List[str]]:
+    """
+    Get the SQL filter matching a name search against name columns
+
+    The names are first narrowed down on their folded form: equal to a folded name of
+    the search if any, else containing every folded part of the search, found with the
+    trigram FTS5 table indexing the columns if given and verified with instr. The
+    remaining names are then matched against the regex of the search
+
+    Parameters
+    ----------
+    columns : List[str]
+        The folded name columns, named after the name columns they fold
+        (ex: song_name_folded), a row matches if any of them matches
+    name_search : NameSearch
+        The name search
+    fts_table : str, optional
+        The FTS5 table indexing the columns, by default None
+    rowid_column : str, optional
+        The column of the filtered table used as rowid by fts_table, by default rowid
+
+    Returns
+    -------
+    Tuple[str, List[str]]
+        The SQL filter and its parameters
+    """
+
+    column_filters = []
+    data = []
+
+    for column in columns:
+        if name_search.folded_names:
+            placeholders = get_placeholders(len(name_search.folded_names))
+            column_filter = [f"{column} IN ({placeholders})"]
+            data += name_search.folded_names
+        else:
+            column_filter = [
+                f"instr({column}, ?) > 0" for _ in name_search.folded_parts
+            ]
+            data += name_search.folded_parts
+
+        column_filter.append(f"NAME_REGEXP(?, {column[: -len('_folded')]})")
+        data.append(name_search.regex)
+        column_filters.append("(" + " AND ".join(column_filter) + ")")
+
+    name_filter = "(" + " OR ".join(column_filters) + ")"
+
+    fts_match = None
+    if fts_table and not name_search.folded_names:
+        fts_match = get_full_text_search_match(columns, name_search.folded_parts)
+    if fts_match is None:
+        return name_filter, data
+
+    return (
+        f"({rowid_column} IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)"
+        + f" AND {name_filter})",
+        [fts_match] + data,
+    )
+
+
+def get_placeholders(count: int) -> str:
+    """
+    Get the placeholders of a list of parameters
+
+    Parameters
+    ----------
+    count : int
+        The number of parameters
+
+    Returns
+    -------
+    str
+        The comma separated placeholders (ex: ?,?,?)
+    """
+
+    return ",".join("?" * count)
+
+
+@lru_cache(maxsize=256)
+def get_songs_query_template(
+    where_filters: Tuple[str, ...], ignore_duplicates: bool, after_song_key: bool
+) -> str:
+    """
+    Assemble the query on songs_full of a shape of filters and save it to cache
+
+    Parameters
+    ----------
+    where_filters : Tuple[str, ...]
+        The parameterized conditions of the filters
+    ignore_duplicates : bool
+        Ignore duplicate songs, keeping the first of each in SONGS_ORDER
+    after_song_key : bool
+        Only keep the songs after a key of SONGS_ORDER, given after the filters
+
+    Returns
+    -------
+    str
+        The parameterized query, the limit being the last parameter
+    """
+
+    filters = " AND ".join(where_filters)
+    # Duplicates are dropped before the songs of the previous pages, so that every
+    # page keeps the same representative of a duplicate
+    if ignore_duplicates:
+        filters = (
+            "song_id IN (SELECT first_value(song_id) OVER"
+            + f" (PARTITION BY song_name, song_artist ORDER BY {SONGS_ORDER})"
+            + f" FROM songs_full WHERE {filters})"
+        )
+
+    if after_song_key:
+        filters += f" AND ({SONGS_ORDER}) > (?, ?, ?, ?)"
+
+    return f"SELECT * from songs_full WHERE {filters} ORDER BY {SONGS_ORDER} LIMIT ?"
+
+
+def get_song_key(song: Tuple) -> Tuple[int, int, int, int]:
+    """
+    Get the key of a song of songs_full in SONGS_ORDER
+
+    Parameters
+    ----------
+    song : Tuple
+        The song, a row of songs_full
+
+    Returns
+    -------
+    Tuple[int, int, int, int]
+        The ANN id, song type, song number and song id of the song
+    """
+
+    return song[0], song[9], song[10], song[7]
+
+
+def get_songs_query_templates_stats() -> Dict[str, int]:
+    """
+    Get the counters of the cache of query templates
+
+    Returns
+    -------
+    Dict[str, int]
+        The number of hits, misses and cached templates
+    """
+
+    cache_info = get_songs_query_template.cache_info()
+    return {
+        "hits": cache_info.hits,
+        "misses": cache_info.misses,
+        "templates": cache_info.currsize,
+    }
+
+
+def get_songs_query_from_filters(
     ann_ids: List[int] = [],
     song_ids: List[int] = [],
-    anime_name_regex: str = "",
-    song_name_regex: str = "",
-    artist_name_regex: str = "",
+    anime_name_search: Optional[NameSearch] = None,
+    song_name_search: Optional[NameSearch] = None,
+    artist_name_search: Optional[NameSearch] = None,
     ignore_duplicates: bool = False,
     song_types: List[int] = [1, 2, 3],
     song_categories: List[SongCategory] = [
@@ -309,24 +956,27 @@ def get_possibles_songs_from_filters(
     anime_genres: List[str] = [],
     anime_tags: List[str] = [],
     max_results_per_search: int = -1,
-):
+    after_song_key: Optional[Tuple[int, int, int, int]] = None,
+) -> Tuple[str, List[Any]]:
     """
-    Filter the song database
+    Compile the filters into a parameterized query on songs_full, ordered by
+    SONGS_ORDER
+
+    The text of the query only depends on the shape of the filters (which filters are
+    set, and how many values they have), values being bound as parameters
 
     Parameters
     ----------
-    cursor : sqlite3.Cursor
-        The cursor of the database to run the command
     ann_ids : List[int], optional
         List of ANN ids to search, by default ignored
     song_ids : List[int], optional
         List of song ids to search, by default ignored
-    anime_name_regex : str, optional
-        Regex to search in anime names, not implemented yet
-    song_name_regex : str, optional
-        Regex to search in song names
-    artist_name_regex : str, optional
-        Regex to search in artist names
+    anime_name_search : NameSearch, optional
+        Search to match against the anime names, by default ignored
+    song_name_search : NameSearch, optional
+        Search to match against the song name, by default ignored
+    artist_name_search : NameSearch, optional
+        Search to match against the song artist, by default ignored
     ignore_duplicates : bool
         Ignore duplicate songs
     song_types : list[int]
@@ -345,145 +995,228 @@ def get_possibles_songs_from_filters(
         List of anime tags to search
     max_results_per_search : int
         Maximum number of results per search, -1 for no limit
+    after_song_key : Optional[Tuple[int, int, int, int]], optional
+        Only search the songs after this key (see get_song_key), by default ignored
 
     Returns
     -------
-    list
-        List of songs that match the filters
+    Tuple[str, List[Any]]
+        The query and its parameters
     """
 
     where_filters = []
+    data = []
+
+    # Lists of ids are bound as a single JSON array, to keep the same query whatever
+    # their length and to stay below the limit of parameters
+    for column, ids in [("ann_id", ann_ids), ("song_id", song_ids)]:
+        if ids:
+            where_filters.append(f"{column} IN (SELECT value FROM json_each(?))")
+            data.append(json.dumps([int(id) for id in ids]))
+
+    # Short lists of values are bound one by one, so that the planner can use their
+    # statistics to pick the most selective index
+    for column, values in [
+        ("anime_type", anime_types),
+        ("song_type", song_types),
+        ("song_category", song_categories),
+    ] + ([("anime_season", anime_seasons)] if anime_seasons else []):
+        where_filters.append(f"{column} IN ({get_placeholders(len(values))})")
+        data += values
+
+    where_filters.append("song_difficulty >= ?")
+    where_filters.append("song_difficulty <= ?")
+    data += [song_difficulty_range.min, song_difficulty_range.max]
+
+    # The anime needs to be linked to every genre and every tag
+    for link_table, link_column, values in [
+        ("link_anime_genre", "genre", anime_genres),
+        ("link_anime_tag", "tag", anime_tags),
+    ]:
+        values = list(dict.fromkeys(values))
+        if values:
+            link_filter = " INTERSECT ".join(
+                [f"SELECT ann_id FROM {link_table} WHERE {link_column} = ?"]
+                * len(values)
+            )
+            where_filters.append(f"ann_id IN ({link_filter})")
+            data += values
+
+    if anime_name_search:
+        anime_names_filter, anime_names_data = get_folded_name_filter(
+            [
+                "anime_expand_name_folded",
+                "anime_en_name_folded",
+                "anime_jp_name_folded",
+            ],
+            anime_name_search,
+            fts_table="anime_names_fts",
+            rowid_column="ann_id",
+        )
+        anime_alt_names_filter, anime_alt_names_data = get_folded_name_filter(
+            ["name_folded"],
+            anime_name_search,
+            fts_table="anime_alt_names_fts",
+        )
+        where_filters.append(
+            f"ann_id IN (SELECT ann_id FROM animes WHERE {anime_names_filter}"
+            + f" UNION SELECT ann_id FROM link_anime_alt_name WHERE {anime_alt_names_filter})"
+        )
+        data += anime_names_data + anime_alt_names_data
+
+    if song_name_search:
+        song_name_filter, song_name_data = get_folded_name_filter(
+            ["song_name_folded"],
+            song_name_search,
+            fts_table="song_names_fts",
+            rowid_column="song_id",
+        )
+        where_filters.append(song_name_filter)
+        data += song_name_data
+
+    if artist_name_search:
+        artist_name_filter, artist_name_data = get_folded_name_filter(
+            ["song_artist_folded"],
+            artist_name_search,
+            fts_table="song_names_fts",
+            rowid_column="song_id",
+        )
+        where_filters.append(artist_name_filter)
+        data += artist_name_data
 
-    ann_ids = ", ".join([str(ann_id) for ann_id in ann_ids])
-    if ann_ids:
-        where_filters.append(f"ann_id IN ({ann_ids})")
-
-    song_ids = ", ".join([str(song_id) for song_id in song_ids])
-
-    if song_ids:
-        where_filters.append(f"song_id IN ({song_ids})")
-
-    anime_types = ", ".join([f"'{anime_type}'" for anime_type in anime_types])
-    where_filters.append(f"anime_type IN ({anime_types})")
-
-    anime_seasons = ", ".join([f"'{anime_season}'" for anime_season in anime_seasons])
-    if anime_seasons:
-        where_filters.append(f"anime_season IN ({anime_seasons})")
+    if after_song_key is not None:
+        data += [int(value) for value in after_song_key]
 
-    song_types = ", ".join([str(song_type) for song_type in song_types])
-    where_filters.append(f"song_type IN ({song_types})")
+    # A limit of -1 means no limit for SQLite
+    data.append(max_results_per_search)
 
-    song_categories = ", ".join(
-        [f"'{song_category}'" for song_category in song_categories]
+    return (
+        get_songs_query_template(
+            tuple(where_filters), ignore_duplicates, after_song_key is not None
+        ),
+        data,
     )
-    where_filters.append(f"song_category IN ({song_categories})")
 
-    where_filters.append(f"song_difficulty >= {song_difficulty_range.min}")
-    where_filters.append(f"song_difficulty <= {song_difficulty_range.max}")
 
-    if song_name_regex:
-        where_filters.append(f"lower(song_name) REGEXP '{song_name_regex}'")
+def get_possibles_songs_from_filters(cursor: sqlite3.Cursor, **filters: Any):
+    """
+    Filter the song database
 
-    if artist_name_regex:
-        where_filters.append(f"lower(song_artist) REGEXP '{artist_name_regex}'")
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        The cursor of the database to run the command
+    **filters : Any
+        The filters, see get_songs_query_from_filters
 
-    get_songs_from_filters_query = (
-        "SELECT * from songsFull WHERE "
-        + " AND ".join(where_filters)
-        + (" GROUP BY song_name, song_artist" if ignore_duplicates else "")
-        + (" LIMIT {max_results_per_search}" if max_results_per_search != -1 else "")
-    )
+    Returns
+    -------
+    list
+        List of songs that match the filters
+    """
 
-    return run_sql_command(cursor, get_songs_from_filters_query)
+    query, data = get_songs_query_from_filters(**filters)
+    return run_sql_command(cursor, query, data)
 
 
-def get_songs_list_from_song_artist(
-    cursor: sqlite3.Cursor, regex: str, authorized_types: List[int] = [1, 2, 3]
+def get_artist_ids_from_folded_name(
+    cursor: sqlite3.Cursor,
+    name_search: NameSearch,
+    max_nb_results: int = 50,
 ):
     """
-    Get the songs from the song artist
+    Get the artist id from the artist name search.
 
     Parameters
     ----------
     cursor : sqlite3.Cursor
         The cursor of the database to run the command
-    regex : str
-        The regex to match
-    authorized_types : list, optional
-        The authorized types of the songs, by default [1,2,3]
+    name_search : NameSearch
+        The artist name search to match
+    max_nb_results : int, optional
+        The maximum number of artist_id to return, by default 50
 
     Returns
     -------
     list
-        The list of the songs corresponding to the song artist search
+        The list of the artist id corresponding to the artist name search
     """
 
-    # TODO Indexes on lower ?
-    get_songs_list_from_song_artist = f"SELECT * from songsFull WHERE song_type IN ({','.join('?'*len(authorized_types))}) AND lower(song_artist) REGEXP ? LIMIT {MAX_RESULTS_PER_SEARCH}"
-    return run_sql_command(
-        cursor, get_songs_list_from_song_artist, authorized_types + [regex]
+    name_filter, data = get_folded_name_filter(
+        ["name_folded"],
+        name_search,
+        fts_table="artist_names_fts",
+        rowid_column="inserted_order",
     )
+    get_artist_ids_from_folded_name = (
+        f"SELECT DISTINCT artist_id from link_artist_name WHERE {name_filter} LIMIT ?"
+    )
+    artist_ids = [
+        id[0]
+        for id in run_sql_command(
+            cursor, get_artist_ids_from_folded_name, data + [max_nb_results]
+        )
+    ]
+    return artist_ids
 
 
-def get_songs_ids_from_artist_ids(
-    cursor: sqlite3.Cursor, artist_ids: List[str], credit_types: List[CreditType]
-):
+def get_folded_names(cursor: sqlite3.Cursor, name_type: str):
     """
-    Get the songs from the artist id (any type: vocalist, composers, arrangers, ...)
+    Get every name of a type and its folded form, with the id it belongs to
 
     Parameters
     ----------
     cursor : sqlite3.Cursor
         The cursor of the database to run the command
-    artist_ids : List[str]
-        The list of artist ids
-    credit_types : List[CreditType] : [vocalist, backing_vocalist, composer, arranger, performer]
-        List of credit types to search
+    name_type : str
+        The type of names to get : song, song_artist, artist or anime
 
     Returns
     -------
     list
-        The list of the songs corresponding to the artist id
+        The list of (id, folded name, name), ordered by id
     """
 
-    credit_types = [f"'{credit_type}'" for credit_type in credit_types]
-    get_songs_ids_from_artist_ids = f"SELECT DISTINCT song_id from link_song_artist WHERE role_type IN ({','.join(credit_types)}) AND artist_id IN ({','.join('?'*len(artist_ids))})"
+    get_folded_names_commands = {
+        "song": "SELECT song_id, song_name_folded, song_name FROM songs_full ORDER BY song_id",
+        "song_artist": "SELECT song_id, song_artist_folded, song_artist FROM songs_full ORDER BY song_id",
+        "artist": "SELECT artist_id, name_folded, name FROM link_artist_name ORDER BY artist_id",
+        "anime": """
+        SELECT ann_id, anime_expand_name_folded, anime_expand_name FROM animes
+        UNION ALL SELECT ann_id, anime_en_name_folded, anime_en_name FROM animes
+        UNION ALL SELECT ann_id, anime_jp_name_folded, anime_jp_name FROM animes
+        UNION ALL SELECT ann_id, name_folded, name FROM link_anime_alt_name
+        ORDER BY 1
+        """,
+    }
 
     return [
-        id[0]
-        for id in run_sql_command(
-            cursor, get_songs_ids_from_artist_ids, [str(id) for id in artist_ids]
+        (id, folded_name, name)
+        for id, folded_name, name in run_sql_command(
+            cursor, get_folded_names_commands[name_type]
         )
+        if folded_name
     ]
 
 
-def get_artist_ids_from_regex(
-    cursor: sqlite3.Cursor, regex: str, max_nb_results: int = 50
-):
+def get_song_artist_links(cursor: sqlite3.Cursor):
     """
-    Get the artist id from the artist name regex.
+    Get every credit of an artist on a song
 
     Parameters
     ----------
     cursor : sqlite3.Cursor
         The cursor of the database to run the command
-    regex : str
-        The regex to match
-    max_nb_results : int, optional
-        The maximum number of artist_id to return, by default 50
 
     Returns
     -------
     list
-        The list of the artist id corresponding to the artist name regex
+        The list of distinct (artist_id, role_type, song_id), ordered
     """
 
-    # TODO Index on lower ?
-    get_artist_ids_from_regex = f"SELECT DISTINCT artist_id from link_artist_name WHERE lower(name) REGEXP ? LIMIT {max_nb_results}"
-    artist_ids = [
-        id[0] for id in run_sql_command(cursor, get_artist_ids_from_regex, [regex])
-    ]
-    return artist_ids
+    get_song_artist_links = "SELECT DISTINCT artist_id, role_type, song_id FROM link_song_artist ORDER BY artist_id, role_type, song_id"
+
+    return run_sql_command(cursor, get_song_artist_links)
 
 
 def get_songs_list_from_songIds(cursor: sqlite3.Cursor, songIds: List[str]):
@@ -503,7 +1236,7 @@ def get_songs_list_from_songIds(cursor: sqlite3.Cursor, songIds: List[str]):
         The list of the songs corresponding to the songIds
     """
 
-    get_songs_from_sonbIds = f"SELECT * from songsFull WHERE songId IN ({','.join('?'*len(songIds))}) LIMIT {MAX_RESULTS_PER_SEARCH}"
+    get_songs_from_sonbIds = f"SELECT * from songs_full WHERE song_id IN ({','.join('?'*len(songIds))}) LIMIT {MAX_RESULTS_PER_SEARCH}"
     songs = run_sql_command(cursor, get_songs_from_sonbIds, songIds)
     return songs
 
@@ -531,113 +1264,6 @@ def get_songs_list_from_links(cursor: sqlite3.Cursor, link: str):
     link = f".*{link}.*"
 
     # TODO Indexes ?
-    get_songs_from_link = f"SELECT * from songsFull WHERE HQ REGEXP ? OR MQ REGEXP ? OR audio REGEXP ? LIMIT {MAX_RESULTS_PER_SEARCH}"
+    get_songs_from_link = f"SELECT * from songs_full WHERE HQ REGEXP ? OR MQ REGEXP ? OR audio REGEXP ? LIMIT {MAX_RESULTS_PER_SEARCH}"
     songs = run_sql_command(cursor, get_songs_from_link, [link, link, link])
     return songs
-
-
-def add_logs(
-    nb_results: int = 0,
-    execution_time: int = 0,
-    ann_id: int = "NULL",
-    anime_name: str = None,
-    song_name: str = None,
-    artist_id: int = "NULL",
-    artist_name: str = None,
-    max_other_artists: int = 99,
-    group_granularity: int = 0,
-    credit_types: List[CreditType] = [
-        CreditType.vocalist,
-        CreditType.backing_vocalist,
-        CreditType.performer,
-        CreditType.composer,
-        CreditType.arranger,
-    ],
-    song_types: List[int] = [1, 2, 3],
-    song_categories: List[SongCategory] = [
-        SongCategory.Standard,
-        SongCategory.Chanting,
-        SongCategory.Character,
-        SongCategory.Instrumental,
-    ],
-    song_difficulty_range: IntRange = IntRange(min=0, max=100),
-    anime_types: List[AnimeType] = [
-        AnimeType.TV,
-        AnimeType.movie,
-        AnimeType.OVA,
-        AnimeType.special,
-        AnimeType.ONA,
-    ],
-    anime_seasons: List[str] = None,
-    anime_genres: List[str] = None,
-    anime_tags: List[str] = None,
-    partial_match: bool = True,
-    ignore_duplicates: bool = False,
-    max_results_per_search: int = "NULL",
-) -> None:
-    sqliteConnection = sqlite3.connect(LOGS_PATH)
-    cursor = sqliteConnection.cursor()
-    run_sql_command(
-        cursor,
-        """CREATE TABLE IF NOT EXISTS logs(
-            date TEXT,
-            nb_results INTEGER,
-            execution_time FLOAT,
-
-            ann_id INTEGER,
-            anime_name TEXT,
-            anime_types TEXT,
-            anime_seasons TEXT,
-            anime_genres TEXT,
-            anime_tags TEXT,
-
-            song_name TEXT,
-            song_types TEXT,
-            song_categories TEXT,
-            song_difficulty_min TEXT,
-            song_difficulty_max TEXT,
-
-            artist_id INTEGER,
-            artist_name TEXT,
-            max_other_artists INTEGER,
-            group_granularity INTEGER,
-            credit_types TEXT,
-
-            partial_match BIT,
-            ignore_duplicates BIT,
-            max_results_per_search INTEGER
-        )""",
-    )
-
-    credit_types = f"'{','.join(credit_types)}'"
-
-    anime_types = f"'{','.join(anime_types)}'"
-
-    song_types = f"'{','.join([str(song_type) for song_type in song_types])}'"
-    song_categories = f"'{','.join(song_categories)}'"
-
-    anime_name = f"'{anime_name}'" if anime_name else "NULL"
-    song_name = f"'{song_name}'" if song_name else "NULL"
-    artist_name = f"'{artist_name}'" if artist_name else "NULL"
-
-    anime_seasons = f"'{','.join(anime_seasons)}'" if anime_seasons else "NULL"
-    anime_genres = f"'{','.join(anime_genres)}'" if anime_genres else "NULL"
-    anime_tags = f"'{','.join(anime_tags)}'" if anime_tags else "NULL"
-
-    log = f"""INSERT INTO logs (
-        date, nb_results, execution_time,
-        ann_id, anime_name, anime_types, anime_seasons, anime_genres, anime_tags,
-        song_name, song_types, song_categories, song_difficulty_min, song_difficulty_max,
-        artist_id, artist_name, max_other_artists, group_granularity, credit_types,
-        partial_match, ignore_duplicates, max_results_per_search) VALUES (
-        '{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', {nb_results}, {round(execution_time, 2)},
-        {ann_id}, {anime_name}, {anime_types}, {anime_seasons}, {anime_genres}, {anime_tags},
-        {song_name}, {song_types}, {song_categories}, {song_difficulty_range.min}, {song_difficulty_range.max},
-        {artist_id}, {artist_name}, {max_other_artists}, {group_granularity},{credit_types},
-        {partial_match}, {ignore_duplicates}, {max_results_per_search}
-        )"""
-    print(log)
-    run_sql_command(cursor, log)
-
-    sqliteConnection.commit()
-    cursor.close()
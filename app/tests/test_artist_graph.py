@@ -0,0 +1,122 @@
+from ..artist_graph import ArtistGraph, SongCredits, get_credit_mask
+
+import pytest
+
+
+def get_artist(line_ups=[]):
+    return {
+        "names": [],
+        "groups": [],
+        "line_ups": [
+            {
+                "line_up_id": i,
+                "members": [
+                    {"role_type": role_type, "id": id, "line_up_id": str(line_up_id)}
+                    for id, line_up_id, role_type in members
+                ],
+            }
+            for i, members in enumerate(line_ups)
+        ],
+    }
+
+
+ARTIST_DATABASE = {
+    "1": get_artist(),
+    "2": get_artist(),
+    "3": get_artist(),
+    "4": get_artist(),
+    # group 12: 1 and 2, then 1 and the sub group 11
+    "11": get_artist([[("3", -1, "vocalist"), ("4", -1, "performer")]]),
+    "12": get_artist(
+        [
+            [("1", -1, "vocalist"), ("2", -1, "vocalist")],
+            [("1", -1, "vocalist"), ("11", 0, "vocalist")],
+        ]
+    ),
+}
+
+
+class TestArtistGraph:
+    @pytest.fixture
+    def artist_graph(self):
+        return ArtistGraph(ARTIST_DATABASE)
+
+    def test_get_members(self, artist_graph):
+        credit_mask = get_credit_mask(["vocalist"])
+
+        assert artist_graph.get_members([(12, 0)], credit_mask) == {1, 2}
+        assert artist_graph.get_members([(12, 1)], credit_mask) == {1, 3}
+        members = artist_graph.get_members([(12, 1)], credit_mask, bottom=False)
+        assert members == {12, 1, 11, 3}
+        assert artist_graph.get_members([(2, -1)], credit_mask) == {2}
+
+    def test_get_members_credit_types(self, artist_graph):
+        credit_mask = get_credit_mask(["vocalist", "performer"])
+
+        assert artist_graph.get_members([(12, 1)], credit_mask) == {1, 3, 4}
+        assert artist_graph.get_members([(11, 0)], get_credit_mask([])) == set()
+
+    def test_line_ups(self, artist_graph):
+        assert artist_graph.get_line_up_count(12) == 2
+        assert artist_graph.get_line_up_count(1) == 0
+        assert artist_graph.get_line_up(12, 1) == [(1, -1), (11, 0)]
+
+    def test_names_and_groups(self):
+        artist_database = {
+            "1": {**get_artist(), "names": ["a"], "groups": [{"id": "3"}]},
+            "3": {**get_artist([[("1", -1, "vocalist")]]), "names": ["c", "d"]},
+        }
+
+        artist_graph = ArtistGraph(artist_database)
+
+        assert 1 in artist_graph and 2 not in artist_graph
+        assert artist_graph.get_names(3) == ["c", "d"]
+        assert artist_graph.get_names(2) == []
+        assert artist_graph.get_groups(1) == [3]
+        assert artist_graph.get_groups(42) == []
+
+    def test_cycle_is_reported(self):
+        artist_database = {
+            "1": get_artist(),
+            "20": get_artist([[("1", -1, "vocalist"), ("21", 0, "vocalist")]]),
+            "21": get_artist([[("20", 0, "vocalist")]]),
+        }
+
+        artist_graph = ArtistGraph(artist_database)
+
+        assert artist_graph.malformed_links == ["cycle 20/0 -> 21/0 -> 20/0"]
+        assert artist_graph.get_members([(20, 0)], get_credit_mask(["vocalist"])) == {1}
+
+    def test_unknown_line_up_is_reported(self):
+        artist_database = {
+            "1": get_artist(),
+            "20": get_artist([[("1", 3, "vocalist")]]),
+        }
+
+        artist_graph = ArtistGraph(artist_database)
+
+        assert artist_graph.malformed_links == ["20/0 -> unknown line up 1/3"]
+        assert artist_graph.get_members([(20, 0)], get_credit_mask(["vocalist"])) == {1}
+
+
+class TestSongCredits:
+    @pytest.fixture
+    def song_credits(self):
+        songs = [
+            # song_id, vocalists, backing vocalists, performers, composers
+            (1, "12", "1", None, None, None, None, "4", "-1"),
+            (2, "1,2", "-1,-1", None, None, None, None, None, None),
+        ]
+        return SongCredits(songs, ArtistGraph(ARTIST_DATABASE))
+
+    def test_get_members(self, song_credits):
+        vocalist = get_credit_mask(["vocalist"])
+        vocalist_performer = get_credit_mask(["vocalist", "performer"])
+
+        assert song_credits.get_members(1, vocalist) == ({1, 3}, {4})
+        assert song_credits.get_members(1, vocalist_performer) == ({1, 3, 4}, {4})
+        assert song_credits.get_members(2, vocalist) == ({1, 2}, set())
+        assert song_credits.get_members(3, vocalist) == (set(), set())
+
+    def test_songs_without_groups_are_flattened_once(self, song_credits):
+        assert song_credits.report() == {"songs": 2, "songs_with_groups": 1}
@@ -0,0 +1,143 @@
+from ..database_reload import DatabaseReloader, find_latest_database
+from ..sql_calls import (
+    connect_to_database,
+    database_cache,
+    get_database_generation,
+    get_database_path,
+    request_database_path,
+    set_database_generation,
+)
+
+import os
+import sqlite3
+import threading
+
+import pytest
+
+
+def touch(path, mtime_ns):
+    path.write_bytes(b"")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+class TestFindLatestDatabase:
+    def test_dropped_file_is_found(self, tmp_path):
+        database_path = touch(tmp_path / "songs.sqlite", 1)
+        touch(tmp_path / "songs.2023-06-01.sqlite", 3)
+        latest_path = touch(tmp_path / "songs.2023-06-02.sqlite", 4)
+
+        assert find_latest_database(database_path) == latest_path
+
+    def test_other_databases_are_ignored(self, tmp_path):
+        database_path = touch(tmp_path / "songs.sqlite", 2)
+        touch(tmp_path / "songs_nerfed.sqlite", 3)
+        touch(tmp_path / "songs.2023-06-01.sqlite.tmp", 4)
+
+        assert find_latest_database(database_path) == database_path
+
+
+class TestDatabaseGeneration:
+    @pytest.fixture(autouse=True)
+    def restore_generation(self):
+        generation = get_database_generation()
+        yield
+        set_database_generation(generation.database_path)
+
+    def test_request_keeps_its_generation(self):
+        token = request_database_path.set(get_database_generation().database_path)
+        old_path = get_database_path()
+
+        set_database_generation("new.sqlite")
+        assert get_database_path() == old_path
+
+        request_database_path.reset(token)
+        assert get_database_path() == "new.sqlite"
+
+    def test_database_cache(self):
+        calls = []
+
+        @database_cache()
+        def load(database_path=None):
+            calls.append(database_path)
+            return database_path
+
+        set_database_generation("first.sqlite")
+        assert load() == "first.sqlite"
+        assert load("first.sqlite") == "first.sqlite"
+        set_database_generation("second.sqlite")
+        assert load() == "second.sqlite"
+        assert calls == ["first.sqlite", "second.sqlite"]
+
+
+class TestDatabaseReloader:
+    @pytest.fixture
+    def reloader(self, monkeypatch):
+        generation = get_database_generation()
+        reloader = DatabaseReloader(interval=0)
+        monkeypatch.setattr(
+            reloader, "load", lambda path: set_database_generation(path)
+        )
+        yield reloader
+        set_database_generation(generation.database_path)
+
+    def test_new_file_is_loaded_once_stable(self, tmp_path, monkeypatch, reloader):
+        database_path = touch(tmp_path / "songs.sqlite", 1)
+        monkeypatch.setattr(
+            "app.database_reload.find_latest_database",
+            lambda: find_latest_database(database_path),
+        )
+        set_database_generation(database_path)
+
+        new_path = tmp_path / "songs.2023-06-01.sqlite"
+        touch(new_path, 2)
+        assert not reloader.check()
+        # Still being copied
+        touch(new_path, 3)
+        assert not reloader.check()
+        assert reloader.check()
+
+        assert get_database_generation().database_path == str(new_path)
+        assert reloader.stats()["reloads"] == 1
+        assert not reloader.check()
+
+    def test_running_request_keeps_its_connection(self, tmp_path, monkeypatch):
+        generation = get_database_generation()
+        monkeypatch.setattr("app.database_reload.build_database_caches", lambda _: {})
+        database_paths = []
+        for i in range(3):
+            database_paths.append(str(tmp_path / f"songs.{i}.sqlite"))
+            sqliteConnection = sqlite3.connect(database_paths[-1])
+            sqliteConnection.execute("CREATE TABLE songs (song_id INTEGER)")
+            sqliteConnection.executemany(
+                "INSERT INTO songs VALUES (?)", [(i,) for i in range(10)]
+            )
+            sqliteConnection.commit()
+            sqliteConnection.close()
+
+        reloader = DatabaseReloader(interval=0)
+        reloader.load(database_paths[0])
+
+        # A request started on the first generation, reading its songs
+        token = request_database_path.set(get_database_path())
+        cursor = connect_to_database()
+        songs = cursor.execute("SELECT song_id FROM songs")
+        assert next(songs) == (0,)
+
+        # Two reloads retire the first generation while the request runs
+        reloads = threading.Thread(
+            target=lambda: [reloader.load(path) for path in database_paths[1:]]
+        )
+        reloads.start()
+        reloads.join()
+        assert get_database_generation().database_path == database_paths[2]
+
+        assert len(list(songs)) == 9
+        assert connect_to_database().connection is cursor.connection
+        request_database_path.reset(token)
+
+        # Its thread closes the connection once it serves the next generation
+        connect_to_database()
+        with pytest.raises(sqlite3.ProgrammingError):
+            cursor.execute("SELECT 1")
+        set_database_generation(generation.database_path)
@@ -0,0 +1,100 @@
+from ..indexes import ArtistSongsIndex, TrigramIndex, get_trigrams
+from ..sql_calls import connect_to_database, get_folded_names
+from ..utils import fold_name, get_name_search, get_regex_search
+
+import re
+
+import pytest
+
+# Searches whose letters may be folded with the long vowels around them in the names
+PARITY_SEARCHES = ["hana", "uta ", "hoshi", "haku", "kyou", "kana hanazawa"]
+
+
+class TestTrigramIndex:
+    names = [
+        (id, fold_name(name), name)
+        for id, name in [
+            (1, "Tokyo Ghoul"),
+            (2, "Kyoukai no Kanata"),
+            (2, "Beyond the Boundary"),
+            (3, "Tokimeki"),
+            (7, "Ghost in the Shell"),
+            (8, "Banana Fish"),
+            (9, "Kohaku"),
+        ]
+    ]
+
+    def test_get_trigrams(self):
+        assert get_trigrams("tokyo") == {"tok", "oky", "kyo"}
+        assert get_trigrams("to") == set()
+
+    def test_search(self):
+        index = TrigramIndex(self.names)
+        assert index.search(get_name_search("tok")) == [1, 3]
+        assert index.search(get_name_search("ghos")) == [7]
+        assert index.search(get_name_search("ghoul tokyo")) == [1]
+        assert index.search(get_name_search("kyokai")) == [2]
+
+    def test_search_verifies_candidates(self):
+        # every trigram of "nanan" is in "banana fish", but not the whole search
+        index = TrigramIndex(self.names)
+        assert index.search(get_name_search("anana")) == [8]
+        assert index.search(get_name_search("nanan")) == []
+
+    def test_search_across_folded_long_vowels(self):
+        # "kohaku" is folded to "koaku", the "h" of the search being folded with "o"
+        index = TrigramIndex(self.names)
+        assert index.search(get_name_search("haku")) == [9]
+
+    def test_search_too_short(self):
+        index = TrigramIndex(self.names)
+        assert index.search(get_name_search("to")) is None
+        assert index.search(get_name_search("hu ko")) is None
+        assert index.match(get_name_search("to")) == [1, 3]
+
+    def test_report(self):
+        report = TrigramIndex(self.names).report()
+        assert report["ids"] == 6
+        assert report["postings_bytes"] == 4 * report["postings"]
+
+    def test_search_exact(self):
+        index = TrigramIndex(self.names)
+        assert index.search(get_name_search("tokimeki", partial_match=False)) == [3]
+        assert index.search(
+            get_name_search("beyond the boundary", partial_match=False)
+        ) == [2]
+        assert index.search(get_name_search("beyond", partial_match=False)) == []
+
+
+@pytest.mark.parametrize("name_type", ["anime", "song", "song_artist", "artist"])
+def test_match_same_as_regex(name_type):
+    # Every name of the production database, matched like the regex search did
+    cursor = connect_to_database("app/data/enhanced_amq_database.sqlite")
+    names = get_folded_names(cursor, name_type)
+    index = TrigramIndex(names)
+    swap_words = name_type != "anime"
+
+    for search in PARITY_SEARCHES:
+        for partial_match in [True, False]:
+            regex = get_regex_search(search, partial_match, swap_words)
+            assert index.match(
+                get_name_search(search, partial_match, swap_words)
+            ) == sorted({id for id, _, name in names if re.match(regex, name.lower())})
+
+
+class TestArtistSongsIndex:
+    links = [
+        (1, "composer", 4),
+        (1, "vocalist", 2),
+        (1, "vocalist", 9),
+        (2, "arranger", 4),
+        (2, "vocalist", 3),
+        (2, "vocalist", 9),
+    ]
+
+    def test_get_song_ids(self):
+        index = ArtistSongsIndex(self.links)
+        assert index.get_song_ids([1], ["vocalist"]) == [2, 9]
+        assert index.get_song_ids([1, 2], ["vocalist"]) == [2, 3, 9]
+        assert index.get_song_ids([1, 2], ["composer", "arranger"]) == [4]
+        assert index.get_song_ids([1, 2, 5], ["performer"]) == []
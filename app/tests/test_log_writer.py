@@ -0,0 +1,47 @@
+from .. import log_writer as log_writer_module
+from ..io_classes import IntRange
+from ..log_writer import LogWriter, add_logs
+
+import sqlite3
+
+
+def test_logs_are_written_in_batches(tmp_path, monkeypatch):
+    logs_path = str(tmp_path / "logs.sqlite")
+    log_writer = LogWriter(logs_path, queue_size=10, batch_size=2)
+    monkeypatch.setattr(log_writer_module, "log_writer", log_writer)
+
+    for song_name in ["Unravel", "Kyou mo Hare", "O'Neill"]:
+        add_logs(
+            nb_results=3,
+            execution_time=0.1234,
+            song_name=song_name,
+            song_difficulty_range=IntRange(min=10, max=90),
+            anime_genres=["Action", "Drama"],
+            max_results_per_search=350,
+        )
+    log_writer.start()
+    log_writer.stop()
+
+    assert log_writer.stats() == {
+        "queued": 0,
+        "written": 3,
+        "dropped": 0,
+        "failed": 0,
+        "batches": 2,
+    }
+
+    sqliteConnection = sqlite3.connect(logs_path)
+    assert sqliteConnection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert sqliteConnection.execute(
+        "SELECT song_name, execution_time, ann_id, song_types, anime_genres,"
+        + " anime_tags, song_difficulty_min, partial_match FROM logs"
+    ).fetchall()[-1] == ("O'Neill", 0.12, None, "1,2,3", "Action,Drama", None, "10", 1)
+    sqliteConnection.close()
+
+
+def test_logs_are_dropped_when_the_queue_is_full(tmp_path):
+    log_writer = LogWriter(str(tmp_path / "logs.sqlite"), queue_size=2)
+
+    assert [log_writer.add((i,)) for i in range(3)] == [True, True, False]
+    assert log_writer.stats()["queued"] == 2
+    assert log_writer.stats()["dropped"] == 1
@@ -0,0 +1,76 @@
+from ..io_classes import IntRange
+from ..pagination import decode_page_token, encode_page_token, get_page_limit
+from ..search_database import get_song_name_search_songs_list
+from ..sql_calls import request_database_path
+
+import pytest
+from fastapi import HTTPException
+
+SONG = (10,) + (None,) * 6 + (3, None, 2, 1)
+
+
+def search_page(max_results_per_search, after_song_key=None):
+    return get_song_name_search_songs_list(
+        "kyou",
+        True,
+        False,
+        [1, 2, 3],
+        ["Standard", "Chanting", "Character", "Instrumental"],
+        IntRange(min=0, max=100),
+        ["TV", "movie", "OVA", "special", "ONA"],
+        [],
+        [],
+        [],
+        max_results_per_search,
+        after_song_key,
+    )
+
+
+def test_get_page_limit():
+    assert get_page_limit(350) == 351
+    assert get_page_limit(-1) == -1
+
+
+class TestPageToken:
+    def test_round_trip(self):
+        assert decode_page_token(encode_page_token(SONG)) == (10, 2, 1, 3)
+        assert decode_page_token(None) is None
+
+    @pytest.mark.parametrize("page_token", ["garbage", "bnVsbA==", "WzEsMl0=", "é"])
+    def test_invalid_token(self, page_token):
+        with pytest.raises(HTTPException) as error:
+            decode_page_token(page_token)
+        assert error.value.status_code == 400
+
+    def test_expires_with_the_database(self, tmp_path):
+        for name in ["songs.sqlite", "songs.2023-06-01.sqlite"]:
+            (tmp_path / name).write_bytes(b"")
+
+        token = request_database_path.set(str(tmp_path / "songs.sqlite"))
+        try:
+            page_token = encode_page_token(SONG)
+        finally:
+            request_database_path.reset(token)
+
+        token = request_database_path.set(str(tmp_path / "songs.2023-06-01.sqlite"))
+        try:
+            with pytest.raises(HTTPException) as error:
+                decode_page_token(page_token)
+            assert error.value.status_code == 410
+        finally:
+            request_database_path.reset(token)
+
+
+def test_pages_follow_each_other():
+    results = search_page(-1)
+    assert results["next_page_token"] is None
+
+    songs = []
+    page = search_page(1000)
+    while page["next_page_token"] is not None:
+        assert len(page["songs"]) == 1000
+        songs += page["songs"]
+        page = search_page(1000, decode_page_token(page["next_page_token"]))
+    songs += page["songs"]
+
+    assert songs == results["songs"]
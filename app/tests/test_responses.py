@@ -0,0 +1,232 @@
+from ..artist_graph import ArtistGraph, get_artist_graph
+from ..io_classes import IntRange, Results
+from ..responses import get_result_fragments, render_results
+from ..search_database import (
+    get_anime_search_songs_list,
+    get_artists_ids_songs_list,
+    get_song_name_search_songs,
+    get_song_name_search_songs_list,
+)
+from ..sql_calls import extract_anime_genres_and_tags, request_database_path
+from ..utils import format_results, stream_results
+from .test_artist_graph import ARTIST_DATABASE
+
+import json
+import asyncio
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+CATEGORIES = ["Standard", "Chanting", "Character", "Instrumental"]
+CREDIT_TYPES = ["vocalist", "backing_vocalist", "performer", "composer", "arranger"]
+ANIME_TYPES = ["TV", "movie", "OVA", "special", "ONA"]
+
+
+def serialize_results(results):
+    """
+    Serialize the results as FastAPI does for an endpoint with response_model=Results
+    """
+
+    field = create_response_field(name="Response_Results", type_=Results)
+    content = asyncio.run(serialize_response(field=field, response_content=results))
+    return JSONResponse(content).body
+
+
+def get_song(song_id, ann_id, difficulty, category, vocalists, line_ups):
+    song = [None] * 30
+    song[0:8] = [
+        ann_id,
+        "Bocchi",
+        None,
+        "Bocchi the Rock!",
+        "ぼっち\\$Bocchi",
+        "Fall 2022",
+        "TV",
+        song_id,
+    ]
+    song[8:15] = [
+        song_id,
+        1,
+        2,
+        "Seishun Complex",
+        "Kessoku Band",
+        difficulty,
+        category,
+    ]
+    song[15:17] = [vocalists, line_ups]
+    song[25] = "https://files.catbox.moe/qy2q6p.webm"
+    return song
+
+
+# The responses assembled from fragments must be the ones FastAPI would send
+class TestRenderResults:
+    @pytest.mark.parametrize(
+        "search",
+        [
+            lambda: get_anime_search_songs_list(
+                "kato",
+                True,
+                False,
+                [1, 2, 3],
+                CATEGORIES,
+                IntRange(min=0, max=100),
+                ANIME_TYPES,
+                [],
+                [],
+                [],
+                350,
+            ),
+            lambda: get_song_name_search_songs_list(
+                "kyou",
+                True,
+                False,
+                [1, 2, 3],
+                CATEGORIES,
+                IntRange(min=0, max=100),
+                ANIME_TYPES,
+                [],
+                [],
+                [],
+                350,
+            ),
+            lambda: get_artists_ids_songs_list(
+                ["4437"],
+                99,
+                0,
+                CREDIT_TYPES,
+                False,
+                [1, 2, 3],
+                CATEGORIES,
+                IntRange(min=0, max=100),
+                ANIME_TYPES,
+                [],
+                [],
+                [],
+                350,
+            ),
+            lambda: format_results(get_artist_graph(), []),
+        ],
+    )
+    def test_search_results(self, search):
+        results = search()
+        content = render_results(results)
+
+        assert content == serialize_results(results)
+        # Second time from the fragments, and from results parsed back from Redis
+        assert render_results(search()) == content
+        assert render_results(json.loads(content)) == content
+
+    def test_conversions(self, tmp_path):
+        token = request_database_path.set(str(tmp_path / "songs.sqlite"))
+        try:
+            artist_graph = ArtistGraph(ARTIST_DATABASE)
+            songs = [
+                get_song(1, 10, 34, "Standard", "12,1", "1,-1"),
+                get_song(2, 10, None, None, "11", "0"),
+                get_song(3, 11, 56.7, "Character", None, None),
+            ]
+            anime_genres_and_tags = {10: {"anime_genres": ["Music"]}}
+
+            results = format_results(artist_graph, songs, anime_genres_and_tags)
+            content = render_results(results)
+
+            assert content == serialize_results(results)
+            assert json.loads(content)["songs"][0]["song_difficulty"] == 34.0
+            assert get_result_fragments().report()["songs"] == 3
+        finally:
+            request_database_path.reset(token)
+
+
+async def read_stream(stream):
+    return b"".join([records async for records in stream])
+
+
+def test_stream_results():
+    search = [
+        "kyou",
+        True,
+        False,
+        [1, 2, 3],
+        CATEGORIES,
+        IntRange(min=0, max=100),
+        ANIME_TYPES,
+        [],
+        [],
+        [],
+    ]
+    nb_results = []
+
+    content = asyncio.run(
+        read_stream(
+            stream_results(
+                get_artist_graph(),
+                get_song_name_search_songs(*search, 1000),
+                extract_anime_genres_and_tags(),
+                nb_results.append,
+            )
+        )
+    )
+    records = [json.loads(line) for line in content.splitlines()]
+
+    # The records are the entries of the results, anime and artists sent once
+    results = json.loads(
+        serialize_results(get_song_name_search_songs_list(*search, 1000))
+    )
+    assert nb_results == [len(results["songs"])]
+    for name, key in [("song", "songs"), ("anime", "anime"), ("artist", "artists")]:
+        entries = [record[name] for record in records if name in record]
+        assert sorted(entries, key=json.dumps) == sorted(results[key], key=json.dumps)
+
+    # Right before the first song referencing them
+    sent_ids = set()
+    for record in records:
+        if "song" in record:
+            song = record["song"]
+            assert ("anime", song["ann_id"]) in sent_ids
+            for role_type in ["vocalists", "composers", "arrangers"]:
+                for artist in song[role_type]:
+                    assert ("artist", artist["artist_id"]) in sent_ids
+        elif "anime" in record:
+            sent_ids.add(("anime", record["anime"]["ann_id"]))
+        else:
+            sent_ids.add(("artist", record["artist"]["artist_id"]))
+
+
+@pytest.mark.parametrize("max_results_per_search", [0, 10])
+def test_stream_results_next_page_token(max_results_per_search):
+    search = [
+        "kyou",
+        True,
+        False,
+        [1, 2, 3],
+        CATEGORIES,
+        IntRange(min=0, max=100),
+        ANIME_TYPES,
+        [],
+        [],
+        [],
+    ]
+
+    content = asyncio.run(
+        read_stream(
+            stream_results(
+                get_artist_graph(),
+                get_song_name_search_songs(*search, max_results_per_search + 1),
+                extract_anime_genres_and_tags(),
+                max_results_per_search=max_results_per_search,
+            )
+        )
+    )
+    records = [json.loads(line) for line in content.splitlines()]
+
+    # The stream ends with the token of the page after the songs sent
+    songs = [record["song"] for record in records if "song" in record]
+    assert len(songs) == max_results_per_search
+    if max_results_per_search:
+        page = get_song_name_search_songs_list(*search, max_results_per_search)
+        assert records[-1] == {"next_page_token": page["next_page_token"]}
+        assert songs[-1]["ann_song_id"] == page["songs"][-1]["ann_song_id"]
+    else:
+        assert records == []
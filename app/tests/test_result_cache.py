@@ -0,0 +1,134 @@
+from ..io_classes import SongCategory, SongSearchParams
+from ..result_cache import ResultCache, normalize_request
+from ..sql_calls import request_database_path
+
+import asyncio
+
+
+class Clock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_normalize_request():
+    assert normalize_request(
+        {"categories": [SongCategory.Instrumental, SongCategory.Standard]}
+    ) == {"categories": ["Instrumental", "Standard"]}
+    assert normalize_request({"searches": [{"id": 2}, {"id": 1}]}) == {
+        "searches": [{"id": 2}, {"id": 1}]
+    }
+
+
+class TestGetKey:
+    def test_equivalent_requests(self):
+        cache = ResultCache()
+
+        key = cache.get_key("song_name_search", SongSearchParams(song_name="Sister"))
+        assert key == cache.get_key(
+            "song_name_search",
+            SongSearchParams(
+                song_name="Sister",
+                song_categories=[
+                    SongCategory.Instrumental,
+                    SongCategory.Character,
+                    SongCategory.Chanting,
+                    SongCategory.Standard,
+                ],
+            ),
+        )
+        assert key != cache.get_key(
+            "song_name_search",
+            SongSearchParams(song_name="Sister", partial_match=False),
+        )
+        assert key != cache.get_key(
+            "anime_search", SongSearchParams(song_name="Sister")
+        )
+
+    def test_database_scope(self, tmp_path):
+        cache = ResultCache()
+        body = SongSearchParams(song_name="Sister")
+        for name in ["songs.sqlite", "songs.2023-06-01.sqlite"]:
+            (tmp_path / name).write_bytes(b"")
+
+        token = request_database_path.set(str(tmp_path / "songs.sqlite"))
+        try:
+            key = cache.get_key("song_name_search", body)
+        finally:
+            request_database_path.reset(token)
+
+        token = request_database_path.set(str(tmp_path / "songs.2023-06-01.sqlite"))
+        try:
+            assert key != cache.get_key("song_name_search", body)
+        finally:
+            request_database_path.reset(token)
+
+
+class TestResultCache:
+    def test_size_eviction(self):
+        cache = ResultCache(max_bytes=12)
+
+        cache.set_local("a", ["a"], b'["a"]')
+        cache.set_local("b", ["b"], b'["b"]')
+        assert cache.get_local("a") == (["a"], b'["a"]')
+        cache.set_local("c", ["c"], b'["c"]')
+
+        assert cache.get_local("b") is None
+        assert cache.get_local("a") == (["a"], b'["a"]')
+        assert cache.get_local("c") == (["c"], b'["c"]')
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] == 10
+
+        cache.set_local("d", ["d"], b'["d", "d", "d"]')
+        assert cache.get_local("d") is None
+
+    def test_ttl_expiration(self):
+        clock = Clock()
+        cache = ResultCache(ttl=60, clock=clock)
+
+        cache.set_local("a", ["a"], b'["a"]')
+        clock.time = 59
+        assert cache.get_local("a") == (["a"], b'["a"]')
+        clock.time = 60
+        assert cache.get_local("a") is None
+        assert cache.stats()["expirations"] == 1
+        assert cache.stats()["bytes"] == 0
+
+    def test_get_set(self):
+        cache = ResultCache()
+
+        async def search():
+            results = await cache.get("key")
+            assert results is None
+            await cache.set("key", [{"songId": 1}])
+            return await cache.get("key")
+
+        assert asyncio.run(search()) == ([{"songId": 1}], b'[{"songId": 1}]')
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_redis_tier(self):
+        class Redis:
+            def __init__(self):
+                self.values = {}
+
+            async def get(self, key):
+                return self.values.get(key)
+
+            async def set(self, key, value, ex=None):
+                self.values[key] = value
+
+        redis = Redis()
+        writer, reader = ResultCache(), ResultCache()
+        writer.redis = reader.redis = redis
+
+        async def search():
+            await writer.set("key", [{"songId": 1}], b'[{"songId":1}]')
+            return await reader.get("key"), await reader.get("key")
+
+        cached_results = ([{"songId": 1}], b'[{"songId":1}]')
+        assert asyncio.run(search()) == (cached_results, cached_results)
+        assert reader.stats()["redis_hits"] == 1
+        assert reader.stats()["hits"] == 1
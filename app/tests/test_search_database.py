@@ -0,0 +1,178 @@
+from ..io_classes import GlobalSearch
+from ..pagination import decode_page_token
+from ..search_database import (
+    combine_results,
+    get_anime_search_songs_list,
+    get_artists_ids_songs_list,
+    get_artists_search_songs,
+    get_artists_search_songs_list,
+    get_global_candidate_searches,
+    get_global_group_searches,
+    get_global_search_songs_list,
+    get_global_sub_searches,
+    get_shared_filters_song_ids,
+    get_song_ids,
+    get_song_name_search_songs,
+    get_song_name_search_songs_list,
+)
+from ..song_store import iter_songs_from_filters
+from ..sql_calls import connect_to_database, get_folded_names
+from ..utils import format_song_types_to_integer, get_regex_search
+
+from array import array
+import re
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "combination_logic, expected",
+    [("AND", [3, 8]), ("OR", [1, 2, 3, 5, 7, 8, 9])],
+)
+def test_combine_results(combination_logic, expected):
+    song_ids = [
+        array("i", [1, 3, 5, 8, 9]),
+        array("i", [2, 3, 8]),
+        array("i", [3, 7, 8]),
+    ]
+    assert list(combine_results(song_ids, combination_logic)) == expected
+
+
+def search_global(body, max_results_per_search, after_song_key=None):
+    body = GlobalSearch(**body)
+    groups = get_global_sub_searches(
+        body.anime_searches, body.song_name_searches, body.artist_searches
+    )
+    candidates = [search() for search in get_global_candidate_searches(groups)]
+    return get_global_search_songs_list(
+        [
+            ids
+            for group in get_global_group_searches(groups, candidates)
+            for ids in group()
+        ],
+        body.combination_logic,
+        max_results_per_search,
+        after_song_key,
+    )
+
+
+def test_global_search_combines_before_the_limit():
+    kyou = {"song_name_searches": [{"song_name": "kyou"}]}
+    both = {
+        "song_name_searches": [{"song_name": "kyou"}, {"song_name": "kyou"}],
+        "combination_logic": "AND",
+    }
+
+    results = search_global(kyou, -1)
+    assert search_global(both, -1)["songs"] == results["songs"]
+
+    page = search_global(both, 10)
+    assert page["songs"] == results["songs"][:10]
+    next_page = search_global(both, 10, decode_page_token(page["next_page_token"]))
+    assert next_page["songs"] == results["songs"][10:20]
+
+
+def test_sub_searches_sharing_filters_are_grouped():
+    body = GlobalSearch(
+        song_name_searches=[
+            {"song_name": "kyou"},
+            {"song_name": "kyou"},
+            {"song_name": "kyou", "song_types": ["opening"], "ignore_duplicates": True},
+            {"song_name": "ma", "partial_match": False},
+        ],
+        artist_searches=[{"artist_name": "hanazawa", "group_granularity": 1}],
+    )
+    groups = get_global_sub_searches(
+        body.anime_searches, body.song_name_searches, body.artist_searches
+    )
+    assert [len(sub_searches) for _, sub_searches in groups] == [3, 1]
+
+    # Each sub-search looks up its candidates on its own, the fetch being shared
+    candidate_searches = get_global_candidate_searches(groups)
+    assert len(candidate_searches) == 4
+    candidates = [search() for search in candidate_searches]
+    song_ids = [group() for group in get_global_group_searches(groups, candidates)]
+
+    # The same songs as each sub-search on its own
+    for group_song_ids, search, parameters in [
+        (song_ids[0][0], get_song_name_search_songs, body.song_name_searches[0]),
+        (song_ids[1][0], get_song_name_search_songs, body.song_name_searches[2]),
+        (song_ids[0][1], get_song_name_search_songs, body.song_name_searches[3]),
+        (song_ids[0][2], get_artists_search_songs, body.artist_searches[0]),
+    ]:
+        parameters = dict(parameters)
+        parameters["song_types"] = format_song_types_to_integer(
+            parameters["song_types"]
+        )
+        assert group_song_ids == get_song_ids(search, **parameters)
+        assert len(group_song_ids) > 0
+
+
+def test_shared_filters_without_candidates():
+    body = GlobalSearch(
+        anime_searches=[{"anime_name": "no anime named like this"}],
+        song_name_searches=[{"song_name": "kyou"}],
+    )
+    [(filters, sub_searches)] = get_global_sub_searches(
+        body.anime_searches, body.song_name_searches, body.artist_searches
+    )
+    song_ids = get_shared_filters_song_ids(
+        filters, sub_searches, [("ann_id", [], None), ("song_id", [1, 2], None)]
+    )
+
+    # Not every song fitting the filters for a sub-search without candidates
+    assert song_ids[0] == array("i")
+    assert set(song_ids[1]) <= {1, 2}
+
+
+def get_ann_song_ids(page):
+    return sorted(song["ann_song_id"] for song in page["songs"])
+
+
+@pytest.mark.parametrize("partial_match", [True, False])
+@pytest.mark.parametrize("search", ["hana", "uta ", "hoshi", "kana hanazawa"])
+def test_name_searches_same_as_regex(search, partial_match):
+    # The songs of the names matched like the regex search did
+    body = GlobalSearch(
+        anime_searches=[{"anime_name": search, "partial_match": partial_match}],
+        song_name_searches=[{"song_name": search, "partial_match": partial_match}],
+        artist_searches=[{"artist_name": search, "partial_match": partial_match}],
+    )
+    cursor = connect_to_database()
+
+    for name_type, column, search_songs_list, parameters in [
+        ("anime", 0, get_anime_search_songs_list, body.anime_searches[0]),
+        ("song", 7, get_song_name_search_songs_list, body.song_name_searches[0]),
+        ("artist", None, get_artists_search_songs_list, body.artist_searches[0]),
+    ]:
+        regex = get_regex_search(search, partial_match, name_type != "anime")
+        ids = {
+            id
+            for id, _, name in get_folded_names(cursor, name_type)
+            if re.match(regex, name.lower())
+        }
+
+        parameters = dict(parameters)
+        parameters["song_types"] = format_song_types_to_integer(
+            parameters["song_types"]
+        )
+        page = search_songs_list(**parameters, max_results_per_search=-1)
+
+        filters = dict(parameters)
+        del filters[f"{name_type}_name"], filters["partial_match"]
+        if column is None:
+            expected = get_ann_song_ids(
+                get_artists_ids_songs_list(
+                    sorted(ids)[:50], **filters, max_results_per_search=-1
+                )
+            )
+        else:
+            filters.pop("max_other_artists", None)
+            expected = sorted(
+                song[8]
+                for song in iter_songs_from_filters(
+                    cursor, **filters, max_results_per_search=-1
+                )
+                if song[column] in ids
+            )
+        assert get_ann_song_ids(page) == expected
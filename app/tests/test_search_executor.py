@@ -0,0 +1,96 @@
+from ..search_executor import SearchExecutor
+from ..sql_calls import connect_to_database, get_database_path, request_database_path
+
+import time
+import asyncio
+import threading
+from functools import partial
+
+import pytest
+
+
+def test_runs_in_the_context_of_the_request():
+    search_executor = SearchExecutor(max_workers=1)
+
+    async def search():
+        token = request_database_path.set("songs.2023-06-01.sqlite")
+        try:
+            return await search_executor.run(get_database_path)
+        finally:
+            request_database_path.reset(token)
+
+    assert asyncio.run(search()) == "songs.2023-06-01.sqlite"
+    search_executor.shutdown()
+
+
+def test_queue_depth_and_cancellation():
+    search_executor = SearchExecutor(max_workers=1)
+    unblock = threading.Event()
+
+    async def search():
+        blocking_task = asyncio.ensure_future(search_executor.run(unblock.wait))
+        queued_tasks = [
+            asyncio.ensure_future(search_executor.run(sum, [1, 2])) for _ in range(2)
+        ]
+        await asyncio.sleep(0.1)
+        stats = search_executor.stats()
+
+        queued_tasks[1].cancel()
+        await asyncio.sleep(0)
+        unblock.set()
+        return stats, await blocking_task, await queued_tasks[0]
+
+    stats, _, result = asyncio.run(search())
+
+    assert result == 3
+    assert (stats["running"], stats["queue_depth"]) == (1, 2)
+    stats = search_executor.stats()
+    assert stats["max_queue_depth"] >= 2
+    assert (stats["queue_depth"], stats["completed"], stats["cancelled"]) == (0, 2, 1)
+    assert stats["max_wait_time_ms"] >= 50
+    search_executor.shutdown()
+
+
+def test_run_all_concurrently_within_a_time_budget():
+    search_executor = SearchExecutor(max_workers=2)
+    # Both functions wait for each other, so they only return if run concurrently
+    barrier = threading.Barrier(2, timeout=5)
+
+    def search(result):
+        barrier.wait()
+        return result
+
+    results = asyncio.run(
+        search_executor.run_all([partial(search, 1), partial(search, 2)], timeout=5)
+    )
+    assert results == [1, 2]
+
+    unblock = threading.Event()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(search_executor.run_all([unblock.wait] * 3, timeout=0.1))
+    unblock.set()
+    # The function still queued is dropped, the running ones run to their end
+    assert search_executor.stats()["cancelled"] == 1
+    search_executor.shutdown()
+
+
+def test_run_all_aborts_the_queries_at_the_deadline():
+    search_executor = SearchExecutor(max_workers=1)
+
+    def search():
+        cursor = connect_to_database()
+        cursor.execute(
+            "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c"
+            " WHERE x < 1000000000) SELECT count(*) FROM c"
+        )
+        return cursor.fetchone()
+
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(search_executor.run_all([search], timeout=0.2))
+
+    # The query is aborted, freeing the thread for the next searches
+    assert asyncio.run(asyncio.wait_for(search_executor.run(sum, [1, 2]), 2)) == 3
+    assert time.perf_counter() - start < 2
+    assert search_executor.stats()["running"] == 0
+    search_executor.shutdown()
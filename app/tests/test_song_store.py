@@ -0,0 +1,146 @@
+from ..song_store import BitmapIndex, SongStore
+from ..sql_calls import get_possibles_songs_from_filters
+from ..io_classes import IntRange
+
+import sqlite3
+
+import numpy as np
+
+import pytest
+
+# ann_id, anime_season, anime_type, song_id, song_type, song_name, song_artist,
+# song_difficulty, song_category
+SONGS = [
+    (1, "Winter 2019", "TV", 1, 1, "Unravel", "TK", 45.2, "Standard"),
+    (1, "Winter 2019", "TV", 2, 2, "Yasashii", "Aimer", 30.0, "Standard"),
+    (2, "Spring 2020", "movie", 3, 3, "Unravel", "TK", None, "Instrumental"),
+    (2, "Spring 2020", "movie", 4, 1, "Gurenge", "LiSA", 70.5, None),
+    (3, None, "OVA", 5, 2, "Kaikai", "Eve", 12.0, "Character"),
+    (3, None, "OVA", 6, 1, "Kaikai", "Eve", 20.0, "Standard"),
+]
+ANIME_GENRES = [(1, "Action"), (1, "Drama"), (2, "Action"), (3, "Comedy")]
+ANIME_TAGS = [(1, "Gore"), (3, "Gore"), (3, "Idols")]
+
+# Written as plain strings to stay independent of Enum formatting
+DEFAULT_FILTERS = {
+    "song_categories": ["Standard", "Chanting", "Character", "Instrumental"],
+    "anime_types": ["TV", "movie", "OVA", "special", "ONA"],
+}
+
+ANIME_GENRES_AND_TAGS = {
+    ann_id: {
+        "anime_genres": [genre for id, genre in ANIME_GENRES if id == ann_id],
+        "anime_tags": [tag for id, tag in ANIME_TAGS if id == ann_id],
+    }
+    for ann_id in [1, 2, 3]
+}
+
+
+def to_songs_full_row(song):
+    row = [None] * 30
+    row[0], row[5], row[6], row[7], row[9] = song[0], song[1], song[2], song[3], song[4]
+    row[10] = 1
+    row[11], row[12], row[13], row[14] = song[5], song[6], song[7], song[8]
+    return tuple(row)
+
+
+class TestSongStore:
+    @pytest.fixture
+    def cursor(self):
+        columns = [f"column_{i}" for i in range(30)]
+        columns[0], columns[5], columns[6], columns[7] = (
+            "ann_id",
+            "anime_season",
+            "anime_type",
+            "song_id",
+        )
+        columns[9], columns[10] = "song_type", "song_number"
+        columns[11], columns[12] = "song_name", "song_artist"
+        columns[13], columns[14] = "song_difficulty", "song_category"
+
+        sqliteConnection = sqlite3.connect(":memory:")
+        sqliteConnection.execute(f"CREATE TABLE songs_full ({', '.join(columns)})")
+        sqliteConnection.executemany(
+            f"INSERT INTO songs_full VALUES ({', '.join('?' * 30)})",
+            [to_songs_full_row(song) for song in SONGS],
+        )
+        sqliteConnection.execute("CREATE TABLE link_anime_genre (ann_id, genre)")
+        sqliteConnection.executemany(
+            "INSERT INTO link_anime_genre VALUES (?, ?)", ANIME_GENRES
+        )
+        sqliteConnection.execute("CREATE TABLE link_anime_tag (ann_id, tag)")
+        sqliteConnection.executemany(
+            "INSERT INTO link_anime_tag VALUES (?, ?)", ANIME_TAGS
+        )
+        yield sqliteConnection.cursor()
+        sqliteConnection.close()
+
+    @pytest.mark.parametrize(
+        "filters",
+        [
+            {},
+            {"song_types": [1]},
+            {"song_types": [1, 2], "anime_types": ["TV", "OVA"]},
+            {"song_categories": ["Standard"]},
+            {"anime_seasons": ["Spring 2020"]},
+            {"song_difficulty_range": IntRange(min=20, max=50)},
+            {"ann_ids": [1, 3], "song_ids": [2, 3, 5]},
+            {"anime_types": []},
+            {"ignore_duplicates": True},
+            {"anime_genres": ["Action"]},
+            {"anime_genres": ["Action", "Drama"]},
+            {"anime_genres": ["Action", "Unknown"]},
+            {"anime_genres": ["Action"], "anime_tags": ["Gore"]},
+            {"anime_tags": ["Gore", "Idols"], "song_types": [2]},
+            {"after_song_key": (2, 1, 1, 4)},
+            {"after_song_key": (1, 2, 1, 2), "ignore_duplicates": True},
+            {"after_song_key": (2, 3, 1, 3), "max_results_per_search": 1},
+        ],
+    )
+    def test_same_songs_as_sql(self, cursor, filters):
+        song_store = SongStore(
+            [to_songs_full_row(song) for song in SONGS], ANIME_GENRES_AND_TAGS
+        )
+        filters = {**DEFAULT_FILTERS, **filters}
+
+        sql_songs = get_possibles_songs_from_filters(cursor, **filters)
+        store_songs = [song_store.songs[i] for i in song_store.filter(**filters)]
+
+        # Same songs in the same order, the same duplicates being kept
+        assert store_songs == sql_songs
+
+    def test_max_results(self):
+        song_store = SongStore([to_songs_full_row(song) for song in SONGS])
+
+        assert list(song_store.filter(max_results_per_search=2)) == [0, 1]
+
+
+class TestBitmapIndex:
+    def test_get_mask(self):
+        bitmap_index = BitmapIndex(
+            {
+                "song_type": np.array([1, 2, 3, 1, 2], dtype=np.int8),
+                "anime_type": np.array([0, 0, 1, -1, 1], dtype=np.int16),
+            },
+            {"song_type": {1: 1, 2: 2, 3: 3}, "anime_type": {"TV": 0, "movie": 1}},
+        )
+
+        assert list(bitmap_index.get_mask(song_type=[1, 2])) == [1, 1, 0, 1, 1]
+        assert list(
+            bitmap_index.get_mask(song_type=[1, 2], anime_type=["movie", "OVA"])
+        ) == [0, 0, 0, 0, 1]
+        assert list(bitmap_index.get_mask(song_type=[], anime_type=None)) == [0] * 5
+
+    def test_masks_are_cached_per_filter_combination(self):
+        bitmap_index = BitmapIndex(
+            {"song_type": np.array([1, 2, 3], dtype=np.int8)},
+            {"song_type": {1: 1, 2: 2, 3: 3}},
+        )
+
+        bitmap_index.get_mask(song_type=[1, 2])
+        bitmap_index.get_mask(song_type=[2, 1])
+        bitmap_index.get_mask(song_type=[3])
+
+        report = bitmap_index.report()
+        assert (report["cache_hits"], report["cache_misses"]) == (1, 2)
+        assert report["bitmaps"] == 3
@@ -1,4 +1,21 @@
-from ..sql_calls import extract_artist_database
+from ..sql_calls import (
+    extract_artist_database,
+    connect_to_database,
+    get_songs_query_from_filters,
+    get_songs_query_template,
+    ConnectionPool,
+    get_full_text_search_match,
+    get_folded_name_filter,
+    iter_stream_songs,
+)
+
+from ..io_classes import IntRange
+from ..utils import get_name_search
+
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
 
 
 class TestExtractDatabaseData:
@@ -9,3 +26,222 @@ class TestExtractDatabaseData:
 
         assert artist_database is not None
         assert "Kana Hanazawa" in artist_database["4437"]["names"]
+
+
+class TestConnectionPool:
+    @pytest.fixture
+    def database_path(self, tmp_path):
+        database_path = str(tmp_path / "pool.sqlite")
+        sqliteConnection = sqlite3.connect(database_path)
+        sqliteConnection.execute("CREATE TABLE songs (song_name TEXT)")
+        sqliteConnection.execute("INSERT INTO songs VALUES ('Unravel')")
+        sqliteConnection.commit()
+        sqliteConnection.close()
+        return database_path
+
+    def test_connection_is_reused(self, database_path):
+        pool = ConnectionPool()
+        first_connection = pool.get_connection(database_path)
+        second_connection = pool.get_connection(database_path)
+
+        assert first_connection is second_connection
+        assert pool.stats() == {"hits": 1, "misses": 1, "open_connections": 1}
+        pool.close_all()
+
+    def test_connection_is_read_only(self, database_path):
+        pool = ConnectionPool()
+        connection = pool.get_connection(database_path)
+
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute("INSERT INTO songs VALUES ('Gurenge')")
+        pool.close_all()
+
+    def test_retired_database(self, database_path, tmp_path):
+        pool = ConnectionPool()
+        first_connection = pool.get_connection(database_path)
+        pool.retire(database_path)
+
+        # Still used by the requests running on the retired database
+        assert pool.get_connection(database_path) is first_connection
+        assert first_connection.execute("SELECT count(*) FROM songs").fetchone() == (1,)
+
+        # Then closed by its thread once it moves on to another database
+        other_path = str(tmp_path / "other.sqlite")
+        sqlite3.connect(other_path).close()
+        pool.get_connection(other_path)
+        assert pool.stats()["open_connections"] == 1
+        with pytest.raises(sqlite3.ProgrammingError):
+            first_connection.execute("SELECT 1")
+        pool.close_all()
+
+    def test_regexp_is_registered(self, database_path):
+        pool = ConnectionPool()
+        connection = pool.get_connection(database_path)
+
+        assert connection.execute(
+            "SELECT song_name FROM songs WHERE lower(song_name) REGEXP ?", [".*rav.*"]
+        ).fetchall() == [("Unravel",)]
+        pool.close_all()
+
+    def test_stream_songs_on_their_own_connection(self):
+        cursors = []
+
+        def search():
+            cursors.append(connect_to_database())
+            return cursors[0].execute("SELECT song_id FROM songs_full LIMIT 3")
+
+        songs = iter_stream_songs(search)
+        first_song = next(songs)
+        assert cursors[0].connection is not connect_to_database().connection
+
+        # The other songs are read by another thread, then the connection is closed
+        with ThreadPoolExecutor(1) as executor:
+            assert len([first_song] + executor.submit(list, songs).result()) == 3
+        with pytest.raises(sqlite3.ProgrammingError):
+            cursors[0].execute("SELECT 1")
+
+
+class TestFoldedNameFilter:
+    def test_full_text_search_match(self):
+        assert (
+            get_full_text_search_match(["name_folded"], ["kana", "hanazawa"])
+            == '{name_folded} : ("kana" AND "hanazawa")'
+        )
+
+    def test_full_text_search_match_too_short(self):
+        assert (
+            get_full_text_search_match(["name_folded"], ["aimer", "ai"])
+            == '{name_folded} : ("aimer")'
+        )
+        assert get_full_text_search_match(["name_folded"], ["ai", "yo"]) is None
+
+    def test_partial_match_narrowed_by_full_text_search(self):
+        name_search = get_name_search("aimer")
+        name_filter, data = get_folded_name_filter(
+            ["name_folded"], name_search, "artist_names_fts", "inserted_order"
+        )
+
+        assert "artist_names_fts MATCH ?" in name_filter
+        assert data == ['{name_folded} : ("aimer")', "aimer", name_search.regex]
+
+    def test_exact_match(self):
+        name_search = get_name_search("aimer", partial_match=False)
+        name_filter, data = get_folded_name_filter(
+            ["name_folded"], name_search, "artist_names_fts", "inserted_order"
+        )
+
+        assert name_filter == "((name_folded IN (?) AND NAME_REGEXP(?, name)))"
+        assert data == ["aimer", name_search.regex]
+
+    def test_names_verified_with_the_regex(self):
+        cursor = connect_to_database("app/data/enhanced_amq_database.sqlite")
+        name_filter, data = get_folded_name_filter(
+            ["name_folded"], get_name_search("hanazawa kana"), "artist_names_fts"
+        )
+
+        assert cursor.execute(
+            f"SELECT name FROM link_artist_name WHERE {name_filter}", data
+        ).fetchall() == [("Kana Hanazawa",)]
+
+
+class TestSongsQuery:
+    def test_query_only_depends_on_the_shape_of_the_filters(self):
+        first_query, first_data = get_songs_query_from_filters(
+            ann_ids=[1, 2], anime_seasons=["Winter 2019"], max_results_per_search=350
+        )
+        second_query, second_data = get_songs_query_from_filters(
+            ann_ids=[3, 4, 5], anime_seasons=["Fall 2001"], max_results_per_search=10
+        )
+
+        assert first_query is second_query
+        assert first_data != second_data
+        assert "Winter 2019" not in first_query
+
+    def test_limit_is_always_applied(self):
+        query, data = get_songs_query_from_filters(max_results_per_search=350)
+
+        assert query.endswith(" LIMIT ?")
+        assert data[-1] == 350
+
+    def test_songs_after_a_key(self):
+        cursor = connect_to_database("app/data/enhanced_amq_database.sqlite")
+        query, data = get_songs_query_from_filters(
+            ann_ids=[1, 2, 3], max_results_per_search=-1
+        )
+        songs = cursor.execute(query, data).fetchall()
+        song_keys = [(song[0], song[9], song[10], song[7]) for song in songs]
+
+        query, data = get_songs_query_from_filters(
+            ann_ids=[1, 2, 3], max_results_per_search=-1, after_song_key=song_keys[0]
+        )
+
+        assert song_keys == sorted(song_keys)
+        assert cursor.execute(query, data).fetchall() == songs[1:]
+
+    def test_query_templates_are_cached(self):
+        get_songs_query_template.cache_clear()
+        get_songs_query_from_filters(song_types=[1])
+        get_songs_query_from_filters(song_types=[2])
+
+        assert get_songs_query_template.cache_info().hits == 1
+
+
+class TestSongsQueryPlans:
+    # First step of the plan of each shape of filters, on the production database
+    PLAN_SNAPSHOTS = [
+        (
+            {"ann_ids": [1, 2]},
+            "SEARCH songs_full USING INDEX idx_songs_full_ann_id (ann_id=?)",
+        ),
+        (
+            {"song_ids": [1, 5, 9]},
+            "SEARCH songs_full USING INTEGER PRIMARY KEY (rowid=?)",
+        ),
+        (
+            {"anime_seasons": ["Winter 2019"]},
+            "SEARCH songs_full USING INDEX idx_songs_full_anime_season (anime_season=?)",
+        ),
+        (
+            {"song_name_search": get_name_search("kyo")},
+            "SEARCH songs_full USING INTEGER PRIMARY KEY (rowid=?)",
+        ),
+        (
+            {"song_name_search": get_name_search("unravel", partial_match=False)},
+            "SEARCH songs_full USING INDEX idx_songs_full_song_name_folded (song_name_folded=?)",
+        ),
+        (
+            {"artist_name_search": get_name_search("aimer")},
+            "SEARCH songs_full USING INTEGER PRIMARY KEY (rowid=?)",
+        ),
+        (
+            {"anime_name_search": get_name_search("kato")},
+            "SEARCH songs_full USING INDEX idx_songs_full_ann_id (ann_id=?)",
+        ),
+        (
+            {"anime_genres": ["Action", "Drama"]},
+            "SEARCH songs_full USING INDEX idx_songs_full_ann_id (ann_id=?)",
+        ),
+        (
+            {"anime_tags": ["Gore"]},
+            "SEARCH songs_full USING INDEX idx_songs_full_ann_id (ann_id=?)",
+        ),
+        (
+            {"song_difficulty_range": IntRange(min=20, max=21)},
+            "SEARCH songs_full USING INDEX idx_songs_full_song_difficulty (song_difficulty>? AND song_difficulty<?)",
+        ),
+    ]
+
+    @pytest.mark.parametrize("filters, plan_snapshot", PLAN_SNAPSHOTS)
+    def test_query_plan(self, filters, plan_snapshot):
+        cursor = connect_to_database("app/data/enhanced_amq_database.sqlite")
+        query, data = get_songs_query_from_filters(**filters)
+
+        plan = [row[3] for row in cursor.execute("EXPLAIN QUERY PLAN " + query, data)]
+
+        assert plan[0] == plan_snapshot
+        # Only virtual tables (json_each, full text search) may be scanned
+        assert not [
+            step
+            for step in plan
+            if step.startswith("SCAN") and "VIRTUAL TABLE" not in step
+        ]
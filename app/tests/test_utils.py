@@ -1,5 +1,21 @@
-from ..utils import format_song_types_to_integer, format_song_types_to_string
+from ..utils import (
+    format_artist_id,
+    format_song_types_to_integer,
+    format_song_types_to_string,
+    fold_name,
+    get_folded_parts,
+    get_folded_search,
+    get_name_search,
+    get_regex_search,
+)
+from ..indexes import TrigramIndex
 from ..io_classes import SongType
+from ..artist_graph import ArtistGraph
+from .test_artist_graph import ARTIST_DATABASE
+
+import re
+
+import pytest
 
 
 # Test formatting from the database to the output format
@@ -29,3 +45,83 @@ class TestFormatResults:
     def test_format_song_types_to_string_4(self):
         song_type = format_song_types_to_string(3, 1)
         assert song_type == "Insert Song"
+
+    def test_format_artist_id(self):
+        artist_graph = ArtistGraph(ARTIST_DATABASE)
+
+        formatted_artist = format_artist_id(artist_graph, 12)
+        assert [
+            [member["artist_id"] for member in line_up["members"]]
+            for line_up in formatted_artist["line_ups"]
+        ] == [[1, 2], [1, 11]]
+        assert format_artist_id(artist_graph, 11)["line_ups"][0]["members"] == [
+            {"artist_id": 3, "names": [], "line_up_id": -1},
+            {"artist_id": 4, "names": [], "line_up_id": -1},
+        ]
+        assert format_artist_id(artist_graph, 12) is formatted_artist
+        assert format_artist_id(artist_graph, 99) == {}
+
+
+def regex_match(name, search, partial_match, swap_words):
+    return re.match(get_regex_search(search, partial_match, swap_words), name.lower())
+
+
+def folded_match(name, search, partial_match, swap_words):
+    index = TrigramIndex([(1, fold_name(name), name)])
+    return index.match(get_name_search(search, partial_match, swap_words)) == [1]
+
+
+# Test that matching folded names gives the same results as the regex rules
+class TestFoldName:
+    @pytest.mark.parametrize(
+        "name, search, partial_match, swap_words, expected",
+        [
+            ("Tōkyō Ghoul", "tokyo ghoul", False, False, True),
+            ("Toukyou Ghoul", "tokyo", True, False, True),
+            ("Tōkyō Ghoul", "tohkyoh", True, False, True),
+            ("Ōkami Kakushi", "ookami", True, False, True),
+            ("Sōkyū no Fafner", "sokyu no fafner", False, False, True),
+            ("Shingeki no Kyojin", "kyojin", True, False, True),
+            ("Bokura wa Ima no Naka de", "ima no naka", True, False, True),
+            ("Re:Zero kara Hajimeru Isekai Seikatsu", "re zero", True, False, True),
+            ("Fate/Zero", "fate zero", False, False, True),
+            ("K-ON!!", "k on", True, False, True),
+            ("THE iDOLM@STER", "idolmaster", True, False, True),
+            ("Hunter×Hunter", "hunterxhunter", False, False, True),
+            ("Kana Hanazawa", "hanazawa kana", False, True, True),
+            ("Kana Hanazawa", "hanazawa kana", False, False, False),
+            ("Aimer", "aimer", False, True, True),
+            ("Aimer", "aime", False, True, False),
+            ("Aimer", "aime", True, True, True),
+            ("Nisekoi", "naruto", True, False, False),
+            ("Sword Art Online", "sword art", True, False, True),
+            ("Sword Art Online", "online sword", True, True, False),
+            ("Ohana", "hana", True, False, True),
+            ("Kohaku", "haku", True, False, True),
+            ("Kouta", "uta ", True, False, False),
+            ("Kou Utada", "uta", True, False, True),
+            ("Hunter×Hunter", "hunter hunter", False, False, True),
+            ("Hoshi", "hoshi", False, False, True),
+        ],
+    )
+    def test_folded_match_same_as_regex(
+        self, name, search, partial_match, swap_words, expected
+    ):
+        assert bool(regex_match(name, search, partial_match, swap_words)) == expected
+        assert folded_match(name, search, partial_match, swap_words) == expected
+
+    def test_fold_name(self):
+        assert fold_name("Tōkyō") == fold_name("Toukyou") == fold_name("Tohkyoh")
+        assert fold_name("Re:Zero  -  Starting Life") == "re zero starting life"
+        assert fold_name("けいおん!") == "けいおん"
+        assert fold_name(None) is None
+
+    def test_get_folded_search_empty(self):
+        assert get_folded_search("!!!!") == []
+        assert get_name_search("!!!!").folded_parts == []
+
+    def test_get_folded_parts(self):
+        assert get_folded_parts("hana") == ["ana"]
+        assert get_folded_parts("Kyou no Hoshi") == ["kyo", "no", "oshi"]
+        assert get_folded_parts("chou") == ["ho"]
+        assert get_folded_parts("tomow") == ["tomo"]
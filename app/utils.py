@@ -1,8 +1,24 @@
-from .io_classes import SongType
+from .io_classes import AnimeEntry, Artist, SongEntry, SongType
+from .artist_graph import ArtistGraph
+from .responses import get_result_fragments
+from .pagination import encode_page_token
+from .sql_calls import NameSearch
+from .name_folding import fold_name
 
 import re
+import json
 from datetime import datetime
-from typing import Any, List, Dict
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
 
 """
 A collection of useful functions
@@ -43,6 +59,11 @@ ANIME_REGEX_REPLACE_RULES = [
     {"input": "s", "replace": "[sς]"},
 ]
 
+# Letters folded into a long vowel before them (ou, oh) or after them (wo)
+FOLDED_PART_EDGES = re.compile("^[uh]+|w+$")
+# Characters whose regex rules match letters folded differently
+FOLDED_AMBIGUOUS_CHARACTERS = re.compile("[ '0c]")
+
 
 def escapeRegExp(str):
     """
@@ -122,6 +143,100 @@ def get_regex_search(og_search, partial_match=True, swap_words=True):
     return search
 
 
+def get_folded_search(og_search, swap_words=True):
+    """
+    Get the folded searches from the search string, to be matched against folded names
+
+    Parameters
+    ----------
+    og_search : str
+        The search string
+    swap_words : bool, optional
+        Whether to allow swapping the words, by default True
+
+    Returns
+    -------
+    List[str]
+        The folded searches, empty if nothing is left to search once folded
+    """
+
+    searches = [fold_name(og_search)]
+
+    if swap_words:
+        alt_search = og_search.split(" ")
+        if len(alt_search) == 2:
+            searches.append(fold_name(" ".join([alt_search[1], alt_search[0]])))
+
+    return [
+        search
+        for i, search in enumerate(searches)
+        if search and search not in searches[:i]
+    ]
+
+
+def get_folded_parts(og_search):
+    """
+    Get the folded parts of the search string, contained in the folded form of every
+    name the search partially matches (in any order of the words)
+
+    The folded search is split at its spaces and at the characters whose regex rules
+    match letters folded differently (0 matches Ө, c matches ς). The letters a long
+    vowel of the name right before or after a part could be folded with are removed
+    from its edges: the "h" of "hana" is folded into "Ohana" (oana)
+
+    Parameters
+    ----------
+    og_search : str
+        The search string
+
+    Returns
+    -------
+    List[str]
+        The folded parts, empty if nothing is left to narrow down the names with
+    """
+
+    parts = []
+    for part in re.split("[ 0]", fold_name(og_search) or ""):
+        part = FOLDED_PART_EDGES.sub("", part)
+        parts += part.split("c")
+
+    return [part for i, part in enumerate(parts) if part and part not in parts[:i]]
+
+
+def get_name_search(og_search, partial_match=True, swap_words=True):
+    """
+    Get the name search from the search string: the regex the names have to match,
+    and the folded strings narrowing down the names to match against it
+
+    Parameters
+    ----------
+    og_search : str
+        The search string
+    partial_match : bool, optional
+        Whether to allow partial matches, by default True
+    swap_words : bool, optional
+        Whether to allow swapping the words, by default True
+
+    Returns
+    -------
+    NameSearch
+        The name search
+    """
+
+    folded_names = get_folded_search(og_search, swap_words)
+
+    # A name exactly matching the search is folded to the same name, unless the
+    # search has characters whose regex rules match letters folded differently
+    if partial_match or FOLDED_AMBIGUOUS_CHARACTERS.search(og_search.lower()):
+        folded_names = []
+
+    return NameSearch(
+        get_regex_search(og_search, partial_match, swap_words),
+        get_folded_parts(og_search),
+        folded_names,
+    )
+
+
 def is_ranked_time() -> bool:
     """
     Returns true if it is ranked time
@@ -208,65 +323,173 @@ def format_song_types_to_string(song_type: int, song_number: int) -> str:
     return song_type
 
 
-def format_artist_id(artist_database: Dict, artist_id: int) -> Dict:
+def format_artist_id(artist_graph: ArtistGraph, artist_id: int) -> Dict:
     """
     Format the artist to the output format
 
+    The output of an artist only changes with the database, so it is memoized
+    in the artist graph of the database, and shared by every response
+
     Parameters
     ----------
-    artist_database : Dict
-        The artist database
+    artist_graph : ArtistGraph
+        The artist graph
     artist_id : int
         The artist id
 
     Returns
     -------
     Dict
-        The formatted artist
+        The formatted artist, must not be modified
     """
 
-    artist = artist_database.get(str(artist_id))
+    formatted_artist = artist_graph.formatted_artists.get(artist_id)
+    if formatted_artist is not None:
+        return formatted_artist
 
-    if artist is None:
+    if artist_id not in artist_graph:
         return {}
 
     formatted_groups = []
-    for group in artist.get("groups", []):
-        group_names = artist_database.get(group["id"], {}).get("names", [])
-        formatted_groups.append({"artist_id": int(group["id"]), "names": group_names})
+    for group_id in artist_graph.get_groups(artist_id):
+        group_names = artist_graph.get_names(group_id)
+        formatted_groups.append({"artist_id": group_id, "names": group_names})
 
-    formatted_members = []
     line_ups = []
-    for i, line_up in enumerate(artist["line_ups"]):
-        for member in line_up.get("members", []):
-            member_names = artist_database.get(member["id"], {}).get("names", [])
+    for i in range(artist_graph.get_line_up_count(artist_id)):
+        formatted_members = []
+        for member_id, member_line_up_id in artist_graph.get_line_up(artist_id, i):
             formatted_members.append(
                 {
-                    "artist_id": int(member["id"]),
-                    "names": member_names,
-                    "line_up_id": int(member["line_up_id"]),
+                    "artist_id": member_id,
+                    "names": artist_graph.get_names(member_id),
+                    "line_up_id": member_line_up_id,
                 }
             )
         line_ups.append({"line_up_id": i, "members": formatted_members})
 
-    return {
-        "artist_id": int(artist_id),
-        "names": artist.get("names", []),
+    formatted_artist = {
+        "artist_id": artist_id,
+        "names": artist_graph.get_names(artist_id),
         "line_ups": line_ups if line_ups else None,
         "groups": formatted_groups if formatted_groups else None,
     }
+    artist_graph.formatted_artists[artist_id] = formatted_artist
+
+    return formatted_artist
+
+
+# Number of songs formatted between two writes of a streamed response
+STREAM_BATCH_SIZE = 100
 
+ROLE_TYPE_COLUMNS = {
+    "vocalists": 15,
+    "backing_vocalists": 17,
+    "performers": 19,
+    "composers": 21,
+    "arrangers": 23,
+}
 
-def format_results(artist_database: Dict, songs: List[List[Any]]) -> Dict:
+
+def format_song(song: List[Any]) -> Dict:
+    """
+    Format a song of songs_full to the output format
+
+    Parameters
+    ----------
+    song : List[Any]
+        The song to format
+
+    Returns
+    -------
+    Dict
+        The formatted song
+    """
+
+    role_type_artists = {}
+    for role_type, column in ROLE_TYPE_COLUMNS.items():
+        role_type_artists[role_type] = []
+        if not song[column]:
+            continue
+
+        for artist_id, artist_line_up_id in zip(
+            song[column].split(","), song[column + 1].split(",")
+        ):
+            role_type_artists[role_type].append(
+                {"artist_id": int(artist_id), "line_up_id": int(artist_line_up_id)}
+            )
+
+    return {
+        "ann_id": song[0],
+        "ann_song_id": song[8],
+        "song_type": format_song_types_to_string(song[9], song[10]),
+        "song_name": song[11],
+        "song_artist": song[12],
+        "song_difficulty": song[13],
+        "song_category": song[14],
+        "HQ": song[25],
+        "MQ": song[26],
+        "audio": song[27],
+        "vocalists": role_type_artists["vocalists"],
+        "backing_vocalists": role_type_artists["backing_vocalists"],
+        "performers": role_type_artists["performers"],
+        "composers": role_type_artists["composers"],
+        "arrangers": role_type_artists["arrangers"],
+    }
+
+
+def format_anime(
+    song: List[Any], anime_genres_and_tags: Dict[int, Dict[str, List[str]]]
+) -> Dict:
+    """
+    Format the anime of a song of songs_full to the output format
+
+    Parameters
+    ----------
+    song : List[Any]
+        The song whose anime to format
+    anime_genres_and_tags : Dict[int, Dict[str, List[str]]]
+        The genres and tags of each anime, by ann_id
+
+    Returns
+    -------
+    Dict
+        The formatted anime
+    """
+
+    genres_and_tags = anime_genres_and_tags.get(song[0], {})
+    return {
+        "ann_id": song[0],
+        "anime_jp_name": song[2] or song[1],
+        "anime_en_name": song[3] or song[1],
+        "anime_alt_names": song[4].split(r"\$") if song[4] else song[4],
+        "anime_season": song[5],
+        "anime_type": song[6],
+        "anime_genres": list(genres_and_tags.get("anime_genres", [])),
+        "anime_tags": list(genres_and_tags.get("anime_tags", [])),
+    }
+
+
+def format_results(
+    artist_graph: ArtistGraph,
+    songs: List[List[Any]],
+    anime_genres_and_tags: Dict[int, Dict[str, List[str]]] = {},
+) -> Dict:
     """
     Format the song to the output format
 
+    The formatted songs, anime and artists are memoized for the database of the
+    current request along with their JSON (see render_results), the results must
+    not be modified
+
     Parameters
     ----------
-    artist_database : Dict
-        The artist database
+    artist_graph : ArtistGraph
+        The artist graph
     song : List[Any]
         The song to format
+    anime_genres_and_tags : Dict[int, Dict[str, List[str]]], optional
+        The genres and tags of each anime, by ann_id, as extracted from the database
 
     Returns
     -------
@@ -274,6 +497,8 @@ def format_results(artist_database: Dict, songs: List[List[Any]]) -> Dict:
         The formatted results
     """
 
+    result_fragments = get_result_fragments()
+
     output_anime = []
     output_songs = []
     output_artists = []
@@ -282,70 +507,195 @@ def format_results(artist_database: Dict, songs: List[List[Any]]) -> Dict:
     ann_ids = set()
 
     for song in songs:
-        song_type = format_song_types_to_string(song[9], song[10])
-
-        role_type_columns = {
-            "vocalists": 15,
-            "backing_vocalists": 17,
-            "performers": 19,
-            "composers": 21,
-            "arrangers": 23,
-        }
-
-        role_type_artists = {}
-        for role_type in role_type_columns:
-            column = role_type_columns[role_type]
-            role_type_artists[role_type] = []
-            if not song[column]:
-                continue
-
-            for artist_id, artist_line_up_id in zip(
-                song[column].split(","), song[column + 1].split(",")
-            ):
-                if artist_id not in artist_ids:
-                    output_artists.append(format_artist_id(artist_database, artist_id))
-                    artist_ids.add(artist_id)
-                role_type_artists[role_type].append(
-                    {"artist_id": int(artist_id), "line_up_id": int(artist_line_up_id)}
-                )
+        formatted_song = result_fragments.songs.get(song[7])
+        if formatted_song is None:
+            formatted_song = result_fragments.add(SongEntry, format_song(song))
+            result_fragments.songs[song[7]] = formatted_song
+
+        for role_type in ROLE_TYPE_COLUMNS:
+            for artist in formatted_song[role_type]:
+                if artist["artist_id"] not in artist_ids:
+                    formatted_artist = format_artist_id(
+                        artist_graph, artist["artist_id"]
+                    )
+                    if formatted_artist:
+                        result_fragments.add(Artist, formatted_artist)
+                    output_artists.append(formatted_artist)
+                    artist_ids.add(artist["artist_id"])
 
         if song[0] not in ann_ids:
-            output_anime.append(
-                {
-                    "ann_id": song[0],
-                    "anime_jp_name": song[2] or song[1],
-                    "anime_en_name": song[3] or song[1],
-                    "anime_alt_names": song[4].split(r"\$") if song[4] else song[4],
-                    "anime_season": song[5],
-                    "anime_type": song[6],
-                    "anime_genres": [],
-                    "anime_tags": [],
-                }
+            # Only the genres and tags of the database are memoized with the anime
+            formatted_anime = (
+                result_fragments.anime.get(song[0]) if anime_genres_and_tags else None
             )
+            if formatted_anime is None:
+                formatted_anime = format_anime(song, anime_genres_and_tags)
+                if anime_genres_and_tags:
+                    result_fragments.add(AnimeEntry, formatted_anime)
+                    result_fragments.anime[song[0]] = formatted_anime
+            output_anime.append(formatted_anime)
             ann_ids.add(song[0])
 
-        output_songs.append(
-            {
-                "ann_id": song[0],
-                "ann_song_id": song[8],
-                "song_type": song_type,
-                "song_name": song[11],
-                "song_artist": song[12],
-                "song_difficulty": song[13],
-                "song_category": song[14],
-                "HQ": song[25],
-                "MQ": song[26],
-                "audio": song[27],
-                "vocalists": role_type_artists["vocalists"],
-                "backing_vocalists": role_type_artists["backing_vocalists"],
-                "performers": role_type_artists["performers"],
-                "composers": role_type_artists["composers"],
-                "arrangers": role_type_artists["arrangers"],
-            }
-        )
+        output_songs.append(formatted_song)
 
     return {
         "anime": output_anime,
         "songs": output_songs,
         "artists": output_artists,
     }
+
+
+def iter_result_batches(
+    artist_graph: ArtistGraph,
+    songs: Iterable[List[Any]],
+    anime_genres_and_tags: Dict[int, Dict[str, List[str]]],
+    on_close: Optional[Callable[[int], None]] = None,
+    max_results_per_search: int = -1,
+) -> Iterator[bytes]:
+    """
+    Format the songs to newline delimited JSON, one record per line, as they are read
+
+    Each song is sent as {"song": ...}, right after its anime ({"anime": ...}) and
+    its artists ({"artist": ...}) that were not sent yet. Only the ids of the sent
+    anime and artists are kept, the songs not being memoized as in format_results.
+    If more than max_results_per_search songs are read, the stream ends with the
+    token of the next page ({"next_page_token": ...})
+
+    Parameters
+    ----------
+    artist_graph : ArtistGraph
+        The artist graph
+    songs : Iterable[List[Any]]
+        The songs to format, read one at a time
+    anime_genres_and_tags : Dict[int, Dict[str, List[str]]]
+        The genres and tags of each anime, by ann_id
+    on_close : Optional[Callable[[int], None]], optional
+        Called with the number of songs sent once the stream ends or is interrupted
+    max_results_per_search : int, optional
+        Maximum number of songs sent, by default -1 for no limit
+
+    Yields
+    ------
+    bytes
+        The records of STREAM_BATCH_SIZE songs
+    """
+
+    result_fragments = get_result_fragments()
+
+    artist_ids = set()
+    ann_ids = set()
+    nb_songs = 0
+    last_song = None
+    records = []
+
+    try:
+        for song in songs:
+            if nb_songs == max_results_per_search:
+                if last_song is not None:
+                    records += [
+                        b'{"next_page_token":',
+                        json.dumps(encode_page_token(last_song)).encode("utf-8"),
+                        b"}\n",
+                    ]
+                break
+
+            formatted_song = result_fragments.songs.get(song[7]) or format_song(song)
+
+            for role_type in ROLE_TYPE_COLUMNS:
+                for artist in formatted_song[role_type]:
+                    if artist["artist_id"] in artist_ids:
+                        continue
+                    artist_ids.add(artist["artist_id"])
+                    formatted_artist = format_artist_id(
+                        artist_graph, artist["artist_id"]
+                    )
+                    if formatted_artist:
+                        records += [
+                            b'{"artist":',
+                            result_fragments.get_fragment(Artist, formatted_artist),
+                            b"}\n",
+                        ]
+
+            if song[0] not in ann_ids:
+                ann_ids.add(song[0])
+                formatted_anime = result_fragments.anime.get(song[0]) or format_anime(
+                    song, anime_genres_and_tags
+                )
+                records += [
+                    b'{"anime":',
+                    result_fragments.get_fragment(AnimeEntry, formatted_anime),
+                    b"}\n",
+                ]
+
+            records += [
+                b'{"song":',
+                result_fragments.get_fragment(SongEntry, formatted_song),
+                b"}\n",
+            ]
+            nb_songs += 1
+            last_song = song
+
+            if nb_songs % STREAM_BATCH_SIZE == 0:
+                yield b"".join(records)
+                records = []
+
+        if records:
+            yield b"".join(records)
+
+    finally:
+        if on_close is not None:
+            on_close(nb_songs)
+
+
+async def stream_results(
+    artist_graph: ArtistGraph,
+    songs: Iterable[List[Any]],
+    anime_genres_and_tags: Dict[int, Dict[str, List[str]]],
+    on_close: Optional[Callable[[int], None]] = None,
+    max_results_per_search: int = -1,
+    run: Optional[Callable[..., Awaitable[Any]]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Stream the batches of records of iter_result_batches
+
+    Parameters
+    ----------
+    artist_graph : ArtistGraph
+        The artist graph
+    songs : Iterable[List[Any]]
+        The songs to format, read one at a time
+    anime_genres_and_tags : Dict[int, Dict[str, List[str]]]
+        The genres and tags of each anime, by ann_id
+    on_close : Optional[Callable[[int], None]], optional
+        Called with the number of songs sent once the stream ends or is interrupted
+    max_results_per_search : int, optional
+        Maximum number of songs sent, by default -1 for no limit
+    run : Optional[Callable[..., Awaitable[Any]]], optional
+        Runs the blocking read of each batch (e.g. SearchExecutor.run), by default
+        the batches are read on the event loop
+
+    Yields
+    ------
+    bytes
+        The records of STREAM_BATCH_SIZE songs
+    """
+
+    batches = iter_result_batches(
+        artist_graph, songs, anime_genres_and_tags, on_close, max_results_per_search
+    )
+
+    try:
+        while True:
+            if run is None:
+                batch = next(batches, None)
+            else:
+                batch = await run(next, batches, None)
+            if batch is None:
+                return
+            yield batch
+    finally:
+        try:
+            batches.close()
+        except ValueError:
+            # Still reading a batch in a thread, it is closed once garbage collected
+            pass
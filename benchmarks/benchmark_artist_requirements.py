@@ -0,0 +1,181 @@
+from app.artist_graph import (
+    get_artist_graph,
+    get_credit_mask,
+    get_song_credits,
+    parse_song_artists,
+)
+from app.search_database import (
+    check_meets_artists_requirements,
+    expand_artist_ids,
+    get_artists_line_ups_members,
+)
+from app.sql_calls import connect_to_database, get_possibles_songs_from_filters
+
+from .utils import get_songs_ids_from_artist_ids, time_function, print_comparison
+
+"""
+Benchmark the artist requirements of the artist searches, with the credits of
+every candidate song parsed and flattened for each song (before) against the
+credits flattened once at load time (after), on the largest artist searches
+
+Run from the root of the repository: python -m benchmarks.benchmark_artist_requirements
+"""
+
+CREDIT_TYPES = ["vocalist", "backing_vocalist", "performer", "composer", "arranger"]
+
+# Same limit as the API
+MAX_RESULTS_PER_SEARCH = 350
+
+SEARCHES_COUNT = 5
+
+# Artists of the combined search, to reach the limit of candidate songs
+COMBINED_SEARCH_ARTISTS_COUNT = 40
+
+
+def check_meets_artists_requirements_per_song(
+    artist_graph, song, credit_types, artist_ids, group_granularity, max_other_artists
+):
+    """
+    Check the artist requirements by parsing and flattening the credits of the song
+    """
+
+    credit_mask = get_credit_mask(credit_types)
+
+    song_artists_flat = artist_graph.get_members(
+        parse_song_artists(song[15], song[16]), credit_mask
+    )
+    support_artists = artist_graph.get_members(
+        parse_song_artists(song[17], song[18])
+        + parse_song_artists(song[19], song[20])
+        + parse_song_artists(song[21], song[22]),
+        credit_mask,
+        bottom=False,
+    )
+
+    for artist_id in artist_ids:
+        if artist_id in support_artists:
+            return True
+
+        line_ups = [[(artist_id, -1)]]
+        if artist_graph.get_line_up_count(artist_id):
+            line_ups = [
+                artist_graph.get_line_up(artist_id, line_up_id)
+                for line_up_id in range(artist_graph.get_line_up_count(artist_id))
+            ]
+
+        for line_up in line_ups:
+            checked_list = artist_graph.get_members(line_up, credit_mask)
+            present_artist = len(song_artists_flat & checked_list)
+            additional_artist = len(song_artists_flat - checked_list)
+
+            if (
+                present_artist >= 1
+                and additional_artist <= max_other_artists
+                and present_artist >= min(group_granularity, len(line_up))
+            ):
+                return True
+
+    return False
+
+
+def get_largest_searches(cursor, artist_graph, group_granularity):
+    """
+    Get the artists with the most candidate songs, alone and combined in one search,
+    with their candidate songs
+    """
+
+    artist_ids = [
+        int(artist_id)
+        for artist_id, _ in cursor.execute(
+            "SELECT artist_id, COUNT(DISTINCT song_id) FROM link_song_artist"
+            + " GROUP BY artist_id ORDER BY 2 DESC LIMIT ?",
+            [COMBINED_SEARCH_ARTISTS_COUNT],
+        )
+    ]
+
+    searches = []
+    for search_artist_ids in [
+        [artist_id] for artist_id in artist_ids[:SEARCHES_COUNT]
+    ] + [artist_ids]:
+        expanded_ids = expand_artist_ids(
+            artist_graph, CREDIT_TYPES, search_artist_ids, group_granularity
+        )
+        song_ids = get_songs_ids_from_artist_ids(cursor, expanded_ids, CREDIT_TYPES)
+        songs = get_possibles_songs_from_filters(
+            cursor,
+            song_ids=song_ids,
+            max_results_per_search=MAX_RESULTS_PER_SEARCH,
+        )
+        searches.append((search_artist_ids, songs))
+
+    return searches
+
+
+def benchmark(repeat: int = 10, group_granularity: int = 1, max_other_artists: int = 2):
+    """
+    Time the artist requirements on the candidate songs of the largest artist searches
+
+    Parameters
+    ----------
+    repeat : int, optional
+        The number of runs per search, by default 10
+    group_granularity : int, optional
+        The group granularity of the searches, by default 1
+    max_other_artists : int, optional
+        The maximum number of other artists of the searches, by default 2
+    """
+
+    cursor = connect_to_database()
+    artist_graph = get_artist_graph()
+    song_credits = get_song_credits()
+
+    for artist_ids, songs in get_largest_searches(
+        cursor, artist_graph, group_granularity
+    ):
+
+        def filter_per_song():
+            return [
+                song
+                for song in songs
+                if check_meets_artists_requirements_per_song(
+                    artist_graph,
+                    song,
+                    CREDIT_TYPES,
+                    artist_ids,
+                    group_granularity,
+                    max_other_artists,
+                )
+            ]
+
+        def filter_precomputed():
+            credit_mask = get_credit_mask(CREDIT_TYPES)
+            artists_line_ups_members = get_artists_line_ups_members(
+                artist_graph, artist_ids, credit_mask
+            )
+            return [
+                song
+                for song in songs
+                if check_meets_artists_requirements(
+                    song_credits,
+                    song,
+                    credit_mask,
+                    artists_line_ups_members,
+                    group_granularity,
+                    max_other_artists,
+                )
+            ]
+
+        if filter_per_song() != filter_precomputed():
+            raise ValueError(f"Results differ for the artists {artist_ids}")
+
+        print_comparison(
+            f"{len(artist_ids)} artist(s) ({len(songs)} candidates)",
+            time_function(filter_per_song, repeat),
+            time_function(filter_precomputed, repeat),
+        )
+
+    print(f"Song credits: {song_credits.report()}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,71 @@
+from app.indexes import get_artist_songs_index
+from app.sql_calls import connect_to_database
+
+from .utils import get_songs_ids_from_artist_ids, time_function, print_comparison
+
+import random
+
+"""
+Benchmark get_songs_ids_from_artist_ids on SQLite (before) against the merge of
+the posting lists of the in-memory ArtistSongsIndex (after)
+
+Run from the root of the repository: python -m benchmarks.benchmark_artist_songs_index
+"""
+
+# Written as plain strings to stay independent of Enum formatting
+CREDIT_TYPES = ["vocalist", "backing_vocalist", "performer", "composer", "arranger"]
+
+ARTISTS_COUNTS = [1, 10, 50, 500]
+
+
+def benchmark(repeat: int = 10):
+    """
+    Time the song ids lookup of random sets of artists, and print the comparison
+
+    Parameters
+    ----------
+    repeat : int, optional
+        The number of runs per lookup, by default 10
+    """
+
+    cursor = connect_to_database()
+    artist_songs_index = get_artist_songs_index()
+
+    generator = random.Random(0)
+    artist_ids = [id for id, in cursor.execute("SELECT id FROM artists")]
+
+    for artists_count in ARTISTS_COUNTS:
+        for credit_types in [CREDIT_TYPES, ["vocalist"]]:
+            lookup_artist_ids = generator.sample(artist_ids, artists_count)
+
+            before = time_function(
+                lambda: get_songs_ids_from_artist_ids(
+                    cursor, lookup_artist_ids, credit_types
+                ),
+                repeat,
+            )
+            after = time_function(
+                lambda: artist_songs_index.get_song_ids(
+                    lookup_artist_ids, credit_types
+                ),
+                repeat,
+            )
+
+            song_ids = artist_songs_index.get_song_ids(lookup_artist_ids, credit_types)
+            if song_ids != sorted(
+                get_songs_ids_from_artist_ids(cursor, lookup_artist_ids, credit_types)
+            ):
+                raise ValueError(f"Results differ for {artists_count} artists")
+
+            print_comparison(
+                f"{artists_count} artists, {len(credit_types)} credit types"
+                + f" ({len(song_ids)} songs)",
+                before,
+                after,
+            )
+
+    print(f"Artist songs index: {artist_songs_index.report()}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,165 @@
+from app import main
+from app.log_writer import log_writer
+from app.result_cache import result_cache
+from app.database_reload import database_reloader, find_latest_database
+
+import os
+import json
+import time
+import random
+import asyncio
+import tempfile
+import argparse
+
+from fastapi import FastAPI
+
+"""
+Benchmark the throughput of the search end points under a mixed load of cheap
+(ANN id) and expensive (partial song name) searches, and how long the event loop
+is blocked meanwhile
+
+Run from the root of the repository: python -m benchmarks.benchmark_mixed_load
+The requests are sent to the app in process, without the rate limiter, with the
+result cache disabled and the logs written to --logs-path, by default a temporary
+database
+"""
+
+SONG_NAMES = ["kyou", "koi no", "love", "sekai", "hikari", "yume", "ashita", "sora"]
+
+
+def get_request(kind):
+    """
+    Get the path and body of a random request of a kind (fast or slow)
+    """
+
+    if kind == "fast":
+        return "/api/anime_annid_search", {"ann_id": random.randrange(1, 15000)}
+    return "/api/song_name_search", {"song_name": random.choice(SONG_NAMES)}
+
+
+async def send_request(app, path, body):
+    """
+    Send a request to the app, return its status code
+    """
+
+    payload = json.dumps(body).encode("utf-8")
+    received = False
+    status = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [(b"content-type", b"application/json")],
+        "query_string": b"",
+        "http_version": "1.1",
+        "scheme": "http",
+        "server": ("benchmark", 80),
+        "client": ("benchmark", 1),
+        "root_path": "",
+    }
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def run_client(app, slow_ratio, end_time, latencies):
+    """
+    Send requests one after the other until end_time
+    """
+
+    while time.perf_counter() < end_time:
+        kind = "slow" if random.random() < slow_ratio else "fast"
+        path, body = get_request(kind)
+        start_time = time.perf_counter()
+        status = await send_request(app, path, body)
+        assert status == 200, status
+        latencies[kind].append(time.perf_counter() - start_time)
+
+
+async def measure_loop_lag(end_time, lags, interval=0.01):
+    """
+    Measure how late the event loop wakes up a sleeping coroutine
+    """
+
+    while time.perf_counter() < end_time:
+        start_time = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start_time - interval)
+
+
+def percentile(values, ratio):
+    """
+    Get a percentile of durations in seconds, in milliseconds
+    """
+
+    values = sorted(values)
+    return 1000 * values[min(int(ratio * len(values)), len(values) - 1)]
+
+
+async def benchmark(clients, duration, slow_ratio):
+    app = FastAPI()
+    app.middleware("http")(main.use_database_generation)
+    for path, endpoint in [
+        ("/api/anime_annid_search", main.anime_ann_id_search),
+        ("/api/song_name_search", main.song_name_search),
+    ]:
+        app.post(path)(endpoint)
+
+    latencies = {"fast": [], "slow": []}
+    lags = []
+    end_time = time.perf_counter() + duration
+    await asyncio.gather(
+        measure_loop_lag(end_time, lags),
+        *[run_client(app, slow_ratio, end_time, latencies) for _ in range(clients)],
+    )
+    log_writer.stop()
+
+    nb_requests = sum(len(values) for values in latencies.values())
+    report = [f"Throughput: {nb_requests / duration:.1f} requests/s"]
+    for kind, values in latencies.items():
+        if values:
+            report.append(
+                f"{kind} searches: {len(values)} requests,"
+                + f" p50 {percentile(values, 0.5):.1f} ms,"
+                + f" p95 {percentile(values, 0.95):.1f} ms"
+            )
+    report.append(
+        f"Event loop lag: p95 {percentile(lags, 0.95):.1f} ms,"
+        + f" max {percentile(lags, 1):.1f} ms"
+    )
+    if hasattr(main, "search_executor"):
+        report.append(f"Search executor: {main.search_executor.stats()}")
+    report.append(f"Logs: {log_writer.stats()}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--slow-ratio", type=float, default=0.2)
+    parser.add_argument(
+        "--logs-path", default=os.path.join(tempfile.mkdtemp(), "logs.sqlite")
+    )
+    args = parser.parse_args()
+
+    random.seed(0)
+    database_reloader.load(find_latest_database())
+    result_cache.max_bytes = 0
+
+    log_writer.logs_path = args.logs_path
+    log_writer.start()
+
+    report = asyncio.run(benchmark(args.clients, args.duration, args.slow_ratio))
+    print("\n".join(report))
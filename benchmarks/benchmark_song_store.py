@@ -0,0 +1,186 @@
+from app.sql_calls import connect_to_database, get_possibles_songs_from_filters
+from app.song_store import SongStore, get_song_store
+from app.io_classes import IntRange
+
+from .utils import time_function, print_comparison
+
+import random
+import sqlite3
+
+"""
+Benchmark get_possibles_songs_from_filters on SQLite (before) against the
+vectorized filters of the NumPy SongStore (after), on the database in
+DATABASE_PATH and on a synthetic catalogue of 1M songs
+
+Run from the root of the repository: python -m benchmarks.benchmark_song_store
+"""
+
+FILTERS = {
+    "no filter": {},
+    "openings only": {"song_types": [1]},
+    "season + anime type": {
+        "anime_seasons": ["Winter 2019", "Spring 2019"],
+        "anime_types": ["TV"],
+    },
+    "difficulty range": {"song_difficulty_range": IntRange(min=20, max=30)},
+    "instrumental inserts": {"song_types": [3], "song_categories": ["Instrumental"]},
+}
+
+# Every filter is written as plain strings to stay independent of Enum formatting
+DEFAULT_FILTERS = {
+    "song_categories": ["Standard", "Chanting", "Character", "Instrumental"],
+    "anime_types": ["TV", "movie", "OVA", "special", "ONA"],
+}
+
+SYNTHETIC_SONGS_COUNT = 1000000
+
+
+def get_synthetic_songs(songs_count: int):
+    """
+    Generate the filtered columns of a synthetic song catalogue, other columns being None
+
+    Parameters
+    ----------
+    songs_count : int
+        The number of songs to generate
+
+    Returns
+    -------
+    list
+        The synthetic rows, truncated after the song_category column
+    """
+
+    generator = random.Random(0)
+    seasons = [
+        f"{season} {year}"
+        for season in ["Winter", "Spring", "Summer", "Fall"]
+        for year in range(1960, 2024)
+    ]
+
+    songs = []
+    for song_id in range(1, songs_count + 1):
+        # About 8 songs per anime, sharing the season and anime type
+        ann_id = song_id // 8 + 1
+        if song_id == 1 or ann_id != songs[-1][0]:
+            anime_season = generator.choice(seasons)
+            anime_type = generator.choice(DEFAULT_FILTERS["anime_types"])
+
+        song_difficulty = (
+            round(generator.uniform(0, 100), 1) if generator.random() > 0.05 else None
+        )
+        songs.append(
+            (ann_id, None, None, None, None, anime_season, anime_type, song_id, None)
+            + (generator.randint(1, 3), None, f"song {song_id % 50000}", "artist")
+            + (song_difficulty, generator.choice(DEFAULT_FILTERS["song_categories"]))
+        )
+
+    return songs
+
+
+def get_synthetic_database(songs):
+    """
+    Load the synthetic rows in an in-memory songs_full table with the same indexes
+
+    Parameters
+    ----------
+    songs : list
+        The synthetic rows
+
+    Returns
+    -------
+    sqlite3.Cursor
+        The cursor of the in-memory database
+    """
+
+    columns = [
+        "ann_id",
+        "anime_expand_name",
+        "anime_jp_name",
+        "anime_en_name",
+        "anime_alt_names",
+        "anime_season",
+        "anime_type",
+        "song_id",
+        "ann_song_id",
+        "song_type",
+        "song_number",
+        "song_name",
+        "song_artist",
+        "song_difficulty",
+        "song_category",
+    ]
+
+    cursor = sqlite3.connect(":memory:").cursor()
+    cursor.execute(
+        f"CREATE TABLE songs_full ({', '.join(columns)}, PRIMARY KEY (song_id))"
+    )
+    cursor.executemany(
+        f"INSERT INTO songs_full VALUES ({', '.join('?' * len(columns))})", songs
+    )
+    for column in [
+        "ann_id",
+        "song_type",
+        "song_category",
+        "anime_type",
+        "anime_season",
+        "song_difficulty",
+    ]:
+        cursor.execute(f"CREATE INDEX idx_{column} ON songs_full ({column})")
+    cursor.execute("ANALYZE")
+
+    return cursor
+
+
+def benchmark_filters(name, cursor, song_store, repeat):
+    """
+    Time each filter combination on SQLite and on the SongStore, and print the comparison
+    """
+
+    print(f"## {name}")
+
+    for filter_name, filters in FILTERS.items():
+        filters = {**DEFAULT_FILTERS, **filters}
+
+        before = time_function(
+            lambda: get_possibles_songs_from_filters(cursor, **filters), repeat
+        )
+        after = time_function(
+            lambda: [song_store.songs[i] for i in song_store.filter(**filters)],
+            repeat,
+        )
+
+        sql_song_ids = {
+            song[7] for song in get_possibles_songs_from_filters(cursor, **filters)
+        }
+        store_song_ids = set(song_store.song_ids[song_store.filter(**filters)])
+        if sql_song_ids != store_song_ids:
+            raise ValueError(f"Results differ between SQLite and NumPy: {filter_name}")
+
+        print_comparison(f"{filter_name} ({len(store_song_ids)} songs)", before, after)
+
+    print(f"NumPy columns: {song_store.report()}")
+
+
+def benchmark(repeat: int = 5):
+    """
+    Benchmark the filters on the database and on the synthetic catalogue
+
+    Parameters
+    ----------
+    repeat : int, optional
+        The number of runs per filter combination, by default 5
+    """
+
+    benchmark_filters("DATABASE_PATH", connect_to_database(), get_song_store(), repeat)
+
+    songs = get_synthetic_songs(SYNTHETIC_SONGS_COUNT)
+    benchmark_filters(
+        f"{SYNTHETIC_SONGS_COUNT} synthetic songs",
+        get_synthetic_database(songs),
+        SongStore(songs),
+        repeat,
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,79 @@
+from app import sql_calls
+from app.sql_calls import connect_to_database, get_possibles_songs_from_filters
+from app.io_classes import IntRange
+
+from .utils import time_function, print_comparison
+
+"""
+Benchmark get_possibles_songs_from_filters on the songsFull view (before)
+against the materialized songs_full table (after)
+
+Run from the root of the repository: python -m benchmarks.benchmark_songs_full
+"""
+
+FILTERS = {
+    "single ann_id": {"ann_ids": [1]},
+    "song ids": {"song_ids": list(range(1, 40000, 100))},
+    "openings only": {"song_types": [1]},
+    "season + anime type": {
+        "anime_seasons": ["Winter 2019", "Spring 2019"],
+        "anime_types": ["TV"],
+    },
+    "difficulty range": {"song_difficulty_range": IntRange(min=20, max=30)},
+}
+
+# Every filter is written as plain strings to stay independent of Enum formatting
+DEFAULT_FILTERS = {
+    "song_categories": ["Standard", "Chanting", "Character", "Instrumental"],
+    "anime_types": ["TV", "movie", "OVA", "special", "ONA"],
+}
+
+run_sql_command = sql_calls.run_sql_command
+
+
+def run_on_view(cursor, sql_command, data=None):
+    """
+    Run the command against the songsFull view instead of the songs_full table
+    """
+
+    return run_sql_command(cursor, sql_command.replace("songs_full", "songsFull"), data)
+
+
+def benchmark(repeat: int = 5):
+    """
+    Time each filter combination on the view and on the table, and print the comparison
+
+    Parameters
+    ----------
+    repeat : int, optional
+        The number of runs per filter combination, by default 5
+    """
+
+    cursor = connect_to_database()
+
+    for name, filters in FILTERS.items():
+        filters = {**DEFAULT_FILTERS, **filters}
+
+        sql_calls.run_sql_command = run_on_view
+        before = time_function(
+            lambda: get_possibles_songs_from_filters(cursor, **filters), repeat
+        )
+        before_results = get_possibles_songs_from_filters(cursor, **filters)
+
+        sql_calls.run_sql_command = run_sql_command
+        after = time_function(
+            lambda: get_possibles_songs_from_filters(cursor, **filters), repeat
+        )
+        after_results = get_possibles_songs_from_filters(cursor, **filters)
+
+        # The table also holds the folded names, which the view does not have
+        if {song[:28] for song in before_results} != {
+            song[:28] for song in after_results
+        }:
+            raise ValueError(f"Results differ between the view and table: {name}")
+
+        print_comparison(f"{name} ({len(after_results)} songs)", before, after)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,95 @@
+import time
+import sqlite3
+import statistics
+from typing import Any, Callable, Dict, List
+
+"""
+A collection of useful functions for the benchmarks
+"""
+
+
+def time_function(function: Callable[[], Any], repeat: int = 10) -> Dict[str, float]:
+    """
+    Time a function over several runs
+
+    Parameters
+    ----------
+    function : Callable[[], Any]
+        The function to time, called without arguments
+    repeat : int, optional
+        The number of runs, by default 10
+
+    Returns
+    -------
+    Dict[str, float]
+        The median, min and max duration of a run, in milliseconds
+    """
+
+    durations = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start_time) * 1000)
+
+    return {
+        "median": statistics.median(durations),
+        "min": min(durations),
+        "max": max(durations),
+    }
+
+
+def print_comparison(name: str, before: Dict[str, float], after: Dict[str, float]):
+    """
+    Print the timings of a benchmark before and after an optimization
+
+    Parameters
+    ----------
+    name : str
+        The name of the benchmark
+    before : Dict[str, float]
+        The timings before the optimization
+    after : Dict[str, float]
+        The timings after the optimization
+    """
+
+    print(
+        f"{name:<40} before: {before['median']:>9.2f} ms"
+        f" | after: {after['median']:>9.2f} ms"
+        f" | x{before['median'] / max(after['median'], 1e-6):.1f}"
+    )
+
+
+def get_songs_ids_from_artist_ids(
+    cursor: sqlite3.Cursor, artist_ids: List[int], credit_types: List[str]
+) -> List[int]:
+    """
+    Get the songs of the artists with one of the credit types from link_song_artist,
+    as the searches did before the in-memory ArtistSongsIndex
+
+    Parameters
+    ----------
+    cursor : sqlite3.Cursor
+        The cursor of the database to run the command
+    artist_ids : List[int]
+        The list of artist ids
+    credit_types : List[str]
+        List of credit types to search
+
+    Returns
+    -------
+    List[int]
+        The ids of the songs of the artists
+    """
+
+    query = (
+        "SELECT DISTINCT song_id FROM link_song_artist"
+        + f" WHERE role_type IN ({','.join('?' * len(credit_types))})"
+        + f" AND artist_id IN ({','.join('?' * len(artist_ids))})"
+    )
+
+    return [
+        id[0]
+        for id in cursor.execute(
+            query, [str(credit_type) for credit_type in credit_types] + list(artist_ids)
+        )
+    ]
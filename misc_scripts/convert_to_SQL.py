@@ -2,10 +2,16 @@
 Convert the mapping in JSON generated by process_artists scripts to an SQL database for production use
 """
 
+import sys
 import sqlite3
 import json
+import importlib
 from pathlib import Path
 
+# Names are folded by the implementation the app folds the searches with
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+name_folding = importlib.import_module("app.name_folding")
+
 database = Path("../app/data/enhanced_amq_database.sqlite")
 nerfedDatabase = Path("../app/data/enhanced_amq_database_nerfed.sqlite")
 song_DATABASE_PATH = Path("../app/data/song_database.json")
@@ -28,6 +34,11 @@ DROP TABLE IF EXISTS link_anime_genre;
 DROP TABLE IF EXISTS link_anime_tag;
 DROP TABLE IF EXISTS link_anime_alt_name;
 DROP TABLE IF EXISTS songs;
+DROP TABLE IF EXISTS songs_full;
+DROP TABLE IF EXISTS song_names_fts;
+DROP TABLE IF EXISTS artist_names_fts;
+DROP TABLE IF EXISTS anime_names_fts;
+DROP TABLE IF EXISTS anime_alt_names_fts;
 DROP VIEW IF EXISTS artistsNames;
 DROP VIEW IF EXISTS artistsMembers;
 DROP VIEW IF EXISTS artistsGroups;
@@ -46,7 +57,10 @@ CREATE TABLE animes (
     "anime_en_name" VARCHAR(255),
     "anime_jp_name" VARCHAR(255),
     "anime_season" VARCHAR(255),
-    "anime_type" VARCHAR(255)
+    "anime_type" VARCHAR(255),
+    "anime_expand_name_folded" VARCHAR(255),
+    "anime_en_name_folded" VARCHAR(255),
+    "anime_jp_name_folded" VARCHAR(255)
 );
 
 CREATE TABLE songs (
@@ -133,6 +147,7 @@ CREATE TABLE link_artist_name (
     "inserted_order" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
     "artist_id" INTEGER NOT NULL,
     "name" VARCHAR(255) NOT NULL,
+    "name_folded" VARCHAR(255),
     FOREIGN KEY ("artist_id")
         REFERENCES artist ("id"),
     UNIQUE (artist_id, name)
@@ -141,6 +156,7 @@ CREATE TABLE link_artist_name (
 create TABLE link_anime_alt_name (
     "ann_id" INTEGER NOT NULL,
     "name" VARCHAR(255),
+    "name_folded" VARCHAR(255),
     FOREIGN KEY ("ann_id")
         REFERENCES animes ("ann_id"),
     PRIMARY KEY (ann_id, name)
@@ -294,6 +310,118 @@ GROUP BY
     songsAnimes.song_id;
 """
 
+# Names are folded with name_folding.fold_name once the database is populated, so that
+# the API can match the folded search against an indexed column instead of a regex
+FOLD_NAMES_SQL = """
+UPDATE animes SET
+    anime_expand_name_folded = fold_name(anime_expand_name),
+    anime_en_name_folded = fold_name(anime_en_name),
+    anime_jp_name_folded = fold_name(anime_jp_name);
+
+UPDATE link_anime_alt_name SET name_folded = fold_name(name);
+
+UPDATE link_artist_name SET name_folded = fold_name(name);
+
+CREATE INDEX idx_animes_anime_expand_name_folded ON animes (anime_expand_name_folded);
+CREATE INDEX idx_animes_anime_en_name_folded ON animes (anime_en_name_folded);
+CREATE INDEX idx_animes_anime_jp_name_folded ON animes (anime_jp_name_folded);
+CREATE INDEX idx_link_anime_alt_name_name_folded ON link_anime_alt_name (name_folded);
+CREATE INDEX idx_link_artist_name_name_folded ON link_artist_name (name_folded);
+"""
+
+# songsFull is materialized once the database is populated, so that the API
+# does not recompute every group_concat and pivot of the views on each query,
+# its ann_id index follows the order of the results (ann_id, song_type,
+# song_number, then song_id which is the rowid)
+MATERIALIZE_SONGS_FULL_SQL = """
+CREATE TABLE songs_full (
+    "ann_id" INTEGER NOT NULL,
+    "anime_expand_name" VARCHAR(255) NOT NULL,
+    "anime_jp_name" VARCHAR(255),
+    "anime_en_name" VARCHAR(255),
+    "anime_alt_names" TEXT,
+    "anime_season" VARCHAR(255),
+    "anime_type" VARCHAR(255),
+    "song_id" INTEGER NOT NULL PRIMARY KEY,
+    "ann_song_id" INTEGER,
+    "song_type" INTEGER NOT NULL,
+    "song_number" INTEGER NOT NULL,
+    "song_name" VARCHAR(255) NOT NULL,
+    "song_artist" VARCHAR(255) NOT NULL,
+    "song_difficulty" FLOAT,
+    "song_category" VARCHAR(255),
+    "vocalists" TEXT,
+    "vocalists_line_up" TEXT,
+    "backing_vocalists" TEXT,
+    "backing_vocalists_line_up" TEXT,
+    "performers" TEXT,
+    "performers_line_up" TEXT,
+    "composers" TEXT,
+    "composers_line_up" TEXT,
+    "arrangers" TEXT,
+    "arrangers_line_up" TEXT,
+    "HQ" VARCHAR(255),
+    "MQ" VARCHAR(255),
+    "audio" VARCHAR(255),
+    "song_name_folded" VARCHAR(255),
+    "song_artist_folded" VARCHAR(255)
+);
+
+INSERT INTO songs_full SELECT *, fold_name(song_name), fold_name(song_artist) FROM songsFull;
+
+CREATE INDEX idx_songs_full_ann_id ON songs_full (ann_id, song_type, song_number);
+CREATE INDEX idx_songs_full_song_type ON songs_full (song_type);
+CREATE INDEX idx_songs_full_song_category ON songs_full (song_category);
+CREATE INDEX idx_songs_full_anime_type ON songs_full (anime_type);
+CREATE INDEX idx_songs_full_anime_season ON songs_full (anime_season);
+CREATE INDEX idx_songs_full_song_difficulty ON songs_full (song_difficulty);
+CREATE INDEX idx_songs_full_song_name_folded ON songs_full (song_name_folded);
+CREATE INDEX idx_songs_full_song_artist_folded ON songs_full (song_artist_folded);
+
+CREATE INDEX idx_link_anime_genre_genre ON link_anime_genre (genre, ann_id);
+CREATE INDEX idx_link_anime_tag_tag ON link_anime_tag (tag, ann_id);
+
+ANALYZE;
+"""
+
+# Trigram full text indexes on the folded names, so that partial searches only
+# verify the few rows containing every trigram of the search instead of every row
+FULL_TEXT_SEARCH_SQL = """
+CREATE VIRTUAL TABLE song_names_fts USING fts5(
+    song_name_folded,
+    song_artist_folded,
+    content='songs_full',
+    content_rowid='song_id',
+    tokenize='trigram'
+);
+INSERT INTO song_names_fts(song_names_fts) VALUES('rebuild');
+
+CREATE VIRTUAL TABLE artist_names_fts USING fts5(
+    name_folded,
+    content='link_artist_name',
+    content_rowid='inserted_order',
+    tokenize='trigram'
+);
+INSERT INTO artist_names_fts(artist_names_fts) VALUES('rebuild');
+
+CREATE VIRTUAL TABLE anime_names_fts USING fts5(
+    anime_expand_name_folded,
+    anime_en_name_folded,
+    anime_jp_name_folded,
+    content='animes',
+    content_rowid='ann_id',
+    tokenize='trigram'
+);
+INSERT INTO anime_names_fts(anime_names_fts) VALUES('rebuild');
+
+CREATE VIRTUAL TABLE anime_alt_names_fts USING fts5(
+    name_folded,
+    content='link_anime_alt_name',
+    tokenize='trigram'
+);
+INSERT INTO anime_alt_names_fts(anime_alt_names_fts) VALUES('rebuild');
+"""
+
 
 def run_sql_command(cursor, sql_command, data=None):
     """
@@ -730,12 +858,14 @@ print("Reset successful :)")
 # Databases connection
 try:
     sqliteConnection = sqlite3.connect(database)
+    sqliteConnection.create_function("fold_name", 1, name_folding.fold_name)
     cursor = sqliteConnection.cursor()
 except sqlite3.Error as error:
     print("\n", error, "\n")
 
 try:
     sqliteConnection2 = sqlite3.connect(nerfedDatabase)
+    sqliteConnection2.create_function("fold_name", 1, name_folding.fold_name)
     cursor2 = sqliteConnection2.cursor()
 except sqlite3.Error as error:
     print("\n", error, "\n")
@@ -939,6 +1069,13 @@ for anime_ann_id in song_database:
                 )
 
 
+# Fold names, materialize songsFull and index the names now that every table is populated
+for command in (
+    FOLD_NAMES_SQL + MATERIALIZE_SONGS_FULL_SQL + FULL_TEXT_SEARCH_SQL
+).split(";"):
+    run_sql_command(cursor, command)
+    run_sql_command(cursor2, command)
+
 sqliteConnection.commit()
 cursor.close()
 sqliteConnection.close()